@@ -9,8 +9,61 @@ import asyncio
 import asyncpg
 from pathlib import Path
 
+from app.db.pgvector_ann import ensure_ann_index
+
 SQL_PATH = Path(__file__).resolve().parents[2] / "pgvector_schema.sql"
 
+# A finite JSON number (or numeric string) in metadata, else NULL
+_NUMBER = r"CASE WHEN metadata->>'{field}' ~ '^\s*-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?\s*$' THEN (metadata->>'{field}')::float8 END"
+
+# Typed, indexed filter columns (see app/db/pgvector_filters.py), backfilled from metadata
+FILTER_COLUMNS_SQL = f"""
+ALTER TABLE property_embeddings
+  ADD COLUMN IF NOT EXISTS price_per_night DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS bedrooms INTEGER,
+  ADD COLUMN IF NOT EXISTS bathrooms DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS max_guests INTEGER,
+  ADD COLUMN IF NOT EXISTS city TEXT,
+  ADD COLUMN IF NOT EXISTS country TEXT,
+  ADD COLUMN IF NOT EXISTS amenities TEXT[] NOT NULL DEFAULT '{{}}',
+  ADD COLUMN IF NOT EXISTS active BOOLEAN NOT NULL DEFAULT true;
+
+UPDATE property_embeddings SET
+  price_per_night = {_NUMBER.format(field="price_per_night")},
+  bedrooms = trunc({_NUMBER.format(field="bedrooms")})::integer,
+  bathrooms = {_NUMBER.format(field="bathrooms")},
+  max_guests = trunc({_NUMBER.format(field="max_guests")})::integer,
+  city = NULLIF(lower(metadata->>'location_city'), ''),
+  country = NULLIF(lower(metadata->>'location_country'), ''),
+  amenities = ARRAY(
+    SELECT lower(trim(a))
+    FROM unnest(CASE jsonb_typeof(metadata->'amenities')
+      WHEN 'array' THEN ARRAY(SELECT jsonb_array_elements_text(metadata->'amenities'))
+      WHEN 'string' THEN string_to_array(metadata->>'amenities', ',')
+      ELSE ARRAY[]::text[]
+    END) AS a
+    WHERE trim(a) <> ''
+  ),
+  active = COALESCE(metadata->>'active', 'true') <> 'false';
+
+CREATE INDEX IF NOT EXISTS idx_property_embeddings_price ON property_embeddings (price_per_night);
+CREATE INDEX IF NOT EXISTS idx_property_embeddings_bedrooms ON property_embeddings (bedrooms);
+CREATE INDEX IF NOT EXISTS idx_property_embeddings_guests ON property_embeddings (max_guests);
+CREATE INDEX IF NOT EXISTS idx_property_embeddings_city ON property_embeddings (city);
+CREATE INDEX IF NOT EXISTS idx_property_embeddings_country ON property_embeddings (country);
+CREATE INDEX IF NOT EXISTS idx_property_embeddings_amenities ON property_embeddings USING gin (amenities);
+ANALYZE property_embeddings;
+"""
+
+
+def _migrations():
+    """(name, sql) in the order they must be applied"""
+    return [
+        ("pgvector_v1", SQL_PATH.read_text()),
+        ("pgvector_v2_filter_columns", FILTER_COLUMNS_SQL),
+    ]
+
+
 async def run_pgvector_migrations(database_url: str | None):
     if not database_url:
         return False
@@ -18,8 +71,6 @@ async def run_pgvector_migrations(database_url: str | None):
     if not SQL_PATH.exists():
         print(f"pgvector schema file not found at {SQL_PATH}")
         return False
-
-    sql = SQL_PATH.read_text()
     
     # Convert SQLAlchemy-style URL to asyncpg-compatible URL
     # postgresql+asyncpg:// -> postgresql://
@@ -39,19 +90,23 @@ async def run_pgvector_migrations(database_url: str | None):
                 """
             )
 
-            migration_name = "pgvector_v1"
-            row = await conn.fetchrow("SELECT name FROM schema_migrations WHERE name = $1", migration_name)
-            if row:
-                print(f"ℹ️ Migration '{migration_name}' already applied; skipping pgvector SQL")
-                return True
+            for migration_name, sql in _migrations():
+                row = await conn.fetchrow("SELECT name FROM schema_migrations WHERE name = $1", migration_name)
+                if row:
+                    print(f"ℹ️ Migration '{migration_name}' already applied; skipping")
+                    continue
 
-            # asyncpg's execute can run multiple statements when separated by semicolons
-            await conn.execute(sql)
+                # asyncpg's execute can run multiple statements when separated by semicolons
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    # record migration
+                    await conn.execute("INSERT INTO schema_migrations(name) VALUES($1)", migration_name)
 
-            # record migration
-            await conn.execute("INSERT INTO schema_migrations(name) VALUES($1)", migration_name)
+                print(f"✅ Migration '{migration_name}' applied and recorded successfully")
 
-            print("✅ pgvector schema executed and recorded successfully")
+            # The ANN index follows PGVECTOR_INDEX_TYPE rather than a recorded migration, so it can be switched
+            kind = await ensure_ann_index(conn)
+            print(f"✅ pgvector {kind} index ready")
             return True
         finally:
             await conn.close()
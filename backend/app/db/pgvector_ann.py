@@ -0,0 +1,117 @@
+"""ANN index and query settings for property_embeddings.
+
+The embedding index is built with `vector_cosine_ops`, so searches must
+order by the cosine operator `<=>`: any other operator (e.g. `<->`, L2)
+can't use the index and Postgres falls back to a sequential scan. Cosine
+distance is turned back into similarity (1 - distance) so `match_score`
+means the same thing as on the FAISS backend: higher is better.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+PGVECTOR_INDEX_TYPE = os.getenv("PGVECTOR_INDEX_TYPE", "ivfflat").lower()  # ivfflat or hnsw
+PGVECTOR_IVFFLAT_LISTS = int(os.getenv("PGVECTOR_IVFFLAT_LISTS", "100"))
+PGVECTOR_HNSW_M = int(os.getenv("PGVECTOR_HNSW_M", "16"))
+PGVECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64"))
+# Per-query defaults, overridden by a request's nprobe / ef_search
+PGVECTOR_PROBES = int(os.getenv("PGVECTOR_PROBES", "10"))
+PGVECTOR_EF_SEARCH = int(os.getenv("PGVECTOR_EF_SEARCH", "40"))
+
+INDEX_TYPES = ("ivfflat", "hnsw")
+ANN_INDEX_NAME = "idx_property_embeddings_embedding"
+DISTANCE_OPERATOR = "<=>"  # cosine distance, matches vector_cosine_ops
+
+
+def index_type(requested: Optional[str] = None) -> str:
+    kind = (requested or PGVECTOR_INDEX_TYPE).lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown PGVECTOR_INDEX_TYPE {kind!r}; expected one of {INDEX_TYPES}")
+    return kind
+
+
+def create_index_sql(kind: Optional[str] = None, table: str = "property_embeddings", name: str = ANN_INDEX_NAME) -> str:
+    kind = index_type(kind)
+    if kind == "hnsw":
+        options = f"m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION}"
+    else:
+        options = f"lists = {PGVECTOR_IVFFLAT_LISTS}"
+    return (
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+        f"USING {kind} (embedding vector_cosine_ops) WITH ({options})"
+    )
+
+
+async def ensure_ann_index(conn, kind: Optional[str] = None) -> str:
+    """Create the embedding index, rebuilding it when it uses another access method"""
+    kind = index_type(kind)
+    current = await conn.fetchval(
+        "SELECT am.amname FROM pg_class c JOIN pg_am am ON am.oid = c.relam WHERE c.relname = $1",
+        ANN_INDEX_NAME
+    )
+    if current == kind:
+        return kind
+    async with conn.transaction():
+        if current is not None:
+            print(f"🔧 Rebuilding {ANN_INDEX_NAME}: {current} -> {kind}")
+            await conn.execute(f"DROP INDEX IF EXISTS {ANN_INDEX_NAME}")
+        await conn.execute(create_index_sql(kind))
+    return kind
+
+
+def session_settings(iterative_scan: bool = False) -> List[str]:
+    """Per-connection defaults, applied once when the pool opens a connection"""
+    settings = [
+        f"SET ivfflat.probes = {PGVECTOR_PROBES}",
+        f"SET hnsw.ef_search = {PGVECTOR_EF_SEARCH}",
+    ]
+    if iterative_scan:
+        # pgvector >= 0.8: keep scanning the index until LIMIT rows pass the WHERE clause.
+        # Unfiltered searches fill LIMIT on the first pass, so this only costs filtered ones
+        settings += [
+            "SET ivfflat.iterative_scan = relaxed_order",
+            "SET hnsw.iterative_scan = relaxed_order",
+        ]
+    return settings
+
+
+# One parameterized statement, so it is prepared once per connection like the search itself
+SEARCH_SETTINGS_SQL = "SELECT set_config('ivfflat.probes', $1, true), set_config('hnsw.ef_search', $2, true)"
+
+
+def search_settings(ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> Optional[Tuple[str, str]]:
+    """
+    Transaction-local (ivfflat.probes, hnsw.ef_search) for a request that
+    overrides the connection defaults, or None when it doesn't
+    """
+    if ef_search is None and nprobe is None:
+        return None
+    return str(int(nprobe or PGVECTOR_PROBES)), str(int(ef_search or PGVECTOR_EF_SEARCH))
+
+
+def similarity(distance: float) -> float:
+    """Cosine similarity for a `<=>` distance"""
+    return 1.0 - float(distance)
+
+
+def _plan_nodes(node: Dict[str, Any]):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def index_used(plan: Any) -> bool:
+    """Whether an EXPLAIN (FORMAT JSON) plan scans the embedding index"""
+    if isinstance(plan, list):
+        plan = plan[0]
+    return any(node.get("Index Name") == ANN_INDEX_NAME for node in _plan_nodes(plan["Plan"]))
+
+
+def plan_summary(plan: Any) -> List[str]:
+    """Node types of a plan, outermost first, e.g. ['Limit', 'Index Scan']"""
+    if isinstance(plan, list):
+        plan = plan[0]
+    return [node.get("Node Type", "?") for node in _plan_nodes(plan["Plan"])]
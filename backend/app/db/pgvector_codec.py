@@ -0,0 +1,66 @@
+"""Binary asyncpg codecs for the pgvector `vector` type and JSONB.
+
+pgvector's binary wire format is a big-endian int16 dimension, an unused
+int16 and then `dim` big-endian float4 values, so vectors move straight
+between NumPy buffers and the socket: no per-float text formatting, no
+precision lost to rounding, and usable by binary COPY.
+
+JSONB's binary format is a version byte followed by the JSON text, which
+orjson parses and writes directly, so metadata arrives as dicts without a
+per-row `json.loads` in Python.
+"""
+import struct
+import asyncpg
+import numpy as np
+import orjson
+
+VECTOR_HEADER = struct.Struct(">HH")
+WIRE_DTYPE = np.dtype(">f4")
+JSONB_VERSION = b"\x01"
+
+
+def encode_vector(value) -> bytes:
+    array = np.asarray(value, dtype=WIRE_DTYPE)
+    if array.ndim != 1:
+        raise ValueError(f"vector must be one-dimensional, got shape {array.shape}")
+    return VECTOR_HEADER.pack(array.shape[0], 0) + array.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = VECTOR_HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=WIRE_DTYPE, count=dim, offset=VECTOR_HEADER.size).astype(np.float32)
+
+
+def to_wire(embeddings: np.ndarray) -> np.ndarray:
+    """Convert a whole embedding matrix to wire byte order once, so encoding each row is a plain copy"""
+    return np.ascontiguousarray(embeddings, dtype=WIRE_DTYPE)
+
+
+def encode_jsonb(value) -> bytes:
+    return JSONB_VERSION + orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def decode_jsonb(data: bytes):
+    if data[:1] != JSONB_VERSION:
+        raise ValueError(f"unsupported jsonb format version {data[:1]!r}")
+    return orjson.loads(memoryview(data)[1:])
+
+
+async def register_jsonb_codec(conn: asyncpg.Connection):
+    """Read and write JSONB as Python objects via orjson"""
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog", encoder=encode_jsonb, decoder=decode_jsonb, format="binary"
+    )
+
+
+async def register_vector_codec(conn: asyncpg.Connection):
+    """Install the codec on a connection (use as the pool `init` hook)"""
+    schema = await conn.fetchval(
+        "SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace WHERE t.typname = 'vector'"
+    )
+    if schema is None:
+        # Extension not installed yet; migrations create it and new connections pick the codec up
+        return
+    await conn.set_type_codec(
+        "vector", schema=schema, encoder=encode_vector, decoder=decode_vector, format="binary"
+    )
@@ -0,0 +1,116 @@
+"""Typed filter columns and WHERE-clause compilation for property_embeddings.
+
+Search filters used to be ignored by the Postgres backend. The filterable
+fields now live in typed, indexed columns next to the JSONB metadata and
+filters compile to a parameterized WHERE clause with the same semantics as
+VectorStore._matches_filters (missing numbers count as 0, except that a
+missing price passes max_price; city/country compare case-insensitively;
+amenities must all be present).
+
+Range filters compare the bare columns so the btree indexes stay usable;
+the "missing counts as 0" case is spelled out as `OR col IS NULL` only when
+the threshold lets a 0 through.
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.attribute_index import FILTER_KEYS, amenity_list
+
+INT4_MAX = 2**31 - 1
+
+# Column order used by ingestion (after property_id, title, embedding, metadata)
+FILTER_COLUMNS = ["price_per_night", "bedrooms", "bathrooms", "max_guests", "city", "country", "amenities", "active"]
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _integer(value: Any) -> Optional[int]:
+    number = _number(value)
+    return int(number) if number is not None else None
+
+
+def _lower(value: Any) -> Optional[str]:
+    return value.lower() if isinstance(value, str) and value else None
+
+
+def filter_columns(prop: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Typed column values for one property, in FILTER_COLUMNS order"""
+    return (
+        _number(prop.get("price_per_night")),
+        _integer(prop.get("bedrooms")),
+        _number(prop.get("bathrooms")),
+        _integer(prop.get("max_guests")),
+        _lower(prop.get("location_city")),
+        _lower(prop.get("location_country")),
+        amenity_list(prop.get("amenities")),
+        bool(prop.get("active", True)),
+    )
+
+
+def _int4_threshold(value: float) -> int:
+    """Smallest int4 n with n >= value, so `col >= n` means `col >= value` on an integer column"""
+    if math.isnan(value) or value > INT4_MAX:
+        return INT4_MAX
+    return max(math.ceil(value), -INT4_MAX) if math.isfinite(value) else -INT4_MAX
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def compile_filters(filters: Optional[Dict[str, Any]], first_param: int) -> Tuple[str, List[Any]]:
+    """
+    (WHERE clause, args) for `filters`, numbering placeholders from
+    `first_param`. Inactive listings are always excluded.
+    """
+    clauses = ["active IS NOT FALSE"]
+    args: List[Any] = []
+
+    def param(value: Any) -> str:
+        args.append(value)
+        return f"${first_param + len(args) - 1}"
+
+    def at_least(column: str, value: Any, integer: bool = False) -> str:
+        value = float(value)
+        if integer:
+            clause = f"{column} >= {param(_int4_threshold(value))}::integer"
+        else:
+            clause = f"{column} >= {param(value)}::float8"
+        # A missing value counts as 0
+        return f"({clause} OR {column} IS NULL)" if value <= 0 else clause
+
+    filters = filters or {}
+    if "min_price" in filters:
+        clauses.append(at_least("price_per_night", filters["min_price"]))
+    if "max_price" in filters:
+        clauses.append(f"(price_per_night IS NULL OR price_per_night <= {param(float(filters['max_price']))}::float8)")
+    if "location" in filters:
+        pattern = param(_like_pattern(filters["location"]))
+        clauses.append(
+            f"(city LIKE {pattern} OR country LIKE {pattern} OR lower(title) LIKE {pattern}"
+            f" OR lower(metadata->>'description') LIKE {pattern})"
+        )
+    if "city" in filters:
+        clauses.append(f"city = {param(filters['city'].lower())}")
+    if "country" in filters:
+        clauses.append(f"country = {param(filters['country'].lower())}")
+    if "bedrooms" in filters:
+        clauses.append(at_least("bedrooms", filters["bedrooms"], integer=True))
+    if "guests" in filters:
+        clauses.append(at_least("max_guests", filters["guests"], integer=True))
+    if "bathrooms" in filters:
+        clauses.append(at_least("bathrooms", filters["bathrooms"]))
+    if "amenities" in filters:
+        clauses.append(f"amenities @> {param(amenity_list(filters['amenities']))}::text[]")
+    return "WHERE " + " AND ".join(clauses), args
+
+
+def has_filters(filters: Optional[Dict[str, Any]]) -> bool:
+    return bool(filters) and any(key in filters for key in FILTER_KEYS)
@@ -0,0 +1,180 @@
+"""Zero-downtime rebuilds of property_embeddings.
+
+A full reindex used to TRUNCATE the live table and re-insert every row in
+one transaction; TRUNCATE takes an ACCESS EXCLUSIVE lock, so every search
+waited for the whole rebuild. Rebuilds now load a shadow table instead:
+
+1. copy the live table's shape (columns, defaults, checks) into the shadow,
+2. bulk load it with binary COPY,
+3. build its constraints, indexes and the ANN index on the loaded data
+   (an ivfflat index trained on real rows instead of an empty table),
+4. ANALYZE it, then
+5. swap it in with renames in one short transaction.
+
+Only step 5 locks the live table, for as long as a few catalog updates.
+The swap runs with a lock_timeout and is retried, so a long-running query
+holding the table can't make searches queue up behind the rename either.
+
+Incremental syncs don't rebuild at all: `replace_rows` deletes and re-inserts
+just the listings a delta touched, in one transaction on the live table.
+
+Every writer (any worker, on any host) takes the same Postgres advisory lock,
+so two rebuilds never share the shadow table and a targeted write can't land
+in a table that a concurrent swap is about to retire.
+"""
+import os
+import re
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+import asyncpg
+from dotenv import load_dotenv
+
+from app.db.pgvector_ann import ANN_INDEX_NAME, create_index_sql
+
+load_dotenv()
+
+# Configuration
+PGVECTOR_SWAP_LOCK_TIMEOUT_MS = int(os.getenv("PGVECTOR_SWAP_LOCK_TIMEOUT_MS", "2000"))
+PGVECTOR_SWAP_ATTEMPTS = int(os.getenv("PGVECTOR_SWAP_ATTEMPTS", "5"))
+
+TABLE = "property_embeddings"
+SHADOW_SUFFIX = "_shadow"
+SHADOW_TABLE = TABLE + SHADOW_SUFFIX
+RETIRED_TABLE = TABLE + "_retired"
+
+# Advisory lock key shared by every writer of the table
+WRITE_LOCK_SQL = "SELECT pg_advisory_lock(hashtext($1))"
+WRITE_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext($1))"
+WRITE_XACT_LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext($1))"
+
+_INDEX_DEF = re.compile(r"^(CREATE (?:UNIQUE )?INDEX) (\S+) ON (?:ONLY )?\S+ (USING .+)$")
+
+
+def shadow_index_sql(indexdef: str) -> str:
+    """Rewrite a pg_indexes definition of the live table so it builds the same index on the shadow"""
+    match = _INDEX_DEF.match(indexdef)
+    if not match:
+        raise ValueError(f"Unrecognized index definition: {indexdef}")
+    create, name, rest = match.groups()
+    return f"{create} {name}{SHADOW_SUFFIX} ON {SHADOW_TABLE} {rest}"
+
+
+async def _live_constraints(conn) -> List[Tuple[str, str]]:
+    """(name, definition) of the live table's primary key and unique constraints"""
+    rows = await conn.fetch(
+        "SELECT conname, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+        "WHERE conrelid = $1::regclass AND contype IN ('p', 'u') ORDER BY conname",
+        TABLE
+    )
+    return [(r["conname"], r["definition"]) for r in rows]
+
+
+async def _live_indexes(conn) -> List[Tuple[str, str]]:
+    """(name, definition) of the live table's plain indexes, minus the ANN index and constraint indexes"""
+    rows = await conn.fetch(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = $1 AND i.indexname <> $2 "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c "
+        "WHERE c.conindid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass) "
+        "ORDER BY i.indexname",
+        TABLE, ANN_INDEX_NAME
+    )
+    return [(r["indexname"], r["indexdef"]) for r in rows]
+
+
+async def _build_shadow(
+    conn,
+    records: Iterable[Sequence[Any]],
+    columns: List[str],
+    constraints: List[Tuple[str, str]],
+    indexes: List[Tuple[str, str]],
+    kind: Optional[str]
+):
+    async with conn.transaction():
+        # A leftover from an interrupted rebuild is never live, so it is safe to drop
+        await conn.execute(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+        await conn.execute(f"CREATE TABLE {SHADOW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        await conn.copy_records_to_table(SHADOW_TABLE, records=records, columns=columns)
+        for name, definition in constraints:
+            await conn.execute(f"ALTER TABLE {SHADOW_TABLE} ADD CONSTRAINT {name}{SHADOW_SUFFIX} {definition}")
+        for _, indexdef in indexes:
+            await conn.execute(shadow_index_sql(indexdef))
+        await conn.execute(create_index_sql(kind, table=SHADOW_TABLE, name=ANN_INDEX_NAME + SHADOW_SUFFIX))
+        await conn.execute(f"ANALYZE {SHADOW_TABLE}")
+
+
+async def _swap(conn, sequence: Optional[str], constraints: List[Tuple[str, str]], index_names: List[str]):
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL lock_timeout = '{PGVECTOR_SWAP_LOCK_TIMEOUT_MS}ms'")
+        await conn.execute(f"ALTER TABLE {TABLE} RENAME TO {RETIRED_TABLE}")
+        await conn.execute(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {TABLE}")
+        if sequence:
+            # The shadow's id default already draws from this sequence; keep it alive past the drop
+            await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+        await conn.execute(f"DROP TABLE {RETIRED_TABLE}")
+        for name, _ in constraints:
+            await conn.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {name}{SHADOW_SUFFIX} TO {name}")
+        for name in index_names:
+            await conn.execute(f"ALTER INDEX {name}{SHADOW_SUFFIX} RENAME TO {name}")
+
+
+@asynccontextmanager
+async def write_lock(conn) -> AsyncIterator[None]:
+    """Session-level advisory lock held across a whole rebuild (it spans several transactions)"""
+    await conn.execute(WRITE_LOCK_SQL, TABLE)
+    try:
+        yield
+    finally:
+        await conn.execute(WRITE_UNLOCK_SQL, TABLE)
+
+
+async def rebuild_table(
+    conn,
+    records: Iterable[Sequence[Any]],
+    columns: List[str],
+    kind: Optional[str] = None
+) -> int:
+    """Replace every row of property_embeddings without blocking readers; returns swap attempts used"""
+    async with write_lock(conn):
+        return await _rebuild_table(conn, records, columns, kind)
+
+
+async def _rebuild_table(
+    conn,
+    records: Iterable[Sequence[Any]],
+    columns: List[str],
+    kind: Optional[str]
+) -> int:
+    constraints = await _live_constraints(conn)
+    indexes = await _live_indexes(conn)
+    sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", TABLE)
+
+    await _build_shadow(conn, records, columns, constraints, indexes, kind)
+
+    index_names = [name for name, _ in indexes] + [ANN_INDEX_NAME]
+    attempts = max(1, PGVECTOR_SWAP_ATTEMPTS)
+    attempt = 1
+    while True:
+        try:
+            await _swap(conn, sequence, constraints, index_names)
+            return attempt
+        except asyncpg.exceptions.LockNotAvailableError:
+            if attempt >= attempts:
+                raise
+            print(f"⚠️ {TABLE} is busy; retrying the shadow table swap ({attempt}/{attempts})")
+            await asyncio.sleep(0.1 * attempt)
+            attempt += 1
+
+
+async def replace_rows(
+    conn,
+    property_ids: Iterable[int],
+    records: Iterable[Sequence[Any]],
+    columns: List[str]
+):
+    """Delete the rows of `property_ids` and insert `records` in their place, atomically"""
+    async with conn.transaction():
+        await conn.execute(WRITE_XACT_LOCK_SQL, TABLE)
+        await conn.execute(f"DELETE FROM {TABLE} WHERE property_id = ANY($1::integer[])", sorted(set(property_ids)))
+        await conn.copy_records_to_table(TABLE, records=records, columns=columns)
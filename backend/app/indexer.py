@@ -0,0 +1,69 @@
+"""
+Standalone property indexer: syncs the catalog from the chain and publishes
+vector store snapshots for the API workers to follow.
+
+Run it beside the API with INDEX_ROLE=follower on the workers, so no worker
+crawls the chain itself.
+
+Usage (from backend/):
+    python app/indexer.py                  # sync once and exit
+    python app/indexer.py --interval 300   # keep syncing every 5 minutes
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.blockchain import blockchain_service
+from app.services.leader import leader_lock
+from app.services.sync_state import apply_sync_delta
+from app.services.vector_store import vector_store
+
+
+async def sync_once() -> int:
+    delta = await blockchain_service.sync_properties()
+    count = await apply_sync_delta(vector_store, delta)
+    if count:
+        print(f"✅ {count} properties indexed")
+    else:
+        print("⚠️ No properties found")
+    return count
+
+
+async def run(interval: float = 0):
+    if not leader_lock.acquire():
+        print(f"❌ Another process already leads indexing ({leader_lock.path}); run the API workers with INDEX_ROLE=follower")
+        return
+
+    await blockchain_service.open()
+    try:
+        await vector_store.load()
+        while True:
+            try:
+                await sync_once()
+            except Exception as e:
+                if interval <= 0:
+                    raise
+                print(f"❌ Sync failed, retrying in {interval:.0f}s: {e}")
+            if interval <= 0:
+                break
+            await asyncio.sleep(interval)
+    finally:
+        await blockchain_service.close()
+        leader_lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build vector store snapshots for the API workers")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Seconds between syncs; 0 syncs once and exits")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.interval))
+
+
+if __name__ == "__main__":
+    main()
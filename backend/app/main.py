@@ -5,11 +5,16 @@ FastAPI application with RAG chatbot and property recommendations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
-from app.routers import chat, search, admin
+from app.routers import chat, search, admin, events
 from app.services.vector_store import vector_store
 from app.services.knowledge_store import knowledge_store
 from app.services.blockchain import blockchain_service
+from app.services.embedding_cache import embedding_cache
+from app.services.leader import leader_lock
+from app.services.search_executor import search_executor
+from app.services.sync_state import apply_sync_delta
 from app.db.init_pgvector import run_pgvector_migrations
 import os
 
@@ -22,35 +27,64 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting StackNStay API...")
     
-    print("🔗 Fetching fresh data from blockchain and IPFS...")
+    # Shared HTTP pool for all Stacks / IPFS traffic
+    await blockchain_service.open()
+
+    # One process (per host) crawls the chain and publishes snapshots; the rest follow them
+    role = leader_lock.resolve_role()
+    print(f"🧭 Index role: {role} (pid {os.getpid()})")
+    
     try:
         # If a DATABASE_URL is configured, ensure pgvector schema exists.
         database_url = os.getenv("DATABASE_URL")
-        if database_url:
+        if database_url and role == "leader":
             print("🔧 DATABASE_URL detected — running pgvector migrations (if needed)")
             await run_pgvector_migrations(database_url)
 
-        # Index Knowledge Base
-        print("📚 Indexing knowledge base...")
-        await knowledge_store.index_knowledge_base()
+        # Index Knowledge Base on the leader; followers read what it saved
+        if role == "leader":
+            print("📚 Indexing knowledge base...")
+            await knowledge_store.index_knowledge_base()
+        elif not await asyncio.to_thread(knowledge_store.load):
+            print("📚 No saved knowledge base yet; indexing it here")
+            await knowledge_store.index_knowledge_base()
 
-        # Index Properties
-        properties = await blockchain_service.get_all_properties()
+        # Index Properties: start from the saved index and apply only what changed on-chain
+        await vector_store.load()
         
-        if properties:
-            await vector_store.index_properties(properties)
-            print(f"✅ Successfully indexed {len(properties)} properties")
-            vector_store.save()
+        if role == "leader":
+            print("🔗 Fetching fresh data from blockchain and IPFS...")
+            delta = await blockchain_service.sync_properties()
+            count = await apply_sync_delta(vector_store, delta)
+            if count:
+                print(f"✅ {count} properties indexed")
+            else:
+                print("⚠️ No properties found")
         else:
-            print("⚠️ No properties found")
+            print("📡 Serving the leader's snapshots; skipping chain sync")
+
+        # Open database connections and prepare the search path before the first request
+        if hasattr(vector_store, "warmup"):
+            await vector_store.warmup()
             
     except Exception as e:
         print(f"❌ Error during startup: {e}")
+
+    # Pick up generations published by the leader, the indexer or another worker
+    watcher = asyncio.create_task(vector_store.watch_snapshots()) if hasattr(vector_store, "watch_snapshots") else None
     
     yield
     
     # Shutdown
     print("👋 Shutting down StackNStay API...")
+    if watcher:
+        watcher.cancel()
+    leader_lock.release()
+    search_executor.shutdown()
+    if hasattr(vector_store, "close"):
+        await vector_store.close()
+    await blockchain_service.close()
+    embedding_cache.close()
 
 
 # Create FastAPI app
@@ -79,6 +113,7 @@ app.add_middleware(
 app.include_router(chat.router)
 app.include_router(search.router)
 app.include_router(admin.router)
+app.include_router(events.router)
 
 
 @app.get("/")
@@ -92,6 +127,7 @@ async def root():
             "search": "/api/search",
             "recommendations": "/api/recommendations",
             "index": "/api/index",
+            "events": "/api/events/chainhook",
             "docs": "/docs"
         }
     }
@@ -106,17 +142,17 @@ async def trigger_indexing():
         # Index Knowledge Base
         kb_count = await knowledge_store.index_knowledge_base()
         
-        # Index Properties
-        properties = await blockchain_service.get_all_properties()
-        prop_count = 0
-        if properties:
-            prop_count = await vector_store.index_properties(properties)
-            vector_store.save()
+        # Index Properties (incremental)
+        delta = await blockchain_service.sync_properties()
+        prop_count = await apply_sync_delta(vector_store, delta)
             
         return {
             "status": "success",
             "message": "Re-indexing completed",
             "properties_indexed": prop_count,
+            "properties_added": len(delta["added"]),
+            "properties_changed": len(delta["changed"]),
+            "properties_removed": len(delta["removed"]),
             "knowledge_chunks_indexed": kb_count
         }
     except Exception as e:
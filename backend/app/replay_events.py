@@ -0,0 +1,69 @@
+"""
+Replay recorded chainhook payloads through the event ingestion pipeline.
+
+Usage (from backend/):
+    python app/replay_events.py tests/fixtures/chainhook/*.json --dry-run
+    python app/replay_events.py payload.json                 # apply in-process
+    python app/replay_events.py payload.json --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+
+from app.services.chain_events import chain_event_processor, CHAINHOOK_AUTH_TOKEN
+
+
+async def replay(paths, url=None, dry_run=False, contract_address=None):
+    if contract_address:
+        chain_event_processor.blockchain.contract_address = contract_address
+
+    if not (dry_run or url):
+        # Applying in-process: start from the saved index, as the API would
+        await chain_event_processor.store.load()
+
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+
+        print(f"\n📼 Replaying {path}")
+
+        if dry_run:
+            for action in chain_event_processor.extract_actions(payload):
+                seen = " (already applied)" if chain_event_processor.ledger.seen(action["key"]) else ""
+                print(f"   {action}{seen}")
+            continue
+
+        if url:
+            headers = {"Authorization": f"Bearer {CHAINHOOK_AUTH_TOKEN}"} if CHAINHOOK_AUTH_TOKEN else {}
+            async with httpx.AsyncClient() as client:
+                response = await client.post(f"{url.rstrip('/')}/api/events/chainhook", json=payload, headers=headers)
+            print(f"   {response.status_code}: {response.text}")
+        else:
+            summary = await chain_event_processor.ingest(payload)
+            print(f"   ✅ {summary}")
+
+    await chain_event_processor.blockchain.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded chainhook payloads")
+    parser.add_argument("paths", nargs="+", help="Payload JSON files")
+    parser.add_argument("--url", help="POST to a running API instead of applying in-process")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the actions each payload maps to")
+    parser.add_argument("--contract-address", default=os.getenv("STACKS_CONTRACT_ADDRESS"),
+                        help="Deployer address the fixtures were recorded against")
+    args = parser.parse_args()
+
+    asyncio.run(replay(args.paths, url=args.url, dry_run=args.dry_run, contract_address=args.contract_address))
+
+
+if __name__ == "__main__":
+    main()
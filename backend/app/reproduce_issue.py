@@ -12,11 +12,7 @@ import asyncio
 
 async def main():
     print("📂 Loading vector store...")
-    maybe = vector_store.load()
-    if asyncio.iscoroutine(maybe):
-        loaded = await maybe
-    else:
-        loaded = maybe
+    loaded = await vector_store.load()
 
     if not loaded:
         print("❌ Failed to load vector store. Is the backend running/initialized?")
@@ -5,6 +5,7 @@ Handles administrative tasks like re-indexing
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from app.services.vector_store import vector_store
 from app.services.blockchain import blockchain_service
+from app.services.sync_state import apply_sync_delta
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -26,10 +27,10 @@ async def run_reindex():
     """
     print("🔄 Admin triggered re-index...")
     try:
-        properties = await blockchain_service.get_all_properties()
-        if properties:
-            await vector_store.index_properties(properties)
-            print(f"✅ Re-index complete. Indexed {len(properties)} properties.")
+        delta = await blockchain_service.sync_properties()
+        count = await apply_sync_delta(vector_store, delta)
+        if count:
+            print(f"✅ Re-index complete. {count} properties indexed.")
         else:
             print("⚠️ Re-index found 0 properties.")
     except Exception as e:
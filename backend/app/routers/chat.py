@@ -6,7 +6,6 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional, TypedDict
 import os
-import asyncio
 from dotenv import load_dotenv
 
 from langgraph.graph import StateGraph, END
@@ -366,18 +365,12 @@ async def chat(request: ChatRequest):
         
         if not vector_store.index:
             print("⚠️ Vector store not loaded, attempting to load...")
-            maybe = vector_store.load()
-            if asyncio.iscoroutine(maybe):
-                loaded = await maybe
-            else:
-                loaded = maybe
+            loaded = await vector_store.load()
             print(f"Load result: {loaded}")
             print(f"After load - metadata count: {len(vector_store.property_metadata)}")
 
         if not knowledge_store.index:
-            maybe_k = knowledge_store.load()
-            if asyncio.iscoroutine(maybe_k):
-                await maybe_k
+            knowledge_store.load()
         
         # Create conversation ID if not provided
         conversation_id = request.conversation_id or f"conv_{os.urandom(8).hex()}"
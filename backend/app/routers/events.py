@@ -0,0 +1,39 @@
+"""
+Chain Events Router
+Webhook for chainhook-style block payloads (push-based index updates)
+"""
+import hmac
+from fastapi import APIRouter, HTTPException, Header, Body
+from typing import Dict, Any, Optional
+
+from app.services import chain_events
+from app.services.chain_events import chain_event_processor
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+def verify_authorization(authorization: Optional[str]):
+    """Chainhook sends the configured `authorization_header` verbatim"""
+    token = chain_events.CHAINHOOK_AUTH_TOKEN
+    if not token:
+        raise HTTPException(status_code=503, detail="Event ingestion is not configured (CHAINHOOK_AUTH_TOKEN)")
+    if not authorization or not hmac.compare_digest(authorization, f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Invalid authorization")
+
+
+@router.post("/chainhook")
+async def ingest_chainhook(
+    payload: Dict[str, Any] = Body(...),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Apply escrow, reputation and badge contract events without a full crawl
+    """
+    verify_authorization(authorization)
+
+    try:
+        summary = await chain_event_processor.ingest(payload)
+        return {"status": "success", **summary}
+    except Exception as e:
+        print(f"❌ Event ingestion failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,13 +3,17 @@ Search & Recommendations Router
 Handles semantic search and property recommendations
 """
 from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 import asyncio
 
 from app.services.vector_store import vector_store
 from app.services.blockchain import blockchain_service
 from app.services.knowledge_store import knowledge_store
+from app.services.embedding_cache import embedding_cache
+from app.services.embeddings import embedding_service
+from app.services.search_executor import search_executor
+from app.services.sync_state import apply_sync_delta
 
 router = APIRouter(prefix="/api", tags=["search"])
 
@@ -22,6 +26,8 @@ class SearchRequest(BaseModel):
     query: str
     limit: int = 10
     filters: Optional[Dict[str, Any]] = None
+    ef_search: Optional[int] = Field(None, ge=1)  # HNSW search breadth (higher = better recall, slower)
+    nprobe: Optional[int] = Field(None, ge=1)  # IVF lists probed per query
 
 
 class RecommendationsRequest(BaseModel):
@@ -45,13 +51,9 @@ async def semantic_search(request: SearchRequest):
     Semantic search for properties
     """
     try:
-        # Ensure vector store is loaded (sync or async)
+        # Ensure vector store is loaded
         if not vector_store.index:
-            maybe = vector_store.load()
-            if asyncio.iscoroutine(maybe):
-                loaded = await maybe
-            else:
-                loaded = maybe
+            loaded = await vector_store.load()
             if not loaded:
                 raise HTTPException(
                     status_code=503,
@@ -62,7 +64,9 @@ async def semantic_search(request: SearchRequest):
         results = await vector_store.search(
             query=request.query,
             k=request.limit,
-            filters=request.filters
+            filters=request.filters,
+            ef_search=request.ef_search,
+            nprobe=request.nprobe
         )
         
         return {
@@ -82,13 +86,9 @@ async def get_recommendations(request: RecommendationsRequest):
     Get similar property recommendations
     """
     try:
-        # Ensure vector store is loaded (sync or async)
+        # Ensure vector store is loaded
         if not vector_store.index:
-            maybe = vector_store.load()
-            if asyncio.iscoroutine(maybe):
-                loaded = await maybe
-            else:
-                loaded = maybe
+            loaded = await vector_store.load()
             if not loaded:
                 raise HTTPException(
                     status_code=503,
@@ -119,24 +119,26 @@ async def index_properties(background_tasks: BackgroundTasks):
     """
     try:
         # Fetch properties from blockchain
-        print("🔄 Fetching properties from blockchain...")
-        properties = await blockchain_service.get_all_properties()
+        print("🔄 Syncing properties from blockchain...")
+        delta = await blockchain_service.sync_properties()
         
-        if not properties:
+        # Apply the delta to the index (removals too, even if nothing is left)
+        count = await apply_sync_delta(vector_store, delta)
+        
+        if not count:
             return IndexResponse(
                 status="warning",
                 properties_indexed=0,
                 message="No properties found on blockchain"
             )
         
-        # Index properties
-        print(f"📝 Indexing {len(properties)} properties...")
-        count = await vector_store.index_properties(properties)
-        
         return IndexResponse(
             status="success",
             properties_indexed=count,
-            message=f"Successfully indexed {count} properties"
+            message=(
+                f"Successfully indexed {count} properties "
+                f"({len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['removed'])} removed)"
+            )
         )
         
     except Exception as e:
@@ -153,11 +155,52 @@ async def index_status():
         "indexed": vector_store.index is not None,
         "property_count": len(vector_store.property_metadata),
         "index_dimension": vector_store.dimension if vector_store.index else None,
+        "vector_index": vector_store.index_stats(),
+        "search_executor": search_executor.stats(),
         "knowledge_indexed": knowledge_store.index is not None,
-        "knowledge_chunks": len(knowledge_store.knowledge_chunks)
+        "knowledge_chunks": len(knowledge_store.knowledge_chunks),
+        "ipfs_cache": blockchain_service.ipfs_cache.stats(),
+        "ipfs_gateways": blockchain_service.ipfs_fetcher.stats(),
+        "read_cache": blockchain_service.read_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embeddings": embedding_service.stats()
+    }
+
+
+@router.get("/index/recall")
+async def index_recall(k: int = 10, sample: int = 200, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    """
+    Measure recall@k of the ANN index against exact search
+    """
+    if not hasattr(vector_store, "measure_recall"):
+        raise HTTPException(status_code=400, detail="Recall is only measured for the FAISS backend")
+    recall = await asyncio.to_thread(vector_store.measure_recall, k, sample, ef_search, nprobe)
+    if recall is None:
+        raise HTTPException(status_code=503, detail="Vector store not initialized. Please run /api/index first.")
+    return {
+        "index_type": vector_store.index_type,
+        "k": k,
+        "sample": sample,
+        "ef_search": ef_search,
+        "nprobe": nprobe,
+        "recall": recall
     }
 
 
+@router.get("/index/explain")
+async def index_explain(k: int = 5, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+    """
+    Check via EXPLAIN that Postgres searches through the ANN index
+    """
+    if not hasattr(vector_store, "explain_search"):
+        raise HTTPException(status_code=400, detail="Query plans are only available for the pgvector backend")
+    try:
+        return await vector_store.explain_search(k=k, ef_search=ef_search, nprobe=nprobe)
+    except Exception as e:
+        print(f"Error explaining search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/index/knowledge")
 async def index_knowledge():
     """
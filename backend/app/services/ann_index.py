@@ -0,0 +1,263 @@
+"""
+ANN Index Factory
+Builds the FAISS index behind VectorStore (Flat, HNSW, IVF-Flat or IVF-PQ),
+picks a type from the catalog size when VECTOR_INDEX_TYPE=auto, and measures
+recall@k of the approximate index against exact search.
+
+Every index is addressed by property_id. IVF indexes store the IDs natively;
+Flat and HNSW are wrapped in IndexIDMap2, whose storage positions are the
+"inner keys" that ID selectors and reconstruction operate on.
+
+HNSW can't delete from its graph. Removed or replaced listings stay in it as
+tombstones: a replacement vector is appended under a fresh inner key, the
+newest key for a property_id is the live one, and searches exclude the rest
+with an ID selector. Once tombstones pass HNSW_TOMBSTONE_MAX_FRACTION of the
+index, VectorStore compacts it by rebuilding from the live vectors.
+"""
+import os
+import math
+from typing import Optional, Tuple
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")  # auto, flat, hnsw, ivf_flat, ivf_pq
+AUTO_FLAT_MAX = int(os.getenv("AUTO_FLAT_MAX", "20000"))  # exact search up to this many listings
+AUTO_HNSW_MAX = int(os.getenv("AUTO_HNSW_MAX", "250000"))  # HNSW up to here, IVF-PQ beyond
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+HNSW_TOMBSTONE_MAX_FRACTION = float(os.getenv("HNSW_TOMBSTONE_MAX_FRACTION", "0.2"))  # compact beyond this
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "64"))  # sub-quantizers; must divide the dimension
+PQ_NBITS = 8
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+MIN_POINTS_PER_CENTROID = 39  # below this FAISS k-means training degrades
+
+
+def choose_index_type(count: int, requested: Optional[str] = None) -> str:
+    """Resolve `auto` by catalog size; fall back when there's too little data to train IVF"""
+    requested = requested or VECTOR_INDEX_TYPE
+    kind = requested.lower()
+    if kind == "auto":
+        if count <= AUTO_FLAT_MAX:
+            return "flat"
+        return "hnsw" if count <= AUTO_HNSW_MAX else "ivf_pq"
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown VECTOR_INDEX_TYPE {requested!r}; expected auto or one of {INDEX_TYPES}")
+    if kind == "ivf_pq" and count < (1 << PQ_NBITS) * MIN_POINTS_PER_CENTROID:
+        kind = "ivf_flat"
+    if kind == "ivf_flat" and count < 2 * MIN_POINTS_PER_CENTROID:
+        kind = "flat"
+    return kind
+
+
+def _nlist(count: int) -> int:
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_m(dimension: int) -> int:
+    m = min(PQ_M, dimension)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, kind: str) -> faiss.Index:
+    """Create, train and fill an inner-product index of the given type"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    dimension = vectors.shape[1]
+
+    if kind in ("ivf_flat", "ivf_pq"):
+        quantizer = faiss.IndexFlatIP(dimension)
+        nlist = _nlist(len(vectors))
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_m(dimension), PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(IVF_NPROBE, nlist)
+        # Hashtable direct map: reconstruct by ID and still allow remove_ids
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.add_with_ids(vectors, ids)
+        return index
+
+    if kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        inner.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        inner = faiss.IndexFlatIP(dimension)
+    index = faiss.IndexIDMap2(inner)
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+def unwrap(index: faiss.Index) -> Tuple[faiss.Index, Optional[np.ndarray]]:
+    """(searchable inner index, inner key -> property_id array or None when keys are property IDs)"""
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index), faiss.vector_to_array(index.id_map)
+    return index, None
+
+
+def index_kind(index: faiss.Index) -> str:
+    inner, _ = unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def prepare_loaded(index: faiss.Index) -> faiss.Index:
+    """Restore state that isn't serialized (IVF direct map)"""
+    if isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def inner_keys(id_map: Optional[np.ndarray], property_ids: np.ndarray) -> np.ndarray:
+    """
+    Inner keys (storage positions under IndexIDMap2) for the given property
+    IDs. A property_id stored more than once (HNSW replacements) resolves to
+    its newest key; the older ones are tombstones.
+    """
+    property_ids = np.asarray(property_ids, dtype=np.int64)
+    if id_map is None:
+        return property_ids
+    order = np.argsort(id_map, kind="stable")
+    return order[np.searchsorted(id_map, property_ids, side="right", sorter=order) - 1].astype(np.int64)
+
+
+def exclude_selector(tombstones: np.ndarray) -> faiss.IDSelector:
+    """Selector for every inner key except `tombstones`"""
+    tombstones = np.ascontiguousarray(tombstones, dtype=np.int64)
+    batch = faiss.IDSelectorBatch(tombstones)
+    selector = faiss.IDSelectorNot(batch)
+    selector.referenced_objects = [batch]  # IDSelectorNot doesn't own its inner selector
+    return selector
+
+
+def search_params(
+    index: faiss.Index,
+    selector: Optional[faiss.IDSelector] = None,
+    ef_search: Optional[int] = None,
+    nprobe: Optional[int] = None,
+) -> Optional[faiss.SearchParameters]:
+    inner, _ = unwrap(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or inner.hnsw.efSearch
+    elif isinstance(inner, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe or inner.nprobe
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def search(
+    index: faiss.Index,
+    queries: np.ndarray,
+    k: int,
+    keys: Optional[np.ndarray] = None,
+    ef_search: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    exclude: Optional[faiss.IDSelector] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search the inner index with per-request parameters (IndexIDMap2 in
+    faiss 1.7.4 rejects search params) and translate results to property IDs.
+    `keys` restricts the search to those inner keys; otherwise `exclude`
+    (see exclude_selector) skips tombstones.
+    """
+    inner, id_map = unwrap(index)
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(keys, dtype=np.int64)) if keys is not None else exclude
+    params = search_params(index, selector, ef_search, nprobe)
+    scores, found = inner.search(np.ascontiguousarray(queries, dtype=np.float32), k, params=params)
+    if id_map is not None:
+        found = np.where(found >= 0, id_map[np.maximum(found, 0)], -1)
+    return scores, found
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    inner, _ = unwrap(index)
+    return not isinstance(inner, faiss.IndexHNSW)
+
+
+def all_vectors(index: faiss.Index, keys: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (vectors, property_ids) for everything stored, or only for the inner
+    `keys` given (e.g. the live keys of an index with tombstones);
+    approximate for IVF-PQ
+    """
+    inner, id_map = unwrap(index)
+    if keys is not None:
+        keys = np.ascontiguousarray(keys, dtype=np.int64)
+        vectors = inner.reconstruct_batch(keys) if len(keys) else np.empty((0, inner.d), dtype=np.float32)
+        return vectors, (id_map[keys] if id_map is not None else keys)
+    if id_map is not None:
+        return inner.reconstruct_n(0, inner.ntotal), id_map
+    invlists = inner.invlists
+    ids = np.concatenate([np.empty(0, dtype=np.int64)] + [
+        faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+        for list_no in range(inner.nlist)
+        if invlists.list_size(list_no)
+    ]).astype(np.int64)
+    vectors = inner.reconstruct_batch(ids) if len(ids) else np.empty((0, inner.d), dtype=np.float32)
+    return vectors, ids
+
+
+def remove_ids(index: faiss.Index, property_ids: np.ndarray) -> faiss.Index:
+    """
+    Remove IDs in place. HNSW is left untouched: its entries for these IDs
+    become tombstones once the caller stops treating them as live.
+    """
+    if not supports_remove(index):
+        return index
+    property_ids = np.ascontiguousarray(property_ids, dtype=np.int64)
+    # The IVF hashtable direct map only accepts an IDSelectorArray
+    index.remove_ids(faiss.IDSelectorArray(len(property_ids), faiss.swig_ptr(property_ids)))
+    return index
+
+
+def recall_at_k(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    k: int = 10,
+    sample: int = 200,
+    ef_search: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    exclude: Optional[faiss.IDSelector] = None,
+) -> float:
+    """
+    Fraction of the exact top-k (brute force over `vectors`) that the index
+    returns, averaged over up to `sample` stored vectors used as queries.
+    """
+    if len(vectors) == 0:
+        return 1.0
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    queries = np.ascontiguousarray(vectors[picks], dtype=np.float32)
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    _, truth = exact.search(queries, k)
+    truth = np.asarray(ids)[truth]
+
+    _, found = search(index, queries, k, ef_search=ef_search, nprobe=nprobe, exclude=exclude)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth.tolist(), found.tolist()))
+    return hits / (len(queries) * k)
@@ -0,0 +1,272 @@
+"""
+Attribute Index
+Columnar copy of the filterable property attributes, built at index time so
+search filters compile to a vectorized boolean mask instead of a per-candidate
+Python check. Rows follow the order the caller builds it in (metadata row
+order for VectorStore). A delta derives the next index with derive(), which
+copies the columns and only re-reads the rows the delta touched.
+"""
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+import numpy as np
+
+
+def _resized(column: np.ndarray, size: int, fill: Any) -> np.ndarray:
+    """Copy of `column` truncated or padded with `fill` to `size` rows"""
+    out = np.full((size,) + column.shape[1:], fill, dtype=column.dtype)
+    keep = min(size, len(column))
+    out[:keep] = column[:keep]
+    return out
+
+# Filter keys the mask understands; anything else is ignored, as in VectorStore._matches_filters
+FILTER_KEYS = ("min_price", "max_price", "location", "city", "country", "bedrooms", "guests", "bathrooms", "amenities")
+
+
+def _number(value: Any) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number
+
+
+def _lower(value: Any) -> str:
+    return value.lower() if isinstance(value, str) else ""
+
+
+_WORD = re.compile(r"\w+")
+
+
+def amenity_list(value: Any) -> List[str]:
+    """Lowercased amenities from a list or a comma-separated string"""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [a.strip().lower() for a in value if isinstance(a, str) and a.strip()]
+
+
+class _Dictionary:
+    """Dictionary encoding of a low-cardinality string column"""
+
+    def __init__(self, values: Iterable[str]):
+        self.vocab: Dict[str, int] = {}
+        self.codes = np.fromiter(
+            (self.vocab.setdefault(v, len(self.vocab)) if v else -1 for v in values),
+            dtype=np.int32,
+        )
+
+    def derive(self, size: int, rows: np.ndarray, values: Iterable[str]) -> "_Dictionary":
+        """Copy resized to `size` with `rows` set to `values`; the vocabulary only grows"""
+        new = _Dictionary(())
+        new.vocab = dict(self.vocab)
+        new.codes = _resized(self.codes, size, -1)
+        new.codes[rows] = np.fromiter(
+            (new.vocab.setdefault(v, len(new.vocab)) if v else -1 for v in values),
+            dtype=np.int32, count=len(rows),
+        )
+        return new
+
+    def equals(self, value: str) -> np.ndarray:
+        code = self.vocab.get(value.lower())
+        if code is None:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == code
+
+    def contains(self, term: str) -> np.ndarray:
+        """Rows whose value contains `term` (evaluated once per distinct value)"""
+        matching = [code for value, code in self.vocab.items() if term in value]
+        return np.isin(self.codes, matching)
+
+
+class _TokenIndex:
+    """
+    Inverted index from the words of a free-text column to the rows holding
+    them. A substring search only has to check the rows whose words contain
+    every word of the term, found by scanning the vocabulary instead of the rows.
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        self.postings: Dict[str, Set[int]] = {}
+        for row, text in enumerate(texts):
+            for word in set(_WORD.findall(text)):
+                self.postings.setdefault(word, set()).add(row)
+
+    def derive(self, old_texts: Dict[int, str], new_texts: Dict[int, str]) -> "_TokenIndex":
+        """Copy with `old_texts` (row -> text) unindexed and `new_texts` indexed; untouched postings are shared"""
+        new = _TokenIndex(())
+        new.postings = dict(self.postings)
+        copied: Set[str] = set()
+
+        def postings(word: str) -> Set[int]:
+            if word not in copied:
+                copied.add(word)
+                new.postings[word] = set(new.postings.get(word, ()))
+            return new.postings[word]
+
+        for row, text in old_texts.items():
+            for word in set(_WORD.findall(text)):
+                postings(word).discard(row)
+        for row, text in new_texts.items():
+            for word in set(_WORD.findall(text)):
+                postings(word).add(row)
+        for word in copied:
+            if not new.postings[word]:
+                del new.postings[word]
+        return new
+
+    def candidates(self, term: str) -> Optional[Set[int]]:
+        """
+        Rows that may contain `term`: each of its words lies inside one word
+        of the text. None when the term has no words to look up.
+        """
+        rows: Optional[Set[int]] = None
+        for word in set(_WORD.findall(term)):
+            matched: Set[int] = set()
+            for token, token_rows in self.postings.items():
+                if word in token:
+                    matched |= token_rows
+            rows = matched if rows is None else rows & matched
+            if not rows:
+                break
+        return rows
+
+
+class AttributeIndex:
+    """NumPy columns for price, capacity, city/country codes and an amenity bitset"""
+
+    def __init__(self, properties: List[Dict[str, Any]]):
+        self.size = len(properties)
+        self.property_ids = np.fromiter(
+            (p["property_id"] if p.get("property_id") is not None else -1 for p in properties),
+            dtype=np.int64, count=self.size,
+        )
+        # Missing prices stay NaN: treated as 0 for min_price and as unbounded for max_price
+        self.price = np.fromiter((_number(p.get("price_per_night")) for p in properties), dtype=np.float64, count=self.size)
+        self.bedrooms = self._capacity(properties, "bedrooms")
+        self.guests = self._capacity(properties, "max_guests")
+        self.bathrooms = self._capacity(properties, "bathrooms")
+        self.city = _Dictionary(_lower(p.get("location_city")) for p in properties)
+        self.country = _Dictionary(_lower(p.get("location_country")) for p in properties)
+        # Free text is only needed for the fuzzy location filter, and is looked up through its words
+        self.text = [self._text(p) for p in properties]
+        self.words = _TokenIndex(self.text)
+
+        self.amenity_vocab: Dict[str, int] = {}
+        self.amenity_bits = np.zeros((self.size, 1), dtype=np.uint64)
+        self._set_amenities(np.arange(self.size), properties)
+
+    def derive(self, properties: List[Dict[str, Any]], rows: Iterable[int]) -> "AttributeIndex":
+        """
+        Index for `properties` where only `rows` differ from this one (rows
+        past the old size are new; rows past the new size are dropped).
+        Copies the columns and re-reads just those rows, so a delta costs
+        O(rows) Python work plus a vectorized copy instead of a full rebuild.
+        """
+        new = AttributeIndex.__new__(AttributeIndex)
+        new.size = size = len(properties)
+        rows = np.array(sorted({row for row in rows if row < size} | set(range(self.size, size))), dtype=np.int64)
+        touched = [properties[row] for row in rows]
+
+        new.property_ids = _resized(self.property_ids, size, -1)
+        new.property_ids[rows] = [p["property_id"] if p.get("property_id") is not None else -1 for p in touched]
+        new.price = _resized(self.price, size, math.nan)
+        new.price[rows] = [_number(p.get("price_per_night")) for p in touched]
+        new.bedrooms = _resized(self.bedrooms, size, 0.0)
+        new.bedrooms[rows] = new._capacity(touched, "bedrooms")
+        new.guests = _resized(self.guests, size, 0.0)
+        new.guests[rows] = new._capacity(touched, "max_guests")
+        new.bathrooms = _resized(self.bathrooms, size, 0.0)
+        new.bathrooms[rows] = new._capacity(touched, "bathrooms")
+        new.city = self.city.derive(size, rows, (_lower(p.get("location_city")) for p in touched))
+        new.country = self.country.derive(size, rows, (_lower(p.get("location_country")) for p in touched))
+        new.text = self.text[:size] + [""] * (size - len(self.text))
+        for row, p in zip(rows.tolist(), touched):
+            new.text[row] = self._text(p)
+        # Rewritten rows and rows past the new size leave the word index
+        stale = [row for row in rows.tolist() if row < self.size] + list(range(size, self.size))
+        new.words = self.words.derive(
+            {row: self.text[row] for row in stale},
+            {row: new.text[row] for row in rows.tolist()},
+        )
+
+        new.amenity_vocab = dict(self.amenity_vocab)
+        new.amenity_bits = _resized(self.amenity_bits, size, 0)
+        new.amenity_bits[rows] = 0
+        new._set_amenities(rows, touched)
+        return new
+
+    @staticmethod
+    def _text(prop: Dict[str, Any]) -> str:
+        return f"{_lower(prop.get('title'))}\x00{_lower(prop.get('description'))}"
+
+    def _set_amenities(self, rows: np.ndarray, properties: List[Dict[str, Any]]):
+        """Set the amenity bits of `rows` (currently clear), widening the bitset for new amenities"""
+        amenity_lists = [amenity_list(p.get("amenities")) for p in properties]
+        for amenities in amenity_lists:
+            for amenity in amenities:
+                self.amenity_vocab.setdefault(amenity, len(self.amenity_vocab))
+        words = max(1, (len(self.amenity_vocab) + 63) // 64)
+        if words > self.amenity_bits.shape[1]:
+            widened = np.zeros((self.amenity_bits.shape[0], words), dtype=np.uint64)
+            widened[:, :self.amenity_bits.shape[1]] = self.amenity_bits
+            self.amenity_bits = widened
+        for row, amenities in zip(rows.tolist(), amenity_lists):
+            for amenity in amenities:
+                bit = self.amenity_vocab[amenity]
+                self.amenity_bits[row, bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+
+    @staticmethod
+    def _capacity(properties: List[Dict[str, Any]], field: str) -> np.ndarray:
+        column = np.fromiter((_number(p.get(field, 0)) for p in properties), dtype=np.float64, count=len(properties))
+        return np.nan_to_num(column, nan=0.0)
+
+    def _amenity_mask(self, required: Any) -> np.ndarray:
+        wanted = np.zeros(self.amenity_bits.shape[1], dtype=np.uint64)
+        for amenity in amenity_list(required):
+            bit = self.amenity_vocab.get(amenity)
+            if bit is None:
+                return np.zeros(self.size, dtype=bool)
+            wanted[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return np.all((self.amenity_bits & wanted) == wanted, axis=1)
+
+    def _text_contains(self, term: str) -> np.ndarray:
+        """Rows whose title or description contains `term`"""
+        candidates = self.words.candidates(term)
+        if candidates is None:
+            return np.fromiter((term in text for text in self.text), dtype=bool, count=self.size)
+        matched = np.zeros(self.size, dtype=bool)
+        if _WORD.fullmatch(term):
+            # A single word is contained exactly when one of the row's words contains it
+            matched[list(candidates)] = True
+        else:
+            matched[[row for row in candidates if term in self.text[row]]] = True
+        return matched
+
+    def compile(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for `filters`, or None when nothing filterable is set"""
+        if not filters or not any(key in filters for key in FILTER_KEYS):
+            return None
+
+        mask = np.ones(self.size, dtype=bool)
+        if "min_price" in filters:
+            mask &= np.where(np.isnan(self.price), 0.0, self.price) >= filters["min_price"]
+        if "max_price" in filters:
+            mask &= np.where(np.isnan(self.price), math.inf, self.price) <= filters["max_price"]
+        if "location" in filters:
+            term = filters["location"].lower()
+            mask &= self.city.contains(term) | self.country.contains(term) | self._text_contains(term)
+        if "city" in filters:
+            mask &= self.city.equals(filters["city"])
+        if "country" in filters:
+            mask &= self.country.equals(filters["country"])
+        if "bedrooms" in filters:
+            mask &= self.bedrooms >= filters["bedrooms"]
+        if "guests" in filters:
+            mask &= self.guests >= filters["guests"]
+        if "bathrooms" in filters:
+            mask &= self.bathrooms >= filters["bathrooms"]
+        if "amenities" in filters:
+            mask &= self._amenity_mask(filters["amenities"])
+        return mask
@@ -3,11 +3,21 @@ Blockchain Service - Stacks Integration
 Fetches property data from StackNStay smart contract and IPFS
 """
 import os
+import asyncio
+import importlib.util
 import httpx
-import struct
-from typing import Optional, Dict, Any, List
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Awaitable, Iterable
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
+from app.services.clarity import ClarityParser, serialize_principal, serialize_uint
+from app.services.ipfs_cache import IPFSMetadataCache, cid_from_uri
+from app.services.ipfs_fetcher import IPFSFetcher
+from app.services.read_cache import ReadCallCache
+from app.services.host_profiles import HOST_FIELDS, HostProfileTable, profile_fields
+from app.services.sync_state import SyncCheckpoint, SyncDelta, tuple_fingerprint
+
 load_dotenv()
 
 # Configuration
@@ -23,6 +33,24 @@ CONTRACT_DISPUTE = os.getenv("STACKS_CONTRACT_DISPUTE", "stackstay-dispute")
 IPFS_GATEWAY = os.getenv("IPFS_GATEWAY")
 PINATA_JWT = os.getenv("PINATA_JWT")
 
+# Crawl tuning
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))  # property IDs in flight at once
+CRAWL_PER_HOST_LIMIT = int(os.getenv("CRAWL_PER_HOST_LIMIT", "6"))  # concurrent requests per upstream host
+CRAWL_MAX_CONSECUTIVE_MISSES = 3  # stop after this many missing IDs in a row
+
+# Shared HTTP client pool
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 is negotiated via ALPN, so it only kicks in when `h2` is installed and the upstream offers it
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+
+# Per-endpoint timeouts (seconds)
+STACKS_READ_TIMEOUT = float(os.getenv("STACKS_READ_TIMEOUT", "10"))  # property reads
+STACKS_PROFILE_TIMEOUT = float(os.getenv("STACKS_PROFILE_TIMEOUT", "5"))  # badges / reputation
+IPFS_TIMEOUT = float(os.getenv("IPFS_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
 # Badge type constants (matching Clarity contract)
 BADGE_TYPES = {
     1: "first-booking",
@@ -36,132 +64,6 @@ BADGE_TYPES = {
 }
 
 
-class ClarityParser:
-    """Simplified Clarity value parser"""
-    
-    @staticmethod
-    def parse_optional(hex_str: str) -> Optional[Dict[str, Any]]:
-        """Parse Clarity Optional type"""
-        if not hex_str.startswith("0x"):
-            return None
-            
-        # 0x09 = Some, 0x0a = None
-        type_byte = hex_str[2:4]
-        
-        if type_byte == "0a":  # None
-            return None
-        elif type_byte == "09":  # Some
-            # The rest is the wrapped value
-            return ClarityParser.parse_tuple(hex_str[4:])
-        else:
-            return None
-    
-    @staticmethod
-    def parse_tuple(hex_str: str) -> Optional[Dict[str, Any]]:
-        """
-        Parse Clarity Tuple type
-        This is a simplified parser for the property tuple structure
-        """
-        try:
-            # For our property tuple, we'll use a hybrid approach:
-            # 1. Try to extract metadata-uri string (both ipfs:// and bare hashes)
-            # 2. Try to extract uint values
-            # 3. Return a best-effort parsed result
-            
-            result = {}
-            
-            # Extract metadata-uri
-            # Try format 1: Full URI with "ipfs://" prefix (ASCII: 697066733a2f2f)
-            if "697066733a2f2f" in hex_str:
-                metadata_uri = ClarityParser._extract_ascii_string(hex_str, "697066733a2f2f")
-                if metadata_uri:
-                    result["metadata_uri"] = metadata_uri
-                    print(f"📝 Extracted ipfs:// URI: {metadata_uri}")
-            
-            # Try format 2: Bare IPFS hash starting with "Qm" (ASCII: 516d)
-            # This handles cases where contract stores just "QmXXXX..." without ipfs:// prefix
-            if "metadata_uri" not in result and "516d" in hex_str:
-                bare_hash = ClarityParser._extract_ascii_string(hex_str, "516d")
-                if bare_hash and bare_hash.startswith("Qm") and len(bare_hash) == 46:
-                    # Valid IPFS v0 CID (always 46 chars, starts with Qm)
-                    result["metadata_uri"] = f"ipfs://{bare_hash}"
-                    print(f"📝 Extracted bare IPFS hash: {bare_hash} -> ipfs://{bare_hash}")
-            
-            # Extract owner (principal) - look for principal type (0x05 or 0x06)
-            # Principals start with version byte, we'll extract the address representation
-            owner = ClarityParser._extract_principal(hex_str)
-            if owner:
-                result["owner"] = owner
-            
-            # For uint values (price-per-night, location-tag, created-at),
-            # we need more sophisticated parsing or fallback to defaults
-            # Since Clarity tuples are complex, we'll rely on IPFS metadata for most fields
-            
-            result["active"] = True  # Assume active if we got the property
-            
-            return result if result else None
-            
-        except Exception as e:
-            print(f"❌ Error parsing tuple: {e}")
-            return None
-    
-    @staticmethod
-    def _extract_ascii_string(hex_str: str, start_pattern: str) -> Optional[str]:
-        """Extract ASCII string from hex, starting after a pattern"""
-        try:
-            if start_pattern not in hex_str:
-                return None
-                
-            # Find the pattern
-            start_idx = hex_str.find(start_pattern)
-            
-            # Strings in Clarity have a length prefix (4 bytes = 8 hex chars)
-            # But for simplicity, we'll just extract until we hit non-ASCII
-            
-            # Extract a reasonable chunk (up to 512 chars = 1024 hex chars)
-            chunk_start = start_idx
-            chunk = hex_str[chunk_start:chunk_start + 1024]
-            
-            # Convert hex to bytes and then to string
-            # Take only printable ASCII characters
-            result = ""
-            for i in range(0, len(chunk), 2):
-                if i + 2 > len(chunk):
-                    break
-                byte_hex = chunk[i:i+2]
-                try:
-                    byte_val = int(byte_hex, 16)
-                    # Printable ASCII range
-                    if 32 <= byte_val <= 126:
-                        result += chr(byte_val)
-                    elif byte_val == 0:  # Null terminator
-                        break
-                    else:
-                        # Non-ASCII, might be end of string
-                        if len(result) > 10:  # Only break if we have some content
-                            break
-                except:
-                    break
-            
-            return result if result else None
-            
-        except Exception as e:
-            return None
-    
-    @staticmethod
-    def _extract_principal(hex_str: str) -> Optional[str]:
-        """Extract Stacks principal (address) from hex"""
-        try:
-            # Look for principal type bytes (0x05 for standard, 0x06 for contract)
-            if "05" in hex_str or "06" in hex_str:
-                # This is complex - principals are encoded with version + hash
-                # For now, return a placeholder indicating we found a principal
-                return "ST..."  # Placeholder - proper extraction requires more work
-            return None
-        except Exception as e:
-            return None
-
-
 class BlockchainService:
     """Service for interacting with Stacks blockchain and IPFS"""
     
@@ -174,47 +76,173 @@ class BlockchainService:
         self.contract_dispute = CONTRACT_DISPUTE
         self.ipfs_gateway = IPFS_GATEWAY
         self.parser = ClarityParser()
+        self.crawl_concurrency = max(1, CRAWL_CONCURRENCY)
+        self.per_host_limit = max(1, CRAWL_PER_HOST_LIMIT)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.ipfs_cache = IPFSMetadataCache()
+        self.ipfs_fetcher = IPFSFetcher(
+            lambda: self.client,
+            timeout=self._timeout(IPFS_TIMEOUT),
+            slot=self._host_slot,
+        )
+        self.host_profiles = HostProfileTable()
+        self.read_cache = ReadCallCache(self.read_tip_height)
+        self.checkpoint = SyncCheckpoint()
+
+    def _timeout(self, seconds: float) -> httpx.Timeout:
+        return httpx.Timeout(seconds, connect=min(seconds, HTTP_CONNECT_TIMEOUT))
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Long-lived pooled client shared by every Stacks and IPFS call"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=self._timeout(STACKS_READ_TIMEOUT),
+            )
+        return self._client
+
+    async def open(self):
+        """Create the shared client pool (called from the app lifespan)"""
+        client = self.client
+        print(f"🌐 HTTP client pool ready (http2={HTTP2_ENABLED}, max_connections={HTTP_MAX_CONNECTIONS})")
+        return client
+
+    async def close(self):
+        """Close the shared client pool and drop idle keep-alive connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self.ipfs_cache.close()
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        """Hold one of the per-host request slots for the duration of a call"""
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        async with semaphore:
+            yield
+
+    async def read_tip_height(self) -> Optional[int]:
+        """Current Stacks tip height from /v2/info, or None if the node doesn't report it"""
+        url = f"{self.api_url}/v2/info"
+        async with self._host_slot(url):
+            response = await self.client.get(url, timeout=self._timeout(STACKS_PROFILE_TIMEOUT))
+        response.raise_for_status()
+        height = response.json().get("stacks_tip_height")
+        return height if isinstance(height, int) else None
+
+    async def _call_read(
+        self,
+        contract: str,
+        function: str,
+        arguments: List[str],
+        timeout: float = STACKS_READ_TIMEOUT
+    ) -> str:
+        """
+        Call a read-only contract function and return its Clarity result hex.
+        Results are cached until the chain tip advances.
+        Raises on transport/HTTP errors so callers can tell them apart from empty results.
+        """
+        return await self.read_cache.get_or_call(
+            (contract, function, tuple(arguments)),
+            lambda: self._call_read_uncached(contract, function, arguments, timeout)
+        )
+
+    async def _call_read_uncached(
+        self,
+        contract: str,
+        function: str,
+        arguments: List[str],
+        timeout: float
+    ) -> str:
+        url = f"{self.api_url}/v2/contracts/call-read/{self.contract_address}/{contract}/{function}"
+        
+        async with self._host_slot(url):
+            response = await self.client.post(
+                url,
+                json={
+                    "sender": self.contract_address,
+                    "arguments": arguments
+                },
+                timeout=self._timeout(timeout)
+            )
         
+        response.raise_for_status()
+        data = response.json()
+        if not data.get("okay") or "result" not in data:
+            raise ValueError(f"{function} failed: {data.get('cause', data)}")
+        return data["result"]
+    
+    async def _read_data_var(self, contract: str, name: str, timeout: float = STACKS_READ_TIMEOUT) -> str:
+        """
+        Read a `define-data-var` and return its Clarity value hex.
+        Data vars aren't functions, so they can't go through call-read.
+        Cached alongside read-only calls until the chain tip advances.
+        """
+        return await self.read_cache.get_or_call(
+            (contract, "data-var", name),
+            lambda: self._read_data_var_uncached(contract, name, timeout)
+        )
+
+    async def _read_data_var_uncached(self, contract: str, name: str, timeout: float) -> str:
+        url = f"{self.api_url}/v2/data_var/{self.contract_address}/{contract}/{name}"
+
+        async with self._host_slot(url):
+            response = await self.client.get(url, params={"proof": "0"}, timeout=self._timeout(timeout))
+
+        response.raise_for_status()
+        data = response.json()
+        if "data" not in data:
+            raise ValueError(f"{name} read failed: {data}")
+        return data["data"]
+
+    async def read_property_nonce(self) -> Optional[int]:
+        """Read the property-id-nonce data var (the next property ID), or None if it can't be read"""
+        try:
+            nonce = self.parser.decode(
+                await self._read_data_var(self.contract_escrow, "property-id-nonce")
+            )
+            return nonce if isinstance(nonce, int) else None
+        except Exception as e:
+            print(f"⚠️ Could not read property-id-nonce: {e}")
+            return None
+    
     async def get_property_count(self) -> int:
         """
         Get total number of properties from smart contract
         Reads the property-id-nonce variable
         """
-        try:
-            url = f"{self.api_url}/v2/contracts/call-read/{self.contract_address}/{self.contract_escrow}/property-id-nonce"
-            
-            print(f"\n🔍 Calling property-id-nonce API:")
-            print(f"   URL: {url}")
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    json={
-                        "sender": self.contract_address,
-                        "arguments": []
-                    },
-                    timeout=10.0
-                )
-                
-                print(f"   Status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    print(f"   Response: {data}")
-                    
-                    if data.get("okay") and "result" in data:
-                        result = data["result"]
-                        # Parse uint: 0x0100000000000000000000000000000005 = uint 5
-                        if result.startswith("0x01"):
-                            # Extract last 16 hex chars (8 bytes for uint64)
-                            count = int(result[-16:], 16)
-                            return count
-                    return 0
-                else:
-                    return 0
-                    
-        except Exception as e:
-            return 0
+        return await self.read_property_nonce() or 0
+    
+    async def read_property(self, property_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Read the on-chain property tuple.
+        Returns None only when the contract has no such property; raises on errors.
+        """
+        result = await self._call_read(self.contract_escrow, "get-property", [serialize_uint(property_id)])
+        parsed = self.parser.parse_property(result)
+        if parsed is None:
+            return None
+        
+        return {
+            "property_id": property_id,
+            "owner": parsed["owner"],
+            "metadata_uri": parsed["metadata_uri"],
+            "active": parsed["active"],
+            "price_per_night_ustx": parsed["price_per_night"],
+            "location_tag": parsed["location_tag"],
+            "created_at": parsed["created_at"]
+        }
     
     async def get_property(self, property_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -222,251 +250,454 @@ class BlockchainService:
         Calls the get-property read-only function
         """
         try:
-            url = f"{self.api_url}/v2/contracts/call-read/{self.contract_address}/{self.contract_escrow}/get-property"
+            property_data = await self.read_property(property_id)
             
-            # Convert property_id to Clarity uint format (0x01 + 16 bytes)
-            property_id_hex = f"0x01{property_id:032x}"
+            if property_data is None:
+                print(f"   Property #{property_id} is Optional(None)")
+                return None
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    json={
-                        "sender": self.contract_address,
-                        "arguments": [property_id_hex]
-                    },
-                    timeout=10.0
-                )
-                
-                print(f"\n📞 API Response for property #{property_id}:")
-                print(f"   Status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    print(f"   Full response: {data}")
-                    
-                    if data.get("okay") and "result" in data:
-                        result = data["result"]
-                        print(f"   Result hex: {result[:200]}...")  # First 200 chars
-                        
-                        parsed = None
-                        
-                        # Handle different response formats:
-                        # Format 1: Optional(Some(tuple)) - starts with 0x09
-                        if result.startswith("0x09"):
-                            print(f"   Parsing as Optional(Some)...")
-                            parsed = self.parser.parse_optional(result)
-                        
-                        # Format 2: Direct tuple - starts with 0x0c or 0x0a0c
-                        elif result.startswith("0x0c") or result.startswith("0x0a0c"):
-                            print(f"   Parsing as direct tuple...")
-                            # Skip the 0x0a prefix if present (response wrapper)
-                            tuple_hex = result[4:] if result.startswith("0x0a0c") else result[2:]
-                            parsed = self.parser.parse_tuple(tuple_hex)
-                        
-                        # Format 3: Optional(None) - starts with 0x0a (but not 0x0a0c)
-                        elif result.startswith("0x0a") and not result.startswith("0x0a0c"):
-                            print(f"   Result is Optional(None)")
-                            return None
-                        
-                        print(f"   Parsed result: {parsed}")
-                        
-                        if parsed and "metadata_uri" in parsed:
-                            return {
-                                "property_id": property_id,
-                                "owner": parsed.get("owner", "ST..."),
-                                "metadata_uri": parsed["metadata_uri"],
-                                "active": parsed.get("active", True)
-                            }
-                        else:
-                            print(f"   ⚠️ No metadata_uri in parsed result")
-                    
-                    return None
-                else:
-                    print(f"   ❌ HTTP Error: {response.status_code}")
-                    return None
+            if not property_data["metadata_uri"]:
+                print(f"   ⚠️ No metadata_uri for property #{property_id}")
+                return None
+            
+            return property_data
                     
         except Exception as e:
-            print(f"   ❌ Exception: {e}")
+            print(f"   ❌ Exception reading property #{property_id}: {e}")
             return None
     
     async def fetch_ipfs_metadata(self, ipfs_uri: str) -> Optional[Dict[str, Any]]:
         """
         Fetch property metadata from IPFS
-        Handles both ipfs:// URIs and direct IPFS hashes
+        Handles both ipfs:// URIs and direct IPFS hashes.
+        CIDs are immutable, so anything fetched once is served from the cache;
+        misses go through the hedged multi-gateway fetcher.
         """
         try:
-            # Clean the IPFS URI
-            ipfs_hash = ipfs_uri
-            if ipfs_hash.startswith("ipfs://"):
-                ipfs_hash = ipfs_hash.replace("ipfs://", "")
-            
-            # Remove any trailing garbage characters
-            ipfs_hash = ipfs_hash.split()[0].strip()
-            
-            url = f"{self.ipfs_gateway}/{ipfs_hash}"
+            ipfs_hash = cid_from_uri(ipfs_uri)
+
+            cached = self.ipfs_cache.get(ipfs_hash)
+            if cached is not None:
+                return cached
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, timeout=15.0)
-                
-                if response.status_code == 200:
-                    metadata = response.json()
-                    return metadata
-                else:
-                    return None
-                    
+            metadata = await self.ipfs_fetcher.fetch(ipfs_hash)
+            if metadata is not None:
+                self.ipfs_cache.put(ipfs_hash, metadata)
+            return metadata
+
         except Exception as e:
+            print(f"⚠️ IPFS fetch failed for {ipfs_uri}: {e}")
             return None
 
     # Pinata fallback removed to prevent dummy data
 
     
+    async def _has_badge(self, principal_hex: str, badge_type: int) -> bool:
+        """Call has-badge for a single badge type"""
+        result = await self._call_read(
+            self.contract_badge, "has-badge",
+            [principal_hex, serialize_uint(badge_type)],
+            timeout=STACKS_PROFILE_TIMEOUT
+        )
+        return self.parser.decode(result) is True
+    
     async def get_user_badges(self, user_address: str) -> List[str]:
-        """Get all badges earned by a user"""
+        """
+        Get all badges earned by a user (all badge types are checked concurrently).
+        Raises if any badge can't be read, so a node error never looks like "no badges".
+        """
+        principal_hex = self._encode_principal(user_address)
+        results = await asyncio.gather(
+            *(self._has_badge(principal_hex, badge_type) for badge_type in BADGE_TYPES),
+            return_exceptions=True
+        )
+
         badges = []
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                for badge_type in range(1, 9):
-                    url = f"{self.api_url}/v2/contracts/call-read/{self.contract_address}/{self.contract_badge}/has-badge"
-                    
-                    principal_hex = self._encode_principal(user_address)
-                    badge_type_hex = f"0x01{badge_type:032x}"
-                    
-                    response = await client.post(
-                        url,
-                        json={
-                            "sender": self.contract_address,
-                            "arguments": [principal_hex, badge_type_hex]
-                        },
-                        timeout=5.0
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get("okay") and data.get("result") == "0x03":
-                            badges.append(BADGE_TYPES[badge_type])
-                            
-        except Exception as e:
-            print(f"Error fetching badges for {user_address}: {e}")
-        
+        for badge_type, result in zip(BADGE_TYPES, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching badge {BADGE_TYPES[badge_type]} for {user_address}: {result}")
+                raise result
+            if result:
+                badges.append(BADGE_TYPES[badge_type])
         return badges
     
-    async def get_user_reputation(self, user_address: str) -> Optional[Dict[str, Any]]:
-        """Get user reputation statistics"""
-        try:
-            url = f"{self.api_url}/v2/contracts/call-read/{self.contract_address}/{self.contract_reputation}/get-user-stats"
-            
-            principal_hex = self._encode_principal(user_address)
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    json={
-                        "sender": self.contract_address,
-                        "arguments": [principal_hex]
-                    },
-                    timeout=5.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("okay") and "result" in data:
-                        result = data["result"]
-                        if result.startswith("0x09"):  # Some
-                            return {
-                                "total_reviews": 0,
-                                "average_rating": 0,
-                                "total_rating_sum": 0
-                            }
-                        else:
-                            return {
-                                "total_reviews": 0,
-                                "average_rating": 0,
-                                "total_rating_sum": 0
-                            }
-                    return None
-                    
-        except Exception as e:
-            print(f"Error fetching reputation for {user_address}: {e}")
-            return None
+    async def get_user_reputation(self, user_address: str) -> Dict[str, Any]:
+        """Get user reputation statistics (raises if the node can't be read)"""
+        result = await self._call_read(
+            self.contract_reputation, "get-user-stats",
+            [self._encode_principal(user_address)],
+            timeout=STACKS_PROFILE_TIMEOUT
+        )
+        stats = self.parser.parse_user_stats(result)
+        if stats:
+            return dict(stats)
+        # No reviews yet
+        return {
+            "total_reviews": 0,
+            "average_rating": 0,
+            "total_rating_sum": 0
+        }
     
     def _encode_principal(self, address: str) -> str:
-        """Encode a Stacks address as a Clarity principal (simplified)"""
-        return f"0x05{address}"
+        """Encode a Stacks address as a serialized Clarity principal"""
+        return serialize_principal(address)
+    
+    async def get_host_profile(self, owner: str) -> Dict[str, Any]:
+        """
+        Fetch badges and reputation for one host concurrently. Raises unless
+        both were read, so a partial profile is never cached or joined.
+        """
+        badges, reputation = await asyncio.gather(
+            self.get_user_badges(owner),
+            self.get_user_reputation(owner)
+        )
+        return profile_fields(badges, reputation)
+    
+    async def enrich_properties(
+        self,
+        properties: List[Dict[str, Any]],
+        known: Optional[Dict[int, Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Join host badges and reputation onto properties.
+        Each distinct owner is resolved once through the host profile table,
+        so cost scales with the number of hosts, not listings. When a host
+        can't be resolved, the listing keeps its fields from `known`
+        (property_id -> last joined listing), if any.
+        """
+        known = known or {}
+        profiles = await self.host_profiles.resolve(
+            (prop.get("owner") for prop in properties),
+            self.get_host_profile
+        )
+        enriched = []
+        for prop in properties:
+            profile = profiles.get(prop.get("owner"))
+            if profile is None:
+                previous = known.get(prop.get("property_id")) or {}
+                profile = {key: value for key, value in previous.items() if key in HOST_FIELDS}
+            enriched.append(self._join_profile(prop, profile))
+        return enriched
+
+    @staticmethod
+    def _join_profile(prop: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **{key: value for key, value in prop.items() if key not in HOST_FIELDS},
+            **profile
+        }
+
+    async def _rejoin_host_profiles(
+        self,
+        checkpoint: SyncCheckpoint,
+        skip_ids: Iterable[int],
+        hosts: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-join current host profiles onto cached listings whose on-chain tuple
+        didn't change, returning the ones whose joined fields differ. Profiles
+        come from the host table, so this costs one fetch per distinct host
+        whose entry expired. Listings whose host can't be resolved keep their
+        last known fields. When `hosts` is given only their listings are
+        re-joined.
+        """
+        skip_ids = set(skip_ids)
+        hosts = None if hosts is None else set(hosts)
+        cached = [
+            (pid, prop) for pid, prop in sorted(checkpoint.properties.items())
+            if pid not in skip_ids and (hosts is None or prop.get("owner") in hosts)
+        ]
+        profiles = await self.host_profiles.resolve((prop.get("owner") for _, prop in cached), self.get_host_profile)
+
+        changed = []
+        for property_id, prop in cached:
+            profile = profiles.get(prop.get("owner"))
+            if profile is None:
+                continue
+            joined = self._join_profile(prop, profile)
+            if joined != prop:
+                checkpoint.properties[property_id] = joined
+                changed.append(joined)
+        return changed
     
     async def enrich_property_data(self, property_data: Dict[str, Any]) -> Dict[str, Any]:
         """Enrich property data with badges and reputation"""
-        enriched = property_data.copy()
-        
-        owner = property_data.get("owner")
-        
-        if owner and owner != "ST...":
-            badges = await self.get_user_badges(owner)
-            if badges:
-                enriched["host_badges"] = badges
-                enriched["is_superhost"] = "superhost" in badges
-            
-            reputation = await self.get_user_reputation(owner)
-            if reputation:
-                enriched["host_reputation"] = {
-                    "average_rating": reputation.get("average_rating", 0) / 100,
-                    "total_reviews": reputation.get("total_reviews", 0)
-                }
-        
-        return enriched
+        enriched = await self.enrich_properties([property_data])
+        return enriched[0]
     
-    async def get_all_properties(self) -> List[Dict[str, Any]]:
+    async def _resolve_property(self, property_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge an on-chain property tuple with its IPFS metadata"""
+        property_id = property_data["property_id"]
+        metadata = await self.fetch_ipfs_metadata(property_data["metadata_uri"])
+
+        if not metadata:
+            print(f"⚠️ Failed to fetch IPFS metadata for property #{property_id}")
+            return None
+
+        return {
+            **metadata,
+            "property_id": property_id,
+            "owner": property_data.get("owner"),
+            "active": property_data.get("active", True),
+            "price_per_night_ustx": property_data.get("price_per_night_ustx"),
+            "created_at": property_data.get("created_at")
+        }
+
+    async def _crawl_property(self, property_id: int) -> Optional[Dict[str, Any]]:
         """
-        Fetch all properties from blockchain + IPFS
-        Since property-id-nonce might not exist, we try sequential IDs until we get None
+        Fetch a single property and resolve its IPFS metadata.
+        Returns None when the ID is missing or its metadata can't be resolved.
         """
-        print(f"🔗 Connecting to Stacks node: {self.api_url}")
-        print(f"📜 Contract: {self.contract_address}.{self.contract_escrow}")
-        
-        properties = []
-        property_id = 0
-        max_attempts = 100  # Safety limit
+        try:
+            property_data = await self.get_property(property_id)
+
+            if not property_data or not property_data.get("metadata_uri"):
+                print(f"⚠️ Property #{property_id} not found or no metadata URI")
+                return None
+
+            print(f"✅ Found property #{property_id}")
+            return await self._resolve_property(property_data)
+
+        except Exception as e:
+            print(f"❌ Error processing property #{property_id}: {e}")
+            return None
+
+    async def _gather_bounded(self, coros: List[Awaitable[Any]]) -> List[Any]:
+        """gather() with at most `crawl_concurrency` awaitables running; exceptions are returned"""
+        semaphore = asyncio.Semaphore(self.crawl_concurrency)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+    async def probe_properties(self, max_attempts: int = 100) -> List[Dict[str, Any]]:
+        """
+        Fallback crawl for when property-id-nonce can't be read:
+        probe sequential IDs until we hit CRAWL_MAX_CONSECUTIVE_MISSES missing IDs in a row.
+
+        Up to `crawl_concurrency` IDs are crawled at once in a sliding window.
+        Results are committed strictly in ID order, so gap detection behaves
+        exactly like the sequential walk even when requests finish out of order.
+        """
+        properties: List[Dict[str, Any]] = []
+        in_flight: Dict[asyncio.Task, int] = {}
+        finished: Dict[int, Optional[Dict[str, Any]]] = {}
+        next_id = 0         # next ID to schedule
+        commit_id = 0       # next ID to commit, in order
+        stop_at = max_attempts
         consecutive_failures = 0
-        
-        # Try fetching properties sequentially
-        while property_id < max_attempts and consecutive_failures < 3:
-            try:
-                print(f"🔍 Trying to fetch property #{property_id}...")
-                property_data = await self.get_property(property_id)
-                
-                if property_data and property_data.get("metadata_uri"):
-                    print(f"✅ Found property #{property_id}")
-                    metadata = await self.fetch_ipfs_metadata(property_data["metadata_uri"])
-                    
-                    if metadata:
-                        full_property = {
-                            **metadata,
-                            "property_id": property_id,
-                            "owner": property_data.get("owner", "ST..."),
-                            "active": property_data.get("active", True)
-                        }
-                        
-                        enriched = await self.enrich_property_data(full_property)
-                        properties.append(enriched)
+
+        try:
+            while commit_id < stop_at:
+                # Keep the window full
+                while next_id < stop_at and len(in_flight) < self.crawl_concurrency:
+                    print(f"🔍 Trying to fetch property #{next_id}...")
+                    task = asyncio.create_task(self._crawl_property(next_id))
+                    in_flight[task] = next_id
+                    next_id += 1
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    finished[in_flight.pop(task)] = task.result()
+
+                # Commit contiguous results in ID order
+                while commit_id in finished and commit_id < stop_at:
+                    result = finished.pop(commit_id)
+                    if result:
+                        properties.append(result)
                         consecutive_failures = 0  # Reset on success
                     else:
-                        print(f"⚠️ Failed to fetch IPFS metadata for property #{property_id}")
                         consecutive_failures += 1
-                else:
-                    print(f"⚠️ Property #{property_id} not found or no metadata URI")
-                    consecutive_failures += 1
-                    
-            except Exception as e:
-                print(f"❌ Error processing property #{property_id}: {e}")
-                consecutive_failures += 1
-            
-            property_id += 1
-        
-        print(f"🔢 Found {len(properties)} properties on blockchain")
-        
+                        if consecutive_failures >= CRAWL_MAX_CONSECUTIVE_MISSES:
+                            stop_at = commit_id + 1
+                    commit_id += 1
+        finally:
+            # Anything still running is past the end of the catalog
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        return await self.enrich_properties(properties)
+
+    async def sync_properties(self, checkpoint: Optional[SyncCheckpoint] = None) -> SyncDelta:
+        """
+        Incrementally sync the catalog against the persisted checkpoint.
+
+        Reads property-id-nonce and the on-chain tuple of every ID below it
+        (one call each). Only IDs that are new, or whose tuple fingerprint
+        changed since the last sync, go on to IPFS and host enrichment.
+        """
+        # Re-read under the lock so another worker's sync is never overwritten by a stale copy
+        async with (checkpoint or self.checkpoint).locked() as checkpoint:
+            print(f"🔗 Connecting to Stacks node: {self.api_url}")
+            print(f"📜 Contract: {self.contract_address}.{self.contract_escrow}")
+
+            nonce = await self.read_property_nonce()
+            if nonce is None:
+                if checkpoint.properties:
+                    print("⚠️ property-id-nonce unavailable; keeping the last synced catalog")
+                    return SyncDelta(nonce=checkpoint.last_nonce, added=[], changed=[], removed=[],
+                                     properties=checkpoint.all_properties())
+                print("⚠️ property-id-nonce unavailable; probing IDs sequentially")
+                return await self._probe_into_checkpoint(checkpoint)
+
+            print(f"🔢 property-id-nonce = {nonce} (last synced {checkpoint.last_nonce})")
+
+            # IDs past the nonce can only exist if the contract was redeployed
+            stale = [pid for pid in checkpoint.entries if pid >= nonce]
+
+            return await self._sync_ids(checkpoint, list(range(nonce)), nonce, forget_ids=stale)
+
+    async def _probe_into_checkpoint(self, checkpoint: SyncCheckpoint) -> SyncDelta:
+        """
+        Fallback sync: probe IDs, then record what was found in the checkpoint
+        so the next sync is incremental instead of probing again.
+        """
+        properties = await self.probe_properties()
+
+        # The probe just read these tuples, so this is served by the read cache
+        property_ids = [prop["property_id"] for prop in properties]
+        tuples = await self._gather_bounded([self.read_property(pid) for pid in property_ids])
+        for prop, property_data in zip(properties, tuples):
+            if isinstance(property_data, dict):
+                checkpoint.record(prop["property_id"], property_data, prop)
+            else:
+                # No fingerprint: the next sync re-reads and re-resolves it
+                checkpoint.properties[prop["property_id"]] = prop
+
+        # The nonce is the next ID to be assigned
+        if property_ids:
+            checkpoint.last_nonce = max(checkpoint.last_nonce, max(property_ids) + 1)
+        checkpoint.save()
+
+        return SyncDelta(nonce=checkpoint.last_nonce, added=properties, changed=[], removed=[],
+                         properties=checkpoint.all_properties())
+
+    async def refresh_properties(
+        self,
+        property_ids: Iterable[int] = (),
+        include_new: bool = False,
+        hosts: Iterable[str] = (),
+        checkpoint: Optional[SyncCheckpoint] = None
+    ) -> SyncDelta:
+        """
+        Targeted sync used by push ingestion: re-read only the given property IDs,
+        pick up IDs listed since the last checkpoint when `include_new` is set,
+        and re-join fresh host profiles for the given owners.
+
+        `include_new` also covers rolled-back listings: if the nonce went
+        backwards, the IDs above it are re-read (and removed once they no
+        longer resolve) and the checkpoint nonce is lowered to match.
+        """
+        # Re-read under the lock so another worker's sync is never overwritten by a stale copy
+        async with (checkpoint or self.checkpoint).locked() as checkpoint:
+            nonce = checkpoint.last_nonce
+            ids = set(property_ids)
+
+            # An event means a new block, even if the tip poll hasn't noticed yet
+            self.read_cache.invalidate()
+
+            if include_new:
+                latest = await self.read_property_nonce()
+                if latest is not None:
+                    # New listings when the nonce advanced, rolled-back ones when it went backwards
+                    ids.update(range(min(latest, checkpoint.last_nonce), max(latest, checkpoint.last_nonce)))
+                    nonce = latest
+
+            # Fresh profiles for these hosts are re-joined onto their listings by _sync_ids
+            hosts = set(hosts)
+            for principal in hosts:
+                self.host_profiles.invalidate(principal)
+
+            return await self._sync_ids(checkpoint, sorted(ids), nonce, rejoin_hosts=hosts)
+
+    async def _sync_ids(
+        self,
+        checkpoint: SyncCheckpoint,
+        property_ids: List[int],
+        nonce: int,
+        forget_ids: Iterable[int] = (),
+        rejoin_hosts: Optional[Iterable[str]] = None
+    ) -> SyncDelta:
+        """
+        Re-read the given IDs, resolve what changed and fold it into the checkpoint.
+        Host profiles are re-joined onto every cached listing, or only onto the
+        listings of `rejoin_hosts` when given.
+        """
+        tuples = await self._gather_bounded([self.read_property(pid) for pid in property_ids])
+
+        removed: List[int] = []
+        pending = []
+        for property_id, property_data in zip(property_ids, tuples):
+            if isinstance(property_data, Exception):
+                # Transient failure: keep whatever we had and retry next sync
+                print(f"⚠️ Could not read property #{property_id}: {property_data}")
+                continue
+
+            listed = property_id in checkpoint.properties
+
+            if property_data is None:
+                if listed:
+                    removed.append(property_id)
+                checkpoint.forget(property_id)
+                continue
+
+            if checkpoint.fingerprint(property_id) == tuple_fingerprint(property_data):
+                continue
+
+            if not property_data["active"] or not property_data["metadata_uri"]:
+                if listed:
+                    removed.append(property_id)
+                checkpoint.record(property_id, property_data, None)
+                continue
+
+            pending.append((property_id, property_data, listed))
+
+        for property_id in forget_ids:
+            if property_id in checkpoint.properties:
+                removed.append(property_id)
+            checkpoint.forget(property_id)
+
+        resolved = await self._gather_bounded([self._resolve_property(data) for _, data, _ in pending])
+        ready = [
+            (item, prop) for item, prop in zip(pending, resolved)
+            if prop and not isinstance(prop, Exception)
+        ]
+        enriched = await self.enrich_properties([prop for _, prop in ready], known=checkpoint.properties)
+
+        added: List[Dict[str, Any]] = []
+        changed: List[Dict[str, Any]] = []
+        for ((property_id, property_data, listed), _), full_property in zip(ready, enriched):
+            checkpoint.record(property_id, property_data, full_property)
+            (changed if listed else added).append(full_property)
+
+        # Badges and reputation change without the listing's tuple changing
+        changed += await self._rejoin_host_profiles(
+            checkpoint, (prop["property_id"] for prop in added + changed), hosts=rejoin_hosts
+        )
+
+        checkpoint.last_nonce = nonce
+        checkpoint.save()
+
+        print(f"🔄 Sync delta: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+        print(f"🔢 {len(checkpoint.properties)} properties on blockchain")
+
+        return SyncDelta(nonce=nonce, added=added, changed=changed, removed=sorted(removed),
+                         properties=checkpoint.all_properties())
+
+    async def get_all_properties(self) -> List[Dict[str, Any]]:
+        """
+        Fetch all properties from blockchain + IPFS
+        Runs an incremental sync and returns the full catalog.
+        """
+        delta = await self.sync_properties()
+        properties = delta["properties"]
+
         if not properties:
             print("⚠️ No properties found on blockchain.")
-        
+
         return properties
 
 
@@ -0,0 +1,261 @@
+"""
+Chain Event Ingestion
+Turns chainhook-style block payloads into targeted catalog updates:
+property re-reads for listing events, host profile refreshes for reviews and
+badge mints. Payload contents are only hints; state is always re-read from
+the node before anything is written.
+"""
+import os
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, TypedDict
+from dotenv import load_dotenv
+
+from app.services.blockchain import blockchain_service
+from app.services.clarity import ClarityDecodeError, decode_hex
+from app.services.sync_state import apply_sync_delta, file_lock, has_changes
+from app.services.vector_store import vector_store
+
+load_dotenv()
+
+# Configuration
+CHAINHOOK_AUTH_TOKEN = os.getenv("CHAINHOOK_AUTH_TOKEN")
+EVENT_LEDGER_FILE = Path(os.getenv("EVENT_LEDGER_PATH", "data/events")) / "processed.json"
+EVENT_LEDGER_SIZE = int(os.getenv("EVENT_LEDGER_SIZE", "10000"))
+
+# Escrow calls that never change a listing
+ESCROW_BOOKING_METHODS = {"book-property", "release-payment", "cancel-booking"}
+
+# Print-event tuple fields that name a host whose profile may have changed
+PRINCIPAL_FIELDS = ("owner", "host", "reviewee", "recipient", "user")
+
+_UINT_ARG = re.compile(r"^u(\d+)$")
+_PRINCIPAL_ARG = re.compile(r"^'?(S[0-9A-Z]{27,40})$")
+
+
+class ChainAction(TypedDict, total=False):
+    """One targeted update derived from a chain event"""
+    key: str  # idempotency key: direction, block hash, tx id and event position
+    kind: str  # "property", "new_properties" or "host"
+    property_id: int
+    principal: str
+
+
+class EventLedger:
+    """
+    Bounded, persisted set of idempotency keys that have already been applied.
+    Shared by every worker, so check-and-mark happens inside `locked()`.
+    """
+
+    def __init__(self, path: Path = EVENT_LEDGER_FILE, max_size: int = EVENT_LEDGER_SIZE):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.max_size = max_size
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self._loaded = False
+
+    @asynccontextmanager
+    async def locked(self) -> AsyncIterator["EventLedger"]:
+        """Hold the ledger lock across workers, starting from what is on disk now"""
+        async with file_lock(self.lock_path):
+            self.load()
+            yield self
+
+    def _load(self):
+        # Read-only callers load lazily; locked() always re-reads
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        self._loaded = True
+        self._keys = OrderedDict()
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._keys = OrderedDict.fromkeys(json.load(f))
+            except Exception as e:
+                print(f"⚠️ Failed to load event ledger, starting fresh: {e}")
+
+    def seen(self, key: str) -> bool:
+        self._load()
+        return key in self._keys
+
+    def mark(self, keys: Iterable[str]):
+        self._load()
+        for key in keys:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    def forget(self, keys: Iterable[str]):
+        self._load()
+        for key in keys:
+            self._keys.pop(key, None)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self._keys), f)
+        os.replace(tmp_path, self.path)
+
+
+def _counterpart(key: str) -> str:
+    """The key of the same event in the opposite direction"""
+    direction, rest = key.split(":", 1)
+    return f"{'rollback' if direction == 'apply' else 'apply'}:{rest}"
+
+
+def _parse_uint_arg(arg: Any) -> Optional[int]:
+    match = _UINT_ARG.match(str(arg).strip())
+    return int(match.group(1)) if match else None
+
+
+def _parse_principal_arg(arg: Any) -> Optional[str]:
+    match = _PRINCIPAL_ARG.match(str(arg).strip())
+    return match.group(1) if match else None
+
+
+def _decode_event_value(data: Dict[str, Any]) -> Any:
+    """Decode a print event, preferring the raw Clarity hex over chainhook's JSON rendering"""
+    hex_value = data.get("hex_value") or data.get("raw_value")
+    if hex_value:
+        try:
+            return decode_hex(hex_value)
+        except ClarityDecodeError:
+            return None
+    return data.get("value")
+
+
+class ChainEventProcessor:
+    """Verifies chainhook payloads and applies them to the catalog and vector store"""
+
+    def __init__(self, blockchain, store, ledger: Optional[EventLedger] = None):
+        self.blockchain = blockchain
+        self.store = store
+        self.ledger = ledger or EventLedger()
+        self._lock = asyncio.Lock()
+
+    @property
+    def contracts(self) -> Dict[str, str]:
+        """Fully qualified contract identifier -> role"""
+        address = self.blockchain.contract_address
+        return {
+            f"{address}.{self.blockchain.contract_escrow}": "escrow",
+            f"{address}.{self.blockchain.contract_reputation}": "reputation",
+            f"{address}.{self.blockchain.contract_badge}": "badge",
+        }
+
+    def extract_actions(self, payload: Dict[str, Any]) -> List[ChainAction]:
+        """Map every successful transaction touching our contracts to targeted actions"""
+        contracts = self.contracts
+        actions: List[ChainAction] = []
+
+        for direction in ("apply", "rollback"):
+            for block in payload.get(direction) or []:
+                # The same transaction can be re-mined in another block after a reorg
+                block_hash = (block.get("block_identifier") or {}).get("hash", "")
+                for tx in block.get("transactions") or []:
+                    metadata = tx.get("metadata") or {}
+                    if direction == "apply" and not metadata.get("success", False):
+                        continue
+                    tx_id = (tx.get("transaction_identifier") or {}).get("hash", "")
+                    prefix = f"{direction}:{block_hash}:{tx_id}"
+
+                    kind = metadata.get("kind") or {}
+                    if kind.get("type") == "ContractCall":
+                        call = kind.get("data") or {}
+                        role = contracts.get(call.get("contract_identifier"))
+                        if role:
+                            actions.extend(self._call_actions(prefix, role, call.get("method", ""), call.get("args") or []))
+
+                    events = (metadata.get("receipt") or {}).get("events") or []
+                    for position, event in enumerate(events):
+                        data = event.get("data") or {}
+                        if event.get("type") != "SmartContractEvent" or contracts.get(data.get("contract_identifier")) is None:
+                            continue
+                        index = (event.get("position") or {}).get("index", position)
+                        actions.extend(self._print_actions(f"{prefix}:{index}", _decode_event_value(data)))
+
+        return actions
+
+    def _call_actions(self, prefix: str, role: str, method: str, args: List[Any]) -> List[ChainAction]:
+        if role == "escrow":
+            if method == "list-property":
+                return [ChainAction(key=f"{prefix}:call", kind="new_properties")]
+            if method in ESCROW_BOOKING_METHODS or "property" not in method:
+                return []
+            property_id = _parse_uint_arg(args[0]) if args else None
+            if property_id is None:
+                return []
+            return [ChainAction(key=f"{prefix}:call", kind="property", property_id=property_id)]
+
+        # Reviews and badge mints change the profile of the principal they name
+        return [
+            ChainAction(key=f"{prefix}:call:{i}", kind="host", principal=principal)
+            for i, principal in enumerate(filter(None, map(_parse_principal_arg, args)))
+        ]
+
+    def _print_actions(self, key: str, value: Any) -> List[ChainAction]:
+        if not isinstance(value, dict):
+            return []
+        actions: List[ChainAction] = []
+        property_id = value.get("property-id")
+        if isinstance(property_id, int):
+            actions.append(ChainAction(key=f"{key}:property", kind="property", property_id=property_id))
+        for field in PRINCIPAL_FIELDS:
+            principal = value.get(field)
+            if isinstance(principal, str) and _parse_principal_arg(principal):
+                actions.append(ChainAction(key=f"{key}:{field}", kind="host", principal=principal))
+        return actions
+
+    async def ingest(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply a payload. Keys are only marked as processed once the update has
+        been written, so a failed delivery is safe for the sender to retry.
+        Applying an event clears its rollback key and vice versa, so a block
+        that is rolled back and re-applied is processed again each time.
+        """
+        actions = self.extract_actions(payload)
+
+        # The ledger lock also spans workers: a delivery retried against another worker waits here
+        async with self._lock, self.ledger.locked():
+            fresh = [action for action in actions if not self.ledger.seen(action["key"])]
+            summary: Dict[str, Any] = {
+                "events": len(actions),
+                "duplicates": len(actions) - len(fresh),
+                "added": 0,
+                "changed": 0,
+                "removed": 0,
+            }
+            if not fresh:
+                return summary
+
+            property_ids = {a["property_id"] for a in fresh if a["kind"] == "property"}
+            include_new = any(a["kind"] == "new_properties" for a in fresh)
+            hosts = {a["principal"] for a in fresh if a["kind"] == "host"}
+
+            delta = await self.blockchain.refresh_properties(property_ids, include_new=include_new, hosts=hosts)
+            if has_changes(delta):
+                await apply_sync_delta(self.store, delta)
+
+            self.ledger.forget(_counterpart(action["key"]) for action in fresh)
+            self.ledger.mark(action["key"] for action in fresh)
+            self.ledger.save()
+
+            summary.update(
+                added=len(delta["added"]),
+                changed=len(delta["changed"]),
+                removed=len(delta["removed"]),
+            )
+            print(f"📥 Ingested {len(fresh)} chain events: {summary}")
+            return summary
+
+
+# Singleton instance
+chain_event_processor = ChainEventProcessor(blockchain_service, vector_store)
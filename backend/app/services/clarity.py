@@ -0,0 +1,308 @@
+"""
+Clarity Value Codec
+Single-pass decoder for consensus-serialized Clarity values returned by
+`/v2/contracts/call-read`, plus the encoders needed to build call arguments.
+"""
+import hashlib
+import struct
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+
+# Type prefixes (see SIP-005 value serialization)
+TYPE_INT = 0x00
+TYPE_UINT = 0x01
+TYPE_BUFFER = 0x02
+TYPE_TRUE = 0x03
+TYPE_FALSE = 0x04
+TYPE_STANDARD_PRINCIPAL = 0x05
+TYPE_CONTRACT_PRINCIPAL = 0x06
+TYPE_RESPONSE_OK = 0x07
+TYPE_RESPONSE_ERR = 0x08
+TYPE_OPTIONAL_NONE = 0x09
+TYPE_OPTIONAL_SOME = 0x0A
+TYPE_LIST = 0x0B
+TYPE_TUPLE = 0x0C
+TYPE_STRING_ASCII = 0x0D
+TYPE_STRING_UTF8 = 0x0E
+
+C32_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_C32_VALUES = {c: i for i, c in enumerate(C32_ALPHABET)}
+# c32 decoding is lenient about visually ambiguous characters
+_C32_VALUES.update({"O": 0, "L": 1, "I": 1})
+
+_U32 = struct.Struct(">I")
+_U64_PAIR = struct.Struct(">QQ")
+
+
+class ClarityDecodeError(ValueError):
+    """Raised when a byte string is not a valid serialized Clarity value"""
+
+
+class ClarityResponse(TypedDict):
+    """Decoded `(response ok err)` value"""
+    ok: bool
+    value: Any
+
+
+class PropertyRecord(TypedDict):
+    """Decoded `get-property` tuple from the escrow contract"""
+    owner: str
+    price_per_night: int  # microSTX
+    location_tag: int
+    metadata_uri: str
+    active: bool
+    created_at: int  # block height
+
+
+class UserStats(TypedDict):
+    """Decoded `get-user-stats` tuple from the reputation contract"""
+    total_reviews: int
+    total_rating_sum: int
+    average_rating: int  # rating * 100
+
+
+# ============================================
+# C32CHECK ADDRESSES
+# ============================================
+
+def _double_sha256(data: bytes) -> bytes:
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def c32_encode(data: bytes) -> str:
+    """Crockford-style base32 encoding used by Stacks addresses"""
+    leading_zero_bytes = len(data) - len(data.lstrip(b"\x00"))
+    n = int.from_bytes(data, "big")
+    digits = []
+    while n:
+        n, rem = divmod(n, 32)
+        digits.append(C32_ALPHABET[rem])
+    return "0" * leading_zero_bytes + "".join(reversed(digits))
+
+
+@lru_cache(maxsize=4096)
+def c32_address(version: int, hash160: bytes) -> str:
+    """
+    Build a c32check Stacks address (e.g. `SP...`/`ST...`) from version + hash160.
+    Cached because the same hosts own many listings.
+    """
+    checksum = _double_sha256(bytes([version]) + hash160)[:4]
+    return "S" + C32_ALPHABET[version] + c32_encode(hash160 + checksum)
+
+
+def c32_address_decode(address: str) -> Tuple[int, bytes]:
+    """Split a c32check address into (version, hash160), verifying its checksum"""
+    address = address.strip().upper()
+    if len(address) < 5 or address[0] != "S":
+        raise ClarityDecodeError(f"Not a Stacks address: {address!r}")
+
+    try:
+        version = _C32_VALUES[address[1]]
+        n = 0
+        for char in address[2:]:
+            n = n * 32 + _C32_VALUES[char]
+    except KeyError as e:
+        raise ClarityDecodeError(f"Invalid c32 character in {address!r}") from e
+
+    try:
+        payload = n.to_bytes(24, "big")
+    except OverflowError as e:
+        raise ClarityDecodeError(f"Address payload too long: {address!r}") from e
+
+    hash160, checksum = payload[:20], payload[20:]
+    if _double_sha256(bytes([version]) + hash160)[:4] != checksum:
+        raise ClarityDecodeError(f"Bad c32check checksum: {address!r}")
+    return version, hash160
+
+
+# ============================================
+# DECODING
+# ============================================
+
+def _decode_at(buf: memoryview, offset: int) -> Tuple[Any, int]:
+    """Decode one value starting at `offset`; returns (value, next_offset)"""
+    try:
+        type_id = buf[offset]
+    except IndexError:
+        raise ClarityDecodeError(f"Unexpected end of input at byte {offset}") from None
+    offset += 1
+
+    if type_id == TYPE_UINT:
+        hi, lo = _U64_PAIR.unpack_from(buf, offset)
+        return (hi << 64) | lo, offset + 16
+
+    if type_id == TYPE_INT:
+        hi, lo = _U64_PAIR.unpack_from(buf, offset)
+        value = (hi << 64) | lo
+        if hi >> 63:
+            value -= 1 << 128
+        return value, offset + 16
+
+    if type_id == TYPE_TRUE:
+        return True, offset
+
+    if type_id == TYPE_FALSE:
+        return False, offset
+
+    if type_id in (TYPE_BUFFER, TYPE_STRING_ASCII, TYPE_STRING_UTF8):
+        (length,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        end = offset + length
+        if end > len(buf):
+            raise ClarityDecodeError(f"Length {length} overruns input at byte {offset}")
+        raw = buf[offset:end].tobytes()
+        if type_id == TYPE_BUFFER:
+            return raw, end
+        return raw.decode("ascii" if type_id == TYPE_STRING_ASCII else "utf-8"), end
+
+    if type_id == TYPE_STANDARD_PRINCIPAL:
+        version = buf[offset]
+        hash160 = buf[offset + 1:offset + 21].tobytes()
+        if len(hash160) != 20:
+            raise ClarityDecodeError("Truncated principal")
+        return c32_address(version, hash160), offset + 21
+
+    if type_id == TYPE_CONTRACT_PRINCIPAL:
+        version = buf[offset]
+        hash160 = buf[offset + 1:offset + 21].tobytes()
+        if len(hash160) != 20:
+            raise ClarityDecodeError("Truncated contract principal")
+        offset += 21
+        name_len = buf[offset]
+        offset += 1
+        name = buf[offset:offset + name_len].tobytes().decode("ascii")
+        return f"{c32_address(version, hash160)}.{name}", offset + name_len
+
+    if type_id in (TYPE_RESPONSE_OK, TYPE_RESPONSE_ERR):
+        value, offset = _decode_at(buf, offset)
+        return ClarityResponse(ok=type_id == TYPE_RESPONSE_OK, value=value), offset
+
+    if type_id == TYPE_OPTIONAL_NONE:
+        return None, offset
+
+    if type_id == TYPE_OPTIONAL_SOME:
+        return _decode_at(buf, offset)
+
+    if type_id == TYPE_LIST:
+        (count,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        items: List[Any] = []
+        for _ in range(count):
+            item, offset = _decode_at(buf, offset)
+            items.append(item)
+        return items, offset
+
+    if type_id == TYPE_TUPLE:
+        (count,) = _U32.unpack_from(buf, offset)
+        offset += 4
+        fields: Dict[str, Any] = {}
+        for _ in range(count):
+            name_len = buf[offset]
+            offset += 1
+            name = buf[offset:offset + name_len].tobytes().decode("ascii")
+            offset += name_len
+            fields[name], offset = _decode_at(buf, offset)
+        return fields, offset
+
+    raise ClarityDecodeError(f"Unknown Clarity type prefix 0x{type_id:02x} at byte {offset - 1}")
+
+
+def decode_value(data: bytes) -> Any:
+    """
+    Decode a serialized Clarity value.
+
+    Mapping: (u)int -> int, bool -> bool, buffer -> bytes, strings -> str,
+    principals -> c32check address str, optional -> value or None,
+    response -> ClarityResponse, list -> list, tuple -> dict keyed by field name.
+    """
+    buf = memoryview(data)
+    try:
+        value, offset = _decode_at(buf, 0)
+    except (struct.error, IndexError) as e:
+        raise ClarityDecodeError(f"Truncated input: {e}") from e
+    except UnicodeDecodeError as e:
+        raise ClarityDecodeError(f"Invalid string payload: {e}") from e
+    if offset != len(buf):
+        raise ClarityDecodeError(f"{len(buf) - offset} trailing bytes after value")
+    return value
+
+
+def decode_hex(hex_str: str) -> Any:
+    """Decode a `0x`-prefixed hex string as returned by the Stacks API"""
+    if hex_str.startswith("0x"):
+        hex_str = hex_str[2:]
+    try:
+        data = bytes.fromhex(hex_str)
+    except ValueError as e:
+        raise ClarityDecodeError(f"Invalid hex: {e}") from e
+    return decode_value(data)
+
+
+# ============================================
+# ENCODING (call-read arguments)
+# ============================================
+
+def serialize_uint(value: int) -> str:
+    """Serialize a uint argument as 0x-prefixed hex"""
+    return f"0x{TYPE_UINT:02x}{value:032x}"
+
+
+def serialize_principal(address: str) -> str:
+    """Serialize a standard or contract principal argument as 0x-prefixed hex"""
+    address, _, contract_name = address.partition(".")
+    version, hash160 = c32_address_decode(address)
+    if contract_name:
+        name = contract_name.encode("ascii")
+        return "0x" + (bytes([TYPE_CONTRACT_PRINCIPAL, version]) + hash160 + bytes([len(name)]) + name).hex()
+    return "0x" + (bytes([TYPE_STANDARD_PRINCIPAL, version]) + hash160).hex()
+
+
+# ============================================
+# CONTRACT-SPECIFIC VIEWS
+# ============================================
+
+class ClarityParser:
+    """Turns call-read results from the StackNStay contracts into typed dicts"""
+
+    @staticmethod
+    def decode(hex_str: str) -> Any:
+        return decode_hex(hex_str)
+
+    @staticmethod
+    def parse_property(hex_str: str) -> Optional[PropertyRecord]:
+        """Parse `(optional {owner, price-per-night, ...})` from `get-property`"""
+        value = decode_hex(hex_str)
+        if isinstance(value, dict) and "ok" in value and "value" in value:
+            value = value["value"] if value["ok"] else None
+        if not isinstance(value, dict):
+            return None
+
+        metadata_uri = value.get("metadata-uri") or ""
+        if isinstance(metadata_uri, bytes):
+            metadata_uri = metadata_uri.decode("utf-8", errors="ignore")
+        metadata_uri = metadata_uri.strip()
+        # Some listings store the bare CID without the ipfs:// scheme
+        if metadata_uri and "://" not in metadata_uri:
+            metadata_uri = f"ipfs://{metadata_uri}"
+
+        return PropertyRecord(
+            owner=value.get("owner", ""),
+            price_per_night=value.get("price-per-night", 0),
+            location_tag=value.get("location-tag", 0),
+            metadata_uri=metadata_uri,
+            active=bool(value.get("active", True)),
+            created_at=value.get("created-at", 0),
+        )
+
+    @staticmethod
+    def parse_user_stats(hex_str: str) -> Optional[UserStats]:
+        """Parse `(optional {total-reviews, total-rating-sum, average-rating})`"""
+        value = decode_hex(hex_str)
+        if not isinstance(value, dict):
+            return None
+        return UserStats(
+            total_reviews=value.get("total-reviews", 0),
+            total_rating_sum=value.get("total-rating-sum", 0),
+            average_rating=value.get("average-rating", 0),
+        )
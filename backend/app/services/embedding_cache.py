@@ -0,0 +1,334 @@
+"""
+Embedding Cache
+Persistent document-embedding cache shared by the property and knowledge stores.
+Entries are keyed by (model, input_type, text template version, sha256(text)):
+vectors live in one float32 memmap file per dimension, indexed by sqlite.
+Bumping a store's template version deliberately misses every old entry, which
+then ages out through LRU eviction.
+
+Every API worker shares the same files, so all writes (slot allocation, file
+growth, eviction) happen inside a `BEGIN IMMEDIATE` transaction, which holds
+sqlite's write lock across processes. Reads take the same lock from the slot
+lookup through the vector copy, so a slot can't be evicted and reused by
+another process in between. Vector files only ever grow, and a mapping is
+reopened whenever another process has grown the file past it.
+
+embed() runs the sqlite and memmap work in a worker thread, off the event loop.
+"""
+import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+MIN_FILE_CAPACITY = 1024  # rows; files grow by doubling
+
+EmbedFunction = Callable[[List[str]], Awaitable[np.ndarray]]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Float32 vectors in memmap files, with an sqlite index of keys, slots and last access"""
+
+    def __init__(
+        self,
+        path: Path = EMBEDDING_CACHE_PATH,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        enabled: bool = EMBEDDING_CACHE_ENABLED,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+        self._maps: Dict[int, np.memmap] = {}
+        # One connection shared by the worker threads embed() runs on, used by one at a time
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path / "index.sqlite"), isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS vectors (
+                    model TEXT NOT NULL,
+                    input_type TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    slot INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, input_type, version, text_hash)
+                );
+                CREATE INDEX IF NOT EXISTS idx_vectors_last_access ON vectors(last_access);
+                CREATE TABLE IF NOT EXISTS files (
+                    dim INTEGER PRIMARY KEY,
+                    capacity INTEGER NOT NULL,
+                    used INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS free_slots (
+                    dim INTEGER NOT NULL,
+                    slot INTEGER NOT NULL,
+                    PRIMARY KEY (dim, slot)
+                );
+                """
+            )
+        return self._conn
+
+    def _vector_file(self, dim: int) -> Path:
+        return self.path / f"vectors-{dim}.f32"
+
+    def _map(self, dim: int, min_capacity: int = 0) -> np.memmap:
+        """
+        Memmap for one dimension covering the stored capacity. Growing it (by
+        doubling) to `min_capacity` rows is only allowed inside a write
+        transaction, so no other process can grow the file concurrently.
+        """
+        db = self._db()
+        row = db.execute("SELECT capacity FROM files WHERE dim = ?", (dim,)).fetchone()
+        capacity = row[0] if row else 0
+
+        if capacity < min_capacity:
+            if not db.in_transaction:
+                raise RuntimeError("embedding cache files can only grow inside a write transaction")
+            new_capacity = max(MIN_FILE_CAPACITY, capacity * 2, min_capacity)
+            path = self._vector_file(dim)
+            # Never shrink: a rolled-back grow may have left the file larger than the stored capacity
+            if not path.exists() or path.stat().st_size < new_capacity * dim * 4:
+                with open(path, "ab") as f:
+                    f.truncate(new_capacity * dim * 4)
+            db.execute(
+                "INSERT INTO files(dim, capacity, used) VALUES(?, ?, 0) "
+                "ON CONFLICT(dim) DO UPDATE SET capacity = excluded.capacity",
+                (dim, new_capacity),
+            )
+            capacity = new_capacity
+
+        mapped = self._maps.get(dim)
+        if mapped is not None and mapped.shape[0] < capacity:
+            # Grown since we mapped it (here or in another process)
+            mapped.flush()
+            del self._maps[dim]
+            mapped = None
+        if mapped is None:
+            mapped = np.memmap(self._vector_file(dim), dtype=np.float32, mode="r+", shape=(capacity, dim))
+            self._maps[dim] = mapped
+        return mapped
+
+    def _lookup(self, model: str, input_type: str, version: str, hashes: List[str]) -> Dict[str, Tuple[int, int]]:
+        """text_hash -> (dim, slot) for the hashes that are cached"""
+        db = self._db()
+        found: Dict[str, Tuple[int, int]] = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay under sqlite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = db.execute(
+                f"SELECT text_hash, dim, slot FROM vectors WHERE model = ? AND input_type = ? AND version = ? "
+                f"AND text_hash IN ({','.join('?' * len(batch))})",
+                (model, input_type, version, *batch),
+            ).fetchall()
+            found.update({h: (dim, slot) for h, dim, slot in rows})
+        return found
+
+    def get_many(self, model: str, input_type: str, version: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None"""
+        if not self.enabled or not texts:
+            return [None] * len(texts)
+
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            db = self._db()
+            # Writers only touch the vector files under this lock, so the slots found
+            # below still hold these keys' vectors when they are copied
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                found = self._lookup(model, input_type, version, hashes)
+
+                if found:
+                    now = time.time()
+                    db.executemany(
+                        "UPDATE vectors SET last_access = ? WHERE model = ? AND input_type = ? AND version = ? AND text_hash = ?",
+                        [(now, model, input_type, version, h) for h in found],
+                    )
+
+                # Mapped after the lookup, so each mapping covers every slot found above
+                maps = {dim: self._map(dim) for dim, _ in found.values()}
+                results: List[Optional[np.ndarray]] = []
+                for h in hashes:
+                    location = found.get(h)
+                    if location is None:
+                        self.misses += 1
+                        results.append(None)
+                    else:
+                        dim, slot = location
+                        self.hits += 1
+                        results.append(np.array(maps[dim][slot]))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return results
+
+    def _allocate(self, dim: int, count: int) -> List[int]:
+        db = self._db()
+        slots = [row[0] for row in db.execute(
+            "SELECT slot FROM free_slots WHERE dim = ? ORDER BY slot LIMIT ?", (dim, count)
+        ).fetchall()]
+        db.executemany("DELETE FROM free_slots WHERE dim = ? AND slot = ?", [(dim, slot) for slot in slots])
+
+        remaining = count - len(slots)
+        if remaining:
+            row = db.execute("SELECT used FROM files WHERE dim = ?", (dim,)).fetchone()
+            used = row[0] if row else 0
+            self._map(dim, used + remaining)
+            db.execute("UPDATE files SET used = ? WHERE dim = ?", (used + remaining, dim))
+            slots.extend(range(used, used + remaining))
+        return slots
+
+    def put_many(self, model: str, input_type: str, version: str, texts: List[str], vectors: np.ndarray):
+        if not self.enabled or not texts:
+            return
+        with self._lock:
+            self._put_many(model, input_type, version, texts, vectors)
+
+    def _put_many(self, model: str, input_type: str, version: str, texts: List[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+
+        # Last write wins for duplicate texts within one batch
+        by_hash = {text_hash(text): row for row, text in enumerate(texts)}
+        db = self._db()
+        # Take the write lock before reading capacity/used, so allocation is serialized across processes
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            existing = {
+                h: slot for h, (stored_dim, slot) in self._lookup(model, input_type, version, list(by_hash)).items()
+                if stored_dim == dim
+            }
+            new_hashes = [h for h in by_hash if h not in existing]
+            slots = dict(existing)
+            slots.update(zip(new_hashes, self._allocate(dim, len(new_hashes))))
+
+            mapped = self._map(dim)
+            for h, row in by_hash.items():
+                mapped[slots[h]] = vectors[row]
+            mapped.flush()
+
+            now = time.time()
+            db.executemany(
+                "INSERT OR REPLACE INTO vectors(model, input_type, version, text_hash, dim, slot, last_access) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?)",
+                [(model, input_type, version, h, dim, slots[h], now) for h in by_hash],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            # Our mapping may now be larger than the stored capacity; remap on next use
+            self._maps.pop(dim, None)
+            raise
+
+        if self.size_bytes() > self.max_bytes:
+            self._evict()
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            row = self._db().execute("SELECT COALESCE(SUM(dim * 4), 0) FROM vectors").fetchone()
+        return row[0]
+
+    def _evict(self):
+        """Free least-recently-used slots until the cache is back under 90% of its budget"""
+        db = self._db()
+        target = int(self.max_bytes * 0.9)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Chosen under the write lock, so a slot another process just wrote can't be freed
+            size = self.size_bytes()
+            doomed = []
+            for rowid, dim, slot in db.execute("SELECT rowid, dim, slot FROM vectors ORDER BY last_access ASC"):
+                if size <= target:
+                    break
+                doomed.append((rowid, dim, slot))
+                size -= dim * 4
+
+            db.executemany("DELETE FROM vectors WHERE rowid = ?", [(rowid,) for rowid, _, _ in doomed])
+            db.executemany("INSERT OR IGNORE INTO free_slots(dim, slot) VALUES(?, ?)", [(dim, slot) for _, dim, slot in doomed])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self.evictions += len(doomed)
+
+    async def embed(
+        self,
+        texts: List[str],
+        embed: EmbedFunction,
+        model: str,
+        input_type: str,
+        version: str,
+    ) -> np.ndarray:
+        """
+        Embeddings for `texts` in order. Only texts that aren't cached are
+        passed to `embed` (each distinct text once); the results are stored.
+        """
+        cached = await asyncio.to_thread(self.get_many, model, input_type, version, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+
+        if missing:
+            fresh = np.asarray(await embed(missing), dtype=np.float32)
+            try:
+                await asyncio.to_thread(self.put_many, model, input_type, version, missing, fresh)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Embedding cache write failed: {e}")
+            by_text = dict(zip(missing, fresh))
+            cached = [vector if vector is not None else by_text[text] for text, vector in zip(texts, cached)]
+
+        if not cached:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._db().execute("SELECT COUNT(*) FROM vectors").fetchone()[0] if self.enabled else 0
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": self.size_bytes() if self.enabled else 0,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.flush()
+            self._maps.clear()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,216 @@
+"""
+Embedding Service
+Non-blocking Cohere embeddings shared by every store: inputs are split into
+provider-sized batches, sent concurrently up to a limit, retried with
+backoff on transient failures and reassembled in input order. Concurrent
+query embeddings are micro-batched into a single request, and repeat
+queries are served from an in-process LRU.
+"""
+import os
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import cohere
+import httpx
+import numpy as np
+from cohere.core.api_error import ApiError
+from dotenv import load_dotenv
+
+from app.services.query_cache import QueryVectorCache, normalize_query
+
+load_dotenv()
+
+# Configuration
+COHERE_API_KEY = os.getenv("COHERE_API_KEY")
+COHERE_EMBED_MODEL = os.getenv("COHERE_EMBED_MODEL", "embed-english-v3.0")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "96"))  # Cohere's per-request text limit
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # batches in flight at once
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "4"))
+EMBED_RETRY_BASE_DELAY = float(os.getenv("EMBED_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per attempt
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "30"))
+EMBED_QUERY_BATCH_WINDOW_MS = float(os.getenv("EMBED_QUERY_BATCH_WINDOW_MS", "3"))  # 0 disables batching
+EMBED_QUERY_BATCH_MAX = int(os.getenv("EMBED_QUERY_BATCH_MAX", "32"))  # flush early once this many are queued
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, ApiError):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class QueryBatcher:
+    """
+    Collects query embeddings requested within `window` seconds (or until
+    `max_batch` are queued), embeds them in one call and fans the vectors
+    back out. Identical queries in a batch are embedded once.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Awaitable[np.ndarray]],
+        window: float = EMBED_QUERY_BATCH_WINDOW_MS / 1000,
+        max_batch: int = EMBED_QUERY_BATCH_MAX,
+    ):
+        self.embed = embed
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._queue: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_size = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def submit(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((text, future, loop.time()))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        now = asyncio.get_running_loop().time()
+        waits = [now - queued_at for _, _, queued_at in batch]
+        self.batches += 1
+        self.queries += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, *waits)
+
+        texts = list(dict.fromkeys(text for text, future, _ in batch if not future.done()))
+        if not texts:
+            return
+        try:
+            vectors = dict(zip(texts, await self.embed(texts)))
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_queue_wait_ms": 1000 * self.total_wait / self.queries if self.queries else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait,
+        }
+
+
+class EmbeddingService:
+    """Batched, concurrent, retrying wrapper around cohere.AsyncClient"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = COHERE_API_KEY,
+        model: str = COHERE_EMBED_MODEL,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        retry_base_delay: float = EMBED_RETRY_BASE_DELAY,
+    ):
+        self.client = cohere.AsyncClient(api_key, timeout=EMBED_TIMEOUT) if api_key else None
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.query_batcher = QueryBatcher(lambda texts: self.embed(texts, "search_query"))
+        self.query_cache = QueryVectorCache()
+        self.requests = 0
+        self.retries = 0
+        self.texts_embedded = 0
+
+    async def _embed_batch(self, texts: List[str], input_type: str) -> np.ndarray:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.requests += 1
+                    response = await self.client.embed(
+                        texts=texts,
+                        model=self.model,
+                        input_type=input_type,
+                        batching=False
+                    )
+                self.texts_embedded += len(texts)
+                return np.array(response.embeddings, dtype=np.float32)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Exponential backoff with full jitter, outside the semaphore
+                delay = random.uniform(0, self.retry_base_delay * (2 ** attempt))
+                attempt += 1
+                self.retries += 1
+                print(f"⚠️ Embedding batch failed ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def embed(self, texts: List[str], input_type: str) -> np.ndarray:
+        """Embeddings for `texts`, one row per input, in input order"""
+        if not self.client:
+            raise ValueError("Cohere API key not configured")
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._embed_batch(batch, input_type) for batch in batches))
+        return np.vstack(results)
+
+    async def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return await self.embed(texts, "search_document")
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Query vector (a private copy; callers may normalize it in place)"""
+        cached = self.query_cache.get(self.model, query)
+        if cached is not None:
+            return cached.copy()
+
+        if not self.client:
+            raise ValueError("Cohere API key not configured")
+        text = normalize_query(query)
+        if self.query_batcher.window <= 0:
+            vector = (await self.embed([text], "search_query"))[0]
+        else:
+            vector = await self.query_batcher.submit(text)
+        self.query_cache.put(self.model, text, vector)
+        return np.array(vector, dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "batch_size": self.batch_size,
+            "requests": self.requests,
+            "retries": self.retries,
+            "texts_embedded": self.texts_embedded,
+            "query_batching": self.query_batcher.stats(),
+            "query_cache": self.query_cache.stats(),
+        }
+
+
+# Singleton instance
+embedding_service = EmbeddingService()
@@ -0,0 +1,129 @@
+"""
+Host Profile Table
+Badges and reputation resolved once per unique owner principal and joined onto
+every listing that host owns, instead of being re-fetched per property.
+"""
+import os
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+HOST_PROFILE_TTL = float(os.getenv("HOST_PROFILE_TTL", "300"))  # seconds
+
+ProfileFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+# Property fields owned by the host profile join
+HOST_FIELDS = ("host_badges", "is_superhost", "host_reputation")
+
+
+def profile_fields(badges: Iterable[str], reputation: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape raw badges/reputation into the host_* fields stored on each property"""
+    fields: Dict[str, Any] = {}
+
+    badges = list(badges)
+    if badges:
+        fields["host_badges"] = badges
+        fields["is_superhost"] = "superhost" in badges
+
+    if reputation:
+        fields["host_reputation"] = {
+            "average_rating": reputation.get("average_rating", 0) / 100,
+            "total_reviews": reputation.get("total_reviews", 0)
+        }
+
+    return fields
+
+
+class HostProfileTable:
+    """Profiles keyed by principal, each valid for `ttl` seconds"""
+
+    def __init__(self, ttl: float = HOST_PROFILE_TTL):
+        self.ttl = ttl
+        self._profiles: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.fetches = 0
+
+    def get(self, principal: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh profile, or None if missing/expired"""
+        entry = self._profiles.get(principal)
+        if entry is None:
+            return None
+        fetched_at, profile = entry
+        if time.monotonic() - fetched_at > self.ttl:
+            return None
+        return profile
+
+    def put(self, principal: str, profile: Dict[str, Any]):
+        self._profiles[principal] = (time.monotonic(), profile)
+
+    def invalidate(self, principal: str):
+        self._profiles.pop(principal, None)
+
+    def clear(self):
+        self._profiles.clear()
+
+    async def _fetch(self, principal: str, fetch: ProfileFetcher) -> Dict[str, Any]:
+        # Coalesce concurrent lookups for the same host into one fetch
+        pending = self._pending.get(principal)
+        if pending is not None:
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[principal] = future
+        try:
+            self.fetches += 1
+            profile = await fetch(principal)
+            self.put(principal, profile)
+            future.set_result(profile)
+            return profile
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't warn
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(principal, None)
+
+    async def resolve(self, principals: Iterable[str], fetch: ProfileFetcher) -> Dict[str, Dict[str, Any]]:
+        """
+        Return profiles for every distinct principal, fetching the missing or
+        expired ones concurrently. Hosts whose fetch fails are left out.
+        """
+        profiles: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for principal in dict.fromkeys(p for p in principals if p):
+            profile = self.get(principal)
+            if profile is not None:
+                self.hits += 1
+                profiles[principal] = profile
+            else:
+                missing.append(principal)
+
+        if missing:
+            results = await asyncio.gather(
+                *(self._fetch(principal, fetch) for principal in missing),
+                return_exceptions=True
+            )
+            for principal, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    print(f"⚠️ Failed to resolve host profile for {principal}: {result}")
+                    continue
+                profiles[principal] = result
+
+        return profiles
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hosts": len(self._profiles),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "ttl": self.ttl
+        }
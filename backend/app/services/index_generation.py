@@ -0,0 +1,103 @@
+"""
+Index Generations
+Everything a property search reads (the FAISS index, the metadata rows, the
+property_id lookup and the filter attribute columns) bundled into one
+immutable object. VectorStore builds a new generation off to the side and
+publishes it with a single reference assignment; a search pins the
+generation it started with, so it never pairs an index with the wrong rows.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import faiss
+import numpy as np
+
+from app.services import ann_index
+from app.services.attribute_index import AttributeIndex
+from app.services.snapshot import SnapshotPin
+
+
+class IndexGeneration:
+    """
+    One published state of the vector store. Treat every attribute as
+    read-only: writers derive a new generation instead of mutating this one.
+    """
+
+    def __init__(
+        self,
+        index: Optional[Any] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        recall: Optional[float] = None,
+        source: Optional[Path] = None,
+        pin: Optional[SnapshotPin] = None,
+        row_by_id: Optional[Dict[int, int]] = None,
+        attributes: Optional[AttributeIndex] = None,
+    ):
+        """
+        `row_by_id` and `attributes` let a writer hand over structures it
+        already derived for `metadata` instead of rebuilding them from scratch
+        """
+        self.index = index
+        self.metadata: List[Dict[str, Any]] = list(metadata or [])
+        self.recall = recall  # recall@10 against exact search, when known
+        self.source = source  # snapshot file the index lists are memory-mapped from, if any
+        self.pin = pin  # keeps `source` from being pruned for as long as this generation is referenced
+        self.row_by_id: Dict[int, int] = row_by_id if row_by_id is not None else {
+            prop["property_id"]: row
+            for row, prop in enumerate(self.metadata)
+            if prop.get("property_id") is not None
+        }
+        self.attributes = attributes
+        self.keys: Optional[np.ndarray] = None  # metadata row -> inner index key (-1 if not indexed)
+        self.tombstones = np.empty(0, dtype=np.int64)  # inner keys no metadata row points at (HNSW)
+        self.exclude: Optional[faiss.IDSelector] = None  # skips tombstones in unfiltered searches
+        if isinstance(index, faiss.Index):
+            self._build_attributes()
+
+    def _build_attributes(self):
+        if self.attributes is None:
+            self.attributes = AttributeIndex(self.metadata)
+        _, id_map = ann_index.unwrap(self.index)
+        property_ids = self.attributes.property_ids
+        # Rows without a property_id (or missing from the index) can't be searched
+        indexed = np.isin(property_ids, id_map) if id_map is not None else property_ids >= 0
+        self.keys = np.full(len(property_ids), -1, dtype=np.int64)
+        self.keys[indexed] = ann_index.inner_keys(id_map, property_ids[indexed])
+        if id_map is not None and self.index.ntotal > len(self.live_keys):
+            self.tombstones = np.setdiff1d(np.arange(self.index.ntotal, dtype=np.int64), self.live_keys)
+            self.exclude = ann_index.exclude_selector(self.tombstones)
+
+    @property
+    def live_keys(self) -> np.ndarray:
+        return self.keys[self.keys >= 0] if self.keys is not None else np.empty(0, dtype=np.int64)
+
+    @property
+    def tombstone_fraction(self) -> float:
+        total = self.index.ntotal if isinstance(self.index, faiss.Index) else 0
+        return len(self.tombstones) / total if total else 0.0
+
+    @property
+    def mapped(self) -> bool:
+        return self.source is not None
+
+    @property
+    def index_type(self) -> Optional[str]:
+        return ann_index.index_kind(self.index) if isinstance(self.index, faiss.Index) else None
+
+    def get_property(self, property_id: int) -> Optional[Dict[str, Any]]:
+        """O(1) metadata lookup by property_id"""
+        row = self.row_by_id.get(property_id)
+        return self.metadata[row] if row is not None else None
+
+    def filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows matching `filters`, or None when there is nothing to pre-filter"""
+        if not filters or self.attributes is None:
+            return None
+        mask = self.attributes.compile(filters)
+        return mask & (self.keys >= 0) if mask is not None else None
+
+    def writable_index(self) -> faiss.Index:
+        """A private, mutable copy of the index for deriving the next generation"""
+        if self.source is not None:
+            # Memory-mapped lists are read-only and can't be cloned; read the file into memory
+            return ann_index.prepare_loaded(faiss.read_index(str(self.source)))
+        return faiss.clone_index(self.index)
@@ -0,0 +1,164 @@
+"""
+IPFS Metadata Cache
+Content-addressed two-tier cache (in-memory LRU + on-disk sqlite) for IPFS JSON.
+CIDs are immutable, so entries never expire; they are only evicted for space.
+"""
+import os
+import json
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+IPFS_CACHE_PATH = Path(os.getenv("IPFS_CACHE_PATH", "data/ipfs_cache"))
+IPFS_CACHE_MEMORY_BYTES = int(os.getenv("IPFS_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+IPFS_CACHE_DISK_BYTES = int(os.getenv("IPFS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+
+
+def cid_from_uri(ipfs_uri: str) -> str:
+    """Normalize `ipfs://<cid>[/path]`, `/ipfs/<cid>` or a bare CID to `<cid>[/path]`"""
+    cid = ipfs_uri.strip()
+    if cid.startswith("ipfs://"):
+        cid = cid[len("ipfs://"):]
+    elif cid.startswith("/ipfs/"):
+        cid = cid[len("/ipfs/"):]
+    # Remove any trailing garbage characters
+    return cid.split()[0].strip("/") if cid else cid
+
+
+class IPFSMetadataCache:
+    """LRU of raw JSON bytes in memory, backed by zlib-compressed blobs in sqlite"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        memory_bytes: int = IPFS_CACHE_MEMORY_BYTES,
+        disk_bytes: int = IPFS_CACHE_DISK_BYTES,
+    ):
+        # Resolved per instance, so every BlockchainService picks up an overridden path
+        self.path = Path(path if path is not None else IPFS_CACHE_PATH)
+        self.db_file = self.path / "metadata.sqlite"
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_size: Optional[int] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_file), isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    cid TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs(last_access)")
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            self._disk_size = row[0]
+        return self._conn
+
+    def _remember(self, cid: str, raw: bytes):
+        """Insert into the memory tier, evicting least-recently-used entries"""
+        if len(raw) > self.memory_bytes:
+            return
+        old = self._memory.pop(cid, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[cid] = raw
+        self._memory_size += len(raw)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, ipfs_uri: str) -> Optional[Dict[str, Any]]:
+        cid = cid_from_uri(ipfs_uri)
+
+        raw = self._memory.get(cid)
+        if raw is not None:
+            self._memory.move_to_end(cid)
+            self.memory_hits += 1
+            return json.loads(raw)
+
+        try:
+            db = self._db()
+            row = db.execute("SELECT data FROM blobs WHERE cid = ?", (cid,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE blobs SET last_access = ? WHERE cid = ?", (time.time(), cid))
+                raw = zlib.decompress(row[0])
+                self._remember(cid, raw)
+                self.disk_hits += 1
+                return json.loads(raw)
+        except (sqlite3.Error, zlib.error) as e:
+            print(f"⚠️ IPFS cache read failed for {cid}: {e}")
+
+        self.misses += 1
+        return None
+
+    def put(self, ipfs_uri: str, metadata: Dict[str, Any]):
+        cid = cid_from_uri(ipfs_uri)
+        raw = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+        self._remember(cid, raw)
+
+        try:
+            db = self._db()
+            blob = zlib.compress(raw)
+            previous = db.execute("SELECT size FROM blobs WHERE cid = ?", (cid,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO blobs(cid, data, size, last_access) VALUES(?, ?, ?, ?)",
+                (cid, blob, len(blob), time.time()),
+            )
+            self._disk_size += len(blob) - (previous[0] if previous else 0)
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+        except (sqlite3.Error, zlib.error) as e:
+            print(f"⚠️ IPFS cache write failed for {cid}: {e}")
+
+    def _evict_disk(self):
+        """Drop least-recently-accessed blobs until the store is back under 90% of its budget"""
+        db = self._db()
+        target = int(self.disk_bytes * 0.9)
+        rows = db.execute("SELECT cid, size FROM blobs ORDER BY last_access ASC").fetchall()
+        doomed = []
+        for cid, size in rows:
+            if self._disk_size <= target:
+                break
+            doomed.append((cid,))
+            self._disk_size -= size
+        db.executemany("DELETE FROM blobs WHERE cid = ?", doomed)
+        self.evictions += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_bytes": self._disk_size or 0,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
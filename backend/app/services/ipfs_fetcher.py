@@ -0,0 +1,234 @@
+"""
+Multi-Gateway IPFS Fetcher
+Fetches JSON from a ranked list of IPFS gateways with hedged requests,
+per-gateway circuit breakers and EWMA latency scoring.
+"""
+import os
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _gateway_list() -> List[str]:
+    gateways = [g.strip().rstrip("/") for g in os.getenv("IPFS_GATEWAYS", "").split(",") if g.strip()]
+    if not gateways and os.getenv("IPFS_GATEWAY"):
+        gateways = [os.getenv("IPFS_GATEWAY").rstrip("/")]
+    return gateways
+
+
+# Configuration
+IPFS_GATEWAYS = _gateway_list()
+IPFS_HEDGE_PERCENTILE = float(os.getenv("IPFS_HEDGE_PERCENTILE", "0.9"))  # hedge once this percentile is exceeded
+IPFS_HEDGE_MIN_DELAY = float(os.getenv("IPFS_HEDGE_MIN_DELAY", "0.25"))  # seconds
+IPFS_HEDGE_MAX_DELAY = float(os.getenv("IPFS_HEDGE_MAX_DELAY", "3.0"))  # seconds
+IPFS_BREAKER_FAILURES = int(os.getenv("IPFS_BREAKER_FAILURES", "3"))  # consecutive failures before opening
+IPFS_BREAKER_COOLDOWN = float(os.getenv("IPFS_BREAKER_COOLDOWN", "30"))  # seconds before a half-open retry
+IPFS_MAX_METADATA_BYTES = int(os.getenv("IPFS_MAX_METADATA_BYTES", str(1024 * 1024)))
+EWMA_ALPHA = 0.3
+LATENCY_WINDOW = 256
+
+
+class InvalidMetadata(ValueError):
+    """Gateway answered, but not with usable property metadata"""
+
+
+def validate_metadata(metadata: Any) -> Dict[str, Any]:
+    """Reject gateway error pages and junk before it reaches the cache or index"""
+    if not isinstance(metadata, dict) or not metadata:
+        raise InvalidMetadata("metadata is not a non-empty JSON object")
+    if set(metadata) <= {"error", "message", "code", "status"}:
+        raise InvalidMetadata(f"gateway error body: {metadata}")
+    for field in ("title", "description", "location_city", "location_country"):
+        if field in metadata and not isinstance(metadata[field], (str, type(None))):
+            raise InvalidMetadata(f"{field} is not a string")
+    return metadata
+
+
+class GatewayState:
+    """Latency score and circuit breaker for a single gateway"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_trial = False
+        self.successes = 0
+        self.failures = 0
+
+    def is_available(self, now: float) -> bool:
+        if self.opened_at is None:
+            return True
+        # Half-open: let a single trial request through after the cooldown
+        if now - self.opened_at >= IPFS_BREAKER_COOLDOWN and not self.half_open_trial:
+            return True
+        return False
+
+    def score(self) -> float:
+        """Lower is better; unknown gateways are tried optimistically"""
+        return self.ewma if self.ewma is not None else 0.0
+
+    def record_latency(self, latency: float):
+        self.ewma = latency if self.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self.record_latency(latency)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.half_open_trial = False
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.half_open_trial = False
+        if self.consecutive_failures >= IPFS_BREAKER_FAILURES:
+            self.opened_at = now
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.is_available(time.monotonic()) else "open"
+
+
+@asynccontextmanager
+async def _no_slot(url: str):
+    yield
+
+
+class IPFSFetcher:
+    """Hedged, circuit-broken JSON fetches across several gateways"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], httpx.AsyncClient],
+        gateways: Optional[List[str]] = None,
+        timeout: Union[float, httpx.Timeout] = 15.0,
+        slot: Callable = _no_slot,
+        validator: Callable[[Any], Dict[str, Any]] = validate_metadata,
+    ):
+        self.client_factory = client_factory
+        self.gateways = [GatewayState(url) for url in (IPFS_GATEWAYS if gateways is None else gateways)]
+        self.timeout = timeout
+        self.slot = slot
+        self.validator = validator
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> float:
+        """Recent latency percentile, clamped; fixed max until we have samples"""
+        if len(self.latencies) < 10:
+            return IPFS_HEDGE_MAX_DELAY
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(IPFS_HEDGE_PERCENTILE * len(ordered)))
+        return min(IPFS_HEDGE_MAX_DELAY, max(IPFS_HEDGE_MIN_DELAY, ordered[index]))
+
+    def ranked(self) -> List[GatewayState]:
+        now = time.monotonic()
+        available = sorted((g for g in self.gateways if g.is_available(now)), key=GatewayState.score)
+        if available:
+            return available
+        # Every breaker is open: try the one that has been cooling down longest
+        return sorted(self.gateways, key=lambda g: g.opened_at or 0.0)[:1]
+
+    async def _fetch_one(self, gateway: GatewayState, cid: str) -> Dict[str, Any]:
+        url = f"{gateway.url}/{cid}"
+        if gateway.opened_at is not None:
+            gateway.half_open_trial = True
+        started = time.monotonic()
+        try:
+            async with self.slot(url):
+                response = await self.client_factory().get(url, timeout=self.timeout)
+            response.raise_for_status()
+            if len(response.content) > IPFS_MAX_METADATA_BYTES:
+                raise InvalidMetadata(f"metadata is {len(response.content)} bytes")
+            metadata = self.validator(response.json())
+        except asyncio.CancelledError:
+            # Lost a hedge race: not a failure, but the time it had already
+            # taken is a lower bound on its latency, so it stops ranking first
+            gateway.half_open_trial = False
+            gateway.record_latency(time.monotonic() - started)
+            raise
+        except Exception:
+            gateway.record_failure(time.monotonic())
+            raise
+
+        latency = time.monotonic() - started
+        gateway.record_success(latency)
+        self.latencies.append(latency)
+        return metadata
+
+    async def fetch(self, cid: str) -> Optional[Dict[str, Any]]:
+        """
+        Try the best-scoring gateway; if it hasn't answered within the hedge
+        delay, race the next one too. Failures fail over immediately.
+        Returns None when every gateway fails.
+        """
+        candidates = self.ranked()
+        if not candidates:
+            print("⚠️ No IPFS gateways configured (IPFS_GATEWAYS / IPFS_GATEWAY)")
+            return None
+
+        queue = list(candidates)
+        in_flight: Dict[asyncio.Task, GatewayState] = {}
+        first = True
+
+        def launch():
+            gateway = queue.pop(0)
+            in_flight[asyncio.create_task(self._fetch_one(gateway, cid))] = gateway
+
+        launch()
+        try:
+            while in_flight:
+                timeout = self.hedge_delay() if queue else None
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Primary is slower than usual: hedge with the next gateway
+                    self.hedges += 1
+                    launch()
+                    first = False
+                    continue
+
+                for task in done:
+                    gateway = in_flight.pop(task)
+                    if task.exception() is None:
+                        if not first and gateway is not candidates[0]:
+                            self.hedge_wins += 1
+                        return task.result()
+                    print(f"⚠️ IPFS gateway {gateway.url} failed for {cid}: {task.exception()}")
+
+                if queue and len(in_flight) < 2:
+                    launch()
+                    first = False
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_delay": self.hedge_delay(),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "gateways": [
+                {
+                    "url": g.url,
+                    "state": g.state(),
+                    "ewma_latency": g.ewma,
+                    "successes": g.successes,
+                    "failures": g.failures,
+                }
+                for g in self.gateways
+            ],
+        }
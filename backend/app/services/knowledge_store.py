@@ -2,19 +2,21 @@
 Knowledge Store Service - FAQ and General Information
 Handles indexing and searching StackNStay knowledge base
 """
-import os
 from typing import List, Dict, Any, Optional
 from pathlib import Path
-import cohere
 import faiss
 import numpy as np
 import json
 from dotenv import load_dotenv
 
+from app.services.embedding_cache import embedding_cache
+from app.services.embeddings import COHERE_EMBED_MODEL, embedding_service
+
 load_dotenv()
 
 # Configuration
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
+# Bump whenever the chunk text layout in index_knowledge_base changes
+KNOWLEDGE_TEXT_VERSION = "1"
 KNOWLEDGE_BASE_FILE = Path(__file__).parent.parent / "knowledge_base.md"
 KNOWLEDGE_STORE_PATH = Path("knowledge_store")
 FAISS_INDEX_FILE = KNOWLEDGE_STORE_PATH / "knowledge_index.bin"
@@ -25,7 +27,7 @@ class KnowledgeStore:
     """Vector store for StackNStay knowledge base (FAQ, guides, etc.)"""
     
     def __init__(self):
-        self.cohere_client = cohere.Client(COHERE_API_KEY) if COHERE_API_KEY else None
+        self.embedder = embedding_service
         self.index: Optional[faiss.Index] = None
         self.knowledge_chunks: List[Dict[str, Any]] = []
         self.dimension = 1024  # Cohere embed-english-v3.0
@@ -127,33 +129,20 @@ class KnowledgeStore:
         return len(chunks)
     
     async def _embed_texts(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings using Cohere"""
-        if not self.cohere_client:
-            raise ValueError("Cohere API key not configured")
-        
+        """Generate embeddings using Cohere (unchanged chunks come from the embedding cache)"""
         try:
-            response = self.cohere_client.embed(
-                texts=texts,
-                model="embed-english-v3.0",
-                input_type="search_document"
+            return await embedding_cache.embed(
+                texts, self.embedder.embed_documents,
+                model=COHERE_EMBED_MODEL, input_type="search_document", version=KNOWLEDGE_TEXT_VERSION
             )
-            return np.array(response.embeddings, dtype=np.float32)
         except Exception as e:
             print(f"Error generating embeddings: {e}")
             raise
     
     async def _embed_query(self, query: str) -> np.ndarray:
         """Generate embedding for search query"""
-        if not self.cohere_client:
-            raise ValueError("Cohere API key not configured")
-        
         try:
-            response = self.cohere_client.embed(
-                texts=[query],
-                model="embed-english-v3.0",
-                input_type="search_query"
-            )
-            return np.array(response.embeddings[0], dtype=np.float32)
+            return await self.embedder.embed_query(query)
         except Exception as e:
             print(f"Error generating query embedding: {e}")
             raise
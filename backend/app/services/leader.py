@@ -0,0 +1,74 @@
+"""
+Index Leader Election
+Under gunicorn every worker runs the app lifespan. Only one process (the
+leader) should crawl the chain and build snapshots; the others load the
+published snapshot and follow new generations. The leader is whichever
+process holds an exclusive lock on a shared file, which the OS releases if
+that process dies.
+"""
+import os
+import fcntl
+from pathlib import Path
+from typing import Optional, TextIO
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+INDEX_ROLE = os.getenv("INDEX_ROLE", "auto")  # auto (first process to take the lock leads), leader, follower
+LEADER_LOCK_FILE = Path(os.getenv("LEADER_LOCK_FILE", "data/vector_store/leader.lock"))
+
+ROLES = ("auto", "leader", "follower")
+
+
+class LeaderLock:
+    """Non-blocking exclusive flock held for the life of the process"""
+
+    def __init__(self, path: Path = LEADER_LOCK_FILE):
+        self.path = Path(path)
+        self._file: Optional[TextIO] = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def resolve_role(self, requested: Optional[str] = None) -> str:
+        """`leader` or `follower` for this process"""
+        requested = (requested or INDEX_ROLE).lower()
+        if requested not in ROLES:
+            raise ValueError(f"Unknown INDEX_ROLE {requested!r}; expected one of {ROLES}")
+        if requested == "follower":
+            return "follower"
+        if self.acquire():
+            return "leader"
+        if requested == "leader":
+            raise RuntimeError(f"INDEX_ROLE=leader but another process holds {self.path}")
+        return "follower"
+
+
+# Singleton instance
+leader_lock = LeaderLock()
@@ -0,0 +1,89 @@
+"""
+Query Vector Cache
+In-process LRU of query embeddings, bounded in bytes with an optional TTL.
+Keys are normalized query text, so "Ghana", " ghana " and "ＧＨＡＮＡ" share
+one entry.
+"""
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "0"))  # seconds; 0 keeps entries until evicted
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Unicode (NFKC), case and whitespace normalization"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query).casefold()).strip()
+
+
+class QueryVectorCache:
+    """LRU of normalized query -> vector"""
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES, ttl: float = QUERY_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, key: Tuple[str, str]):
+        _, vector = self._entries.pop(key)
+        self._bytes -= vector.nbytes
+
+    def get(self, model: str, query: str) -> Optional[np.ndarray]:
+        key = (model, normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl > 0 and time.monotonic() - entry[0] > self.ttl:
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, model: str, query: str, vector: np.ndarray):
+        key = (model, normalize_query(query))
+        vector = np.array(vector, dtype=np.float32)
+        # Callers share the cached array, so make sure nobody can mutate it in place
+        vector.setflags(write=False)
+        if vector.nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic(), vector)
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
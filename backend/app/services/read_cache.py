@@ -0,0 +1,146 @@
+"""
+Read-Only Call Cache
+Results of `call-read` invocations keyed by (contract, function, encoded args).
+A read-only call can only change when the chain tip advances, so the whole
+cache is dropped whenever the node reports a new block height.
+"""
+import os
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+READ_CACHE_ENABLED = os.getenv("READ_CACHE_ENABLED", "true").lower() == "true"
+READ_CACHE_TIP_INTERVAL = float(os.getenv("READ_CACHE_TIP_INTERVAL", "5"))  # seconds between tip height polls
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "20000"))
+
+CallKey = Tuple[Hashable, ...]
+TipFetcher = Callable[[], Awaitable[Optional[int]]]
+
+
+class ReadCallCache:
+    """
+    Block-scoped cache with in-flight coalescing. While the tip height is
+    unknown (node unreachable or not reporting it) results are not cached,
+    but identical concurrent calls are still coalesced.
+    """
+
+    def __init__(
+        self,
+        fetch_tip: TipFetcher,
+        tip_interval: float = READ_CACHE_TIP_INTERVAL,
+        max_entries: int = READ_CACHE_MAX_ENTRIES,
+        enabled: bool = READ_CACHE_ENABLED,
+    ):
+        self.fetch_tip = fetch_tip
+        self.tip_interval = tip_interval
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.tip_height: Optional[int] = None
+        self._tip_checked_at: Optional[float] = None
+        self._tip_pending: Optional[asyncio.Future] = None
+        self._entries: "OrderedDict[CallKey, Any]" = OrderedDict()
+        self._pending: Dict[CallKey, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        """Drop every cached result and force a tip re-check on the next call"""
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._tip_checked_at = None
+
+    def _observe_tip(self, height: Optional[int]):
+        if height is not None and height != self.tip_height:
+            if self.tip_height is not None:
+                self.invalidate()
+            self.tip_height = height
+        elif height is None:
+            # Can't tell whether the chain moved, so nothing cached is trustworthy
+            self._entries.clear()
+            self.tip_height = None
+        self._tip_checked_at = time.monotonic()
+
+    async def current_tip(self) -> Optional[int]:
+        """Tip height, re-polled at most every `tip_interval` seconds"""
+        if self._tip_checked_at is not None and time.monotonic() - self._tip_checked_at < self.tip_interval:
+            return self.tip_height
+
+        if self._tip_pending is not None:
+            return await asyncio.shield(self._tip_pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._tip_pending = future
+        try:
+            try:
+                height = await self.fetch_tip()
+            except Exception as e:
+                print(f"⚠️ Could not read chain tip height: {e}")
+                height = None
+            self._observe_tip(height)
+            future.set_result(self.tip_height)
+            return self.tip_height
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            self._tip_pending = None
+
+    async def get_or_call(self, key: CallKey, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result for `key` in the current block, or run `call` once"""
+        if not self.enabled:
+            return await call()
+
+        tip = await self.current_tip()
+        if tip is not None and key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = await call()
+            # Only keep it if the block hasn't moved on while we were waiting
+            if tip is not None and self.tip_height == tip:
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't warn
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "tip_height": self.tip_height,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,160 @@
+"""
+FAISS Search Executor
+Runs FAISS searches on a bounded thread pool (FAISS releases the GIL) so a
+large scan never blocks the event loop. Single-vector searches that arrive
+within a short window against the same index and parameters are stacked
+into one matrix search, which BLAS handles far more efficiently than many
+single queries, and each caller gets its own row back. A query that finds
+a pool thread free is dispatched at once instead of waiting out the window,
+so queries only wait to be batched while every thread is busy; a thread that
+frees up takes the oldest waiting batch right away.
+"""
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+from app.services import ann_index
+
+load_dotenv()
+
+# Configuration
+FAISS_SEARCH_THREADS = int(os.getenv("FAISS_SEARCH_THREADS", str(min(4, os.cpu_count() or 1))))
+FAISS_SEARCH_BATCH_WINDOW_MS = float(os.getenv("FAISS_SEARCH_BATCH_WINDOW_MS", "1"))  # 0 disables batching
+FAISS_SEARCH_BATCH_MAX = int(os.getenv("FAISS_SEARCH_BATCH_MAX", "64"))  # flush early once this many are queued
+# Flat search switches from per-query scans to one BLAS matrix product at this many queries (FAISS default: 20).
+# FAISS keeps this in a process-wide variable; it is set when the executor starts its pool with batching on.
+# Only matrix searches with at least this many queries are affected, which here means the executor's batches
+FAISS_BLAS_THRESHOLD = int(os.getenv("FAISS_BLAS_THRESHOLD", "8"))
+
+# (index, tombstone selector, ef_search, nprobe): only searches sharing all four can share a matrix call
+BatchKey = Tuple[int, int, Optional[int], Optional[int]]
+Pending = Tuple[faiss.Index, Optional[faiss.IDSelector], np.ndarray, int, asyncio.Future]
+
+
+class SearchExecutor:
+    """Bounded thread pool for FAISS work plus a micro-batcher for single-vector searches"""
+
+    def __init__(
+        self,
+        threads: int = FAISS_SEARCH_THREADS,
+        window: float = FAISS_SEARCH_BATCH_WINDOW_MS / 1000,
+        max_batch: int = FAISS_SEARCH_BATCH_MAX,
+    ):
+        self.threads = max(1, threads)
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queues: Dict[BatchKey, List[Pending]] = {}
+        self._timers: Dict[BatchKey, asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self._in_flight = 0
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_size = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            if self.window > 0:
+                # Batches of FAISS_BLAS_THRESHOLD..19 queries take the matrix product too
+                faiss.cvar.distance_compute_blas_threshold = FAISS_BLAS_THRESHOLD
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="faiss-search")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run any blocking FAISS call on the pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def search(
+        self,
+        index: faiss.Index,
+        query: np.ndarray,
+        k: int,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        exclude: Optional[faiss.IDSelector] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (scores, property_ids) for one query vector, shaped (1, k) like faiss.
+        `exclude` is the generation's tombstone selector, if it has one.
+        """
+        query = np.ascontiguousarray(query, dtype=np.float32).reshape(1, -1)
+        if self.window <= 0:
+            return await self.run(ann_index.search, index, query, k, None, ef_search, nprobe, exclude)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (id(index), id(exclude), ef_search, nprobe)
+        queue = self._queues.setdefault(key, [])
+        queue.append((index, exclude, query, k, future))
+        if len(queue) >= self.max_batch or (len(queue) == 1 and self._in_flight < self.threads):
+            # A lone query with a free thread gains nothing from waiting for company
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key: BatchKey):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._queues.pop(key, [])
+        if not batch:
+            return
+        self._in_flight += 1
+        task = asyncio.get_running_loop().create_task(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: BatchKey, batch: List[Pending]):
+        try:
+            await self._search_batch(key, batch)
+        finally:
+            self._in_flight -= 1
+            if self._queues and self._in_flight < self.threads:
+                # Queued while every thread was busy; no need to wait out the rest of the window
+                self._flush(next(iter(self._queues)))
+
+    async def _search_batch(self, key: BatchKey, batch: List[Pending]):
+        self.batches += 1
+        self.queries += len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+
+        _, _, ef_search, nprobe = key
+        index, exclude = batch[0][0], batch[0][1]
+        queries = np.vstack([query for _, _, query, _, _ in batch])
+        k = max(k for _, _, _, k, _ in batch)
+        try:
+            scores, found = await self.run(ann_index.search, index, queries, k, None, ef_search, nprobe, exclude)
+        except Exception as e:
+            for _, _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for row, (_, _, _, want, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((scores[row:row + 1, :want], found[row:row + 1, :want]))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threads": self.threads,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+        }
+
+
+# Singleton instance
+search_executor = SearchExecutor()
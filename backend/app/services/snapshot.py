@@ -0,0 +1,271 @@
+"""
+Vector Store Snapshots
+Versioned, write-once snapshots of the property index: each generation is a
+directory holding the FAISS index, the metadata rows packed with msgpack and
+a manifest with sizes and SHA-256 checksums. A generation is written under a
+temporary name, renamed into place and then published by atomically
+replacing the CURRENT pointer, so readers never see a partial snapshot.
+Writers in different processes are serialized with a file lock.
+
+A process that keeps using a generation's files (a memory-mapped index)
+holds a shared flock on its directory through a SnapshotPin; prune() skips
+any directory it can't lock exclusively, so a follower's mapped generation
+outlives SNAPSHOT_KEEP until the follower lets go of it.
+"""
+import os
+import fcntl
+import json
+import time
+import shutil
+import hashlib
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import faiss
+import ormsgpack
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2"))  # generations kept on disk, including the current one
+SNAPSHOT_MMAP = os.getenv("SNAPSHOT_MMAP", "true").lower() == "true"  # memory-map IVF lists on load
+# Check checksums when a process first loads a snapshot; following later generations only checks sizes
+SNAPSHOT_VERIFY = os.getenv("SNAPSHOT_VERIFY", "true").lower() == "true"
+SNAPSHOT_POLL_INTERVAL = float(os.getenv("SNAPSHOT_POLL_INTERVAL", "2"))  # seconds between CURRENT checks
+
+INDEX_NAME = "index.faiss"
+METADATA_NAME = "metadata.msgpack"
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+WRITE_LOCK_NAME = "write.lock"
+
+
+class SnapshotError(Exception):
+    """A snapshot is missing files, has the wrong format or fails its checksum"""
+
+
+def _sha256(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SnapshotPin:
+    """Shared flock on one generation directory, released by close() or when the pin is collected"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError as e:
+            raise SnapshotError(f"Snapshot {self.path.name} no longer exists") from e
+        self._close = weakref.finalize(self, os.close, fd)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        # prune() may have removed it between our open() and flock()
+        if not (self.path / MANIFEST_NAME).exists():
+            self.close()
+            raise SnapshotError(f"Snapshot {self.path.name} no longer exists")
+
+    @property
+    def generation(self) -> str:
+        return self.path.name
+
+    def close(self):
+        self._close()
+
+    def __enter__(self) -> "SnapshotPin":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotStore:
+    """Generations under `root`, with `root/CURRENT` naming the live one"""
+
+    def __init__(self, root: Path, keep: int = SNAPSHOT_KEEP):
+        self.root = Path(root)
+        self.keep = max(1, keep)
+
+    @property
+    def current_path(self) -> Path:
+        return self.root / CURRENT_NAME
+
+    def current(self) -> Optional[str]:
+        try:
+            return self.current_path.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, generation: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        generation = generation or self.current()
+        if generation is None:
+            return None
+        with open(self.root / generation / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def pin(self, generation: Optional[str] = None) -> Optional[SnapshotPin]:
+        """
+        Pin a generation (default: current) so prune() keeps its files, or
+        None if there is none. Retries when CURRENT moves on mid-pin.
+        """
+        while True:
+            name = generation or self.current()
+            if name is None:
+                return None
+            try:
+                return SnapshotPin(self.root / name)
+            except SnapshotError:
+                if generation is not None or self.current() == name:
+                    raise
+
+    @property
+    def lock_path(self) -> Path:
+        return self.root / WRITE_LOCK_NAME
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """Exclusive across processes (e.g. gunicorn workers and the indexer)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def write(
+        self,
+        index: faiss.Index,
+        metadata: List[Dict[str, Any]],
+        info: Optional[Dict[str, Any]] = None,
+        locked: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Write a new generation and make it current. Returns its manifest.
+        Pass `locked` when the caller already holds the lock on `lock_path`.
+        """
+        if locked:
+            return self._write(index, metadata, info)
+        with self.write_lock():
+            return self._write(index, metadata, info)
+
+    def _write(self, index: faiss.Index, metadata: List[Dict[str, Any]], info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        generation = f"gen-{time.time_ns():020d}"
+        tmp_dir = self.root / f"{generation}.tmp"
+        tmp_dir.mkdir()
+        try:
+            faiss.write_index(index, str(tmp_dir / INDEX_NAME))
+            with open(tmp_dir / METADATA_NAME, "wb") as f:
+                f.write(ormsgpack.packb(metadata, option=ormsgpack.OPT_NON_STR_KEYS))
+
+            files = {}
+            for name in (INDEX_NAME, METADATA_NAME):
+                path = tmp_dir / name
+                with open(path, "rb") as f:
+                    os.fsync(f.fileno())
+                files[name] = {"bytes": path.stat().st_size, "sha256": _sha256(path)}
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "generation": generation,
+                "created_at": time.time(),
+                "count": len(metadata),
+                "files": files,
+                **(info or {}),
+            }
+            with open(tmp_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_dir, self.root / generation)
+            pointer = self.root / f"{CURRENT_NAME}.tmp"
+            with open(pointer, "w", encoding="utf-8") as f:
+                f.write(generation)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer, self.current_path)
+            _fsync_dir(self.root)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.prune()
+        return manifest
+
+    def read(
+        self,
+        generation: Optional[str] = None,
+        mmap: bool = SNAPSHOT_MMAP,
+        verify: bool = SNAPSHOT_VERIFY,
+    ) -> Optional[Tuple[faiss.Index, List[Dict[str, Any]], Dict[str, Any]]]:
+        """(index, metadata, manifest) for a generation (default: current), or None if there is none"""
+        pin = self.pin(generation)
+        if pin is None:
+            return None
+        with pin:
+            return self._read(pin.generation, mmap, verify)
+
+    def _read(self, generation: str, mmap: bool, verify: bool) -> Tuple[faiss.Index, List[Dict[str, Any]], Dict[str, Any]]:
+        directory = self.root / generation
+        try:
+            manifest = self.manifest(generation)
+        except FileNotFoundError as e:
+            raise SnapshotError(f"Snapshot {generation} has no manifest") from e
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Snapshot {generation} has unsupported format {manifest.get('format')}")
+
+        for name, expected in manifest["files"].items():
+            path = directory / name
+            if not path.exists() or path.stat().st_size != expected["bytes"]:
+                raise SnapshotError(f"Snapshot {generation} file {name} is missing or truncated")
+            if verify and _sha256(path) != expected["sha256"]:
+                raise SnapshotError(f"Snapshot {generation} file {name} fails its checksum")
+
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(str(directory / INDEX_NAME), flags)
+        with open(directory / METADATA_NAME, "rb") as f:
+            metadata = ormsgpack.unpackb(f.read())
+        return index, metadata, manifest
+
+    def index_path(self, generation: str) -> Path:
+        return self.root / generation / INDEX_NAME
+
+    def prune(self):
+        """
+        Drop all but the newest `keep` generations and any abandoned temp
+        directories, except generations another reader has pinned
+        """
+        current = self.current()
+        generations = sorted(
+            (p for p in self.root.iterdir() if p.is_dir() and p.name.startswith("gen-")),
+            key=lambda p: p.name,
+        )
+        complete = [p for p in generations if not p.name.endswith(".tmp")]
+        stale = [p for p in generations if p.name.endswith(".tmp")] + complete[:-self.keep]
+        for path in stale:
+            if path.name == current:
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(f"📌 Keeping snapshot {path.name}: still in use")
+                continue
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                os.close(fd)
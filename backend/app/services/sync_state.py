@@ -0,0 +1,160 @@
+"""
+Catalog Sync State
+Persistent checkpoint of what has already been synced from the escrow contract,
+and the added/changed/removed delta produced by each incremental sync.
+
+Every API worker may sync (chain events can reach any of them), so a sync is
+a read-modify-write under an exclusive lock file: it re-reads the checkpoint
+after taking the lock instead of trusting a copy loaded earlier.
+"""
+import os
+import json
+import fcntl
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, TypedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+SYNC_STATE_PATH = Path(os.getenv("SYNC_STATE_PATH", "data/sync"))
+CHECKPOINT_FILE = SYNC_STATE_PATH / "checkpoint.json"
+CHECKPOINT_VERSION = 1
+FILE_LOCK_POLL_INTERVAL = 0.05  # seconds between attempts while another process holds a lock file
+
+
+@asynccontextmanager
+async def file_lock(path: Path) -> AsyncIterator[None]:
+    """
+    Exclusive flock on `path`, shared by every process and coroutine. Waits
+    by polling so the event loop keeps running and cancellation is safe.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(FILE_LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class SyncDelta(TypedDict):
+    """Result of one incremental sync"""
+    nonce: int
+    added: List[Dict[str, Any]]
+    changed: List[Dict[str, Any]]
+    removed: List[int]
+    properties: List[Dict[str, Any]]  # full catalog after the delta
+
+
+def has_changes(delta: SyncDelta) -> bool:
+    return bool(delta["added"] or delta["changed"] or delta["removed"])
+
+
+async def apply_sync_delta(store, delta: SyncDelta) -> int:
+    """
+    Apply a sync delta to a vector store and persist it; returns the catalog size.
+    Always applied, even when the catalog came back empty: the delta may still
+    carry removals (e.g. the last listing was deactivated). Stores no-op on an
+    empty delta.
+    """
+    count = await store.apply_delta(delta)
+    await store.save_async()
+    return count
+
+
+def tuple_fingerprint(property_data: Dict[str, Any]) -> str:
+    """Stable hash of the on-chain property tuple"""
+    fields = {
+        key: property_data.get(key)
+        for key in ("owner", "price_per_night_ustx", "location_tag", "metadata_uri", "active", "created_at")
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SyncCheckpoint:
+    """
+    Last synced `property-id-nonce`, plus for every synced property its
+    metadata URI, tuple fingerprint and last known full record.
+    Modify it only inside `locked()`.
+    """
+
+    def __init__(self, path: Path = CHECKPOINT_FILE):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.last_nonce = 0
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self.properties: Dict[int, Dict[str, Any]] = {}
+
+    @asynccontextmanager
+    async def locked(self) -> AsyncIterator["SyncCheckpoint"]:
+        """Hold the checkpoint lock across workers, starting from what is on disk now"""
+        async with file_lock(self.lock_path):
+            yield self.load()
+
+    def load(self) -> "SyncCheckpoint":
+        """Re-read the file; another worker may have written it since the last load"""
+        self.last_nonce = 0
+        self.entries = {}
+        self.properties = {}
+        if not self.path.exists():
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CHECKPOINT_VERSION:
+                print(f"⚠️ Ignoring sync checkpoint with version {data.get('version')}")
+                return self
+            self.last_nonce = data.get("last_nonce", 0)
+            self.entries = {int(k): v for k, v in data.get("entries", {}).items()}
+            self.properties = {int(k): v for k, v in data.get("properties", {}).items()}
+            print(f"📍 Loaded sync checkpoint: nonce {self.last_nonce}, {len(self.properties)} properties")
+        except Exception as e:
+            print(f"⚠️ Failed to load sync checkpoint, starting fresh: {e}")
+            self.last_nonce = 0
+            self.entries = {}
+            self.properties = {}
+        return self
+
+    def save(self):
+        """Write atomically (temp file + rename) so a crash never leaves a torn checkpoint"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CHECKPOINT_VERSION,
+                "last_nonce": self.last_nonce,
+                "entries": self.entries,
+                "properties": self.properties,
+            }, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, property_id: int) -> Optional[str]:
+        entry = self.entries.get(property_id)
+        return entry["tuple_hash"] if entry else None
+
+    def record(self, property_id: int, property_data: Dict[str, Any], full_property: Optional[Dict[str, Any]]):
+        """Remember a synced tuple; `full_property` is None for listings kept out of the catalog"""
+        self.entries[property_id] = {
+            "tuple_hash": tuple_fingerprint(property_data),
+            "metadata_uri": property_data.get("metadata_uri"),
+        }
+        if full_property is None:
+            self.properties.pop(property_id, None)
+        else:
+            self.properties[property_id] = full_property
+
+    def forget(self, property_id: int):
+        self.entries.pop(property_id, None)
+        self.properties.pop(property_id, None)
+
+    def all_properties(self) -> List[Dict[str, Any]]:
+        return [self.properties[pid] for pid in sorted(self.properties)]
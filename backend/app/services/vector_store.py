@@ -8,20 +8,52 @@ import faiss
 import numpy as np
 import asyncpg
 import asyncio
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from pathlib import Path
-import cohere
 from dotenv import load_dotenv
 
+from app.db import pgvector_ann
+from app.db.pgvector_codec import register_jsonb_codec, register_vector_codec, to_wire
+from app.db.pgvector_filters import FILTER_COLUMNS, compile_filters, filter_columns, has_filters
+from app.db.pgvector_reindex import rebuild_table, replace_rows
+from app.services import ann_index
+from app.services.attribute_index import amenity_list
+from app.services.embedding_cache import embedding_cache
+from app.services.embeddings import COHERE_EMBED_MODEL, embedding_service
+from app.services.index_generation import IndexGeneration
+from app.services.search_executor import search_executor
+from app.services.snapshot import SNAPSHOT_MMAP, SNAPSHOT_POLL_INTERVAL, SNAPSHOT_VERIFY, SnapshotStore
+from app.services.sync_state import SyncDelta, file_lock, has_changes
+
 load_dotenv()
 
 # Configuration
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
+# Bump whenever create_property_text changes so cached document embeddings are not reused
+PROPERTY_TEXT_VERSION = "1"
 DATABASE_URL = os.getenv("DATABASE_URL")
 VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
 VECTOR_STORE_PATH = Path("data/vector_store")
+SNAPSHOT_DIR = VECTOR_STORE_PATH / "snapshots"
+# Pre-snapshot layout, still read once and converted to a snapshot
 FAISS_INDEX_FILE = VECTOR_STORE_PATH / "faiss_index.bin"
 METADATA_FILE = VECTOR_STORE_PATH / "property_metadata.json"
+# Filtered searches with at most this many matching listings are scored exactly with one matmul
+PREFILTER_BRUTE_FORCE_MAX = int(os.getenv("PREFILTER_BRUTE_FORCE_MAX", "2048"))
+# pgvector < 0.8 has no iterative index scans: a filtered search that comes back short is retried
+# with this many ivfflat probes (the index's list count makes the retry exhaustive) and this
+# hnsw.ef_search (the HNSW candidate list the filter is applied to; pgvector caps it at 1000)
+PGVECTOR_FILTER_PROBES = int(os.getenv("PGVECTOR_FILTER_PROBES", "100"))
+PGVECTOR_FILTER_EF_SEARCH = int(os.getenv("PGVECTOR_FILTER_EF_SEARCH", "400"))
+PGVECTOR_POOL_MIN_SIZE = int(os.getenv("PGVECTOR_POOL_MIN_SIZE", "2"))  # opened (and warmed) at startup
+PGVECTOR_POOL_MAX_SIZE = int(os.getenv("PGVECTOR_POOL_MAX_SIZE", "10"))
+PGVECTOR_STATEMENT_CACHE_SIZE = int(os.getenv("PGVECTOR_STATEMENT_CACHE_SIZE", "256"))  # prepared statements per connection
+
+# Columns of a property_embeddings row as written by COPY
+ROW_COLUMNS = ["property_id", "title", "embedding", "metadata", *FILTER_COLUMNS]
+
+# (upserts, their embeddings, removals, future resolved with the published generation)
+PendingChange = Tuple[List[Dict[str, Any]], Optional[np.ndarray], List[int], asyncio.Future]
 
 
 def create_property_text(property_data: Dict[str, Any]) -> str:
@@ -85,13 +117,81 @@ class VectorStore:
     """FAISS vector store with Cohere embeddings for property search"""
     
     def __init__(self):
-        self.cohere_client = cohere.Client(COHERE_API_KEY) if COHERE_API_KEY else None
-        self.index: Optional[faiss.Index] = None
-        self.property_metadata: List[Dict[str, Any]] = []
+        self.embedder = embedding_service
+        # Index, metadata and filter columns are published together as one immutable generation;
+        # vectors are stored under their property_id and the index type comes from ann_index
+        self.generation = IndexGeneration()
         self.dimension = 1024  # Cohere embed-english-v3.0 dimension
+        self.snapshots = SnapshotStore(SNAPSHOT_DIR)
+        self.snapshot_generation: Optional[str] = None
+        self._saved: Optional[IndexGeneration] = self.generation  # generation the current snapshot holds
+        self._write_lock = asyncio.Lock()  # one writer derives the next generation at a time
+        self._pending: List[PendingChange] = []  # changes queued behind the writer, applied as one batch
+        self._holds_snapshot_lock = False  # set inside snapshot_lock(), so save() doesn't lock again
         
         # Create data directory if it doesn't exist
         VECTOR_STORE_PATH.mkdir(parents=True, exist_ok=True)
+
+    @asynccontextmanager
+    async def snapshot_lock(self) -> AsyncIterator[None]:
+        """
+        Hold the snapshot write lock across processes from reading the base
+        generation to writing the next one, so two workers never derive from
+        the same base and drop each other's changes. Waits without blocking
+        the event loop.
+        """
+        async with file_lock(self.snapshots.lock_path):
+            self._holds_snapshot_lock = True
+            try:
+                yield
+            finally:
+                self._holds_snapshot_lock = False
+
+    def _publish(self, generation: IndexGeneration) -> IndexGeneration:
+        """Make `generation` live; searches already running keep the one they pinned"""
+        self.generation = generation
+        return generation
+
+    @property
+    def index(self) -> Optional[faiss.Index]:
+        return self.generation.index
+
+    @property
+    def property_metadata(self) -> List[Dict[str, Any]]:
+        return self.generation.metadata
+
+    @property_metadata.setter
+    def property_metadata(self, properties: List[Dict[str, Any]]):
+        generation = self.generation
+        self._publish(IndexGeneration(generation.index, properties, generation.recall, generation.source, generation.pin))
+
+    @property
+    def index_recall(self) -> Optional[float]:
+        return self.generation.recall
+
+    @property
+    def index_type(self) -> Optional[str]:
+        return self.generation.index_type
+
+    def get_property(self, property_id: int) -> Optional[Dict[str, Any]]:
+        """O(1) metadata lookup by property_id"""
+        return self.generation.get_property(property_id)
+
+    @staticmethod
+    def _build_index(embeddings: np.ndarray, property_ids: np.ndarray):
+        """Build the index type suited to the catalog size. Returns (index, recall@10)"""
+        kind = ann_index.choose_index_type(len(property_ids))
+        print(f"🧭 Building {kind} index for {len(property_ids)} vectors")
+        index = ann_index.build_index(embeddings, property_ids, kind)
+        # Flat is exact by definition; only approximate indexes need measuring
+        recall = 1.0 if kind == "flat" else ann_index.recall_at_k(index, embeddings, property_ids)
+        if kind != "flat":
+            print(f"📏 {kind} recall@10 vs exact search: {recall:.3f}")
+        return index, recall
+
+    @staticmethod
+    def _ids_array(property_ids: List[int]) -> np.ndarray:
+        return np.asarray(property_ids, dtype=np.int64)
         
     def _create_property_text(self, property_data: Dict[str, Any]) -> str:
         """
@@ -101,21 +201,13 @@ class VectorStore:
     
     async def embed_texts(self, texts: List[str]) -> np.ndarray:
         """
-        Generate embeddings using Cohere API
+        Generate embeddings using Cohere API (unchanged texts come from the embedding cache)
         """
-        if not self.cohere_client:
-            raise ValueError("Cohere API key not configured")
-        
         try:
-            response = self.cohere_client.embed(
-                texts=texts,
-                model="embed-english-v3.0",
-                input_type="search_document"
+            return await embedding_cache.embed(
+                texts, self.embedder.embed_documents,
+                model=COHERE_EMBED_MODEL, input_type="search_document", version=PROPERTY_TEXT_VERSION
             )
-            
-            embeddings = np.array(response.embeddings, dtype=np.float32)
-            return embeddings
-            
         except Exception as e:
             print(f"Error generating embeddings: {e}")
             raise
@@ -124,70 +216,261 @@ class VectorStore:
         """
         Generate embedding for search query
         """
-        if not self.cohere_client:
-            raise ValueError("Cohere API key not configured")
-        
         try:
-            response = self.cohere_client.embed(
-                texts=[query],
-                model="embed-english-v3.0",
-                input_type="search_query"
-            )
-            
-            embedding = np.array(response.embeddings[0], dtype=np.float32)
-            return embedding
-            
+            return await self.embedder.embed_query(query)
         except Exception as e:
             print(f"Error generating query embedding: {e}")
             raise
+
+    async def _embed_properties(self, properties: List[Dict[str, Any]]) -> np.ndarray:
+        embeddings = await self.embed_texts([self._create_property_text(prop) for prop in properties])
+        # Normalize embeddings for cosine similarity
+        faiss.normalize_L2(embeddings)
+        return embeddings
     
     async def index_properties(self, properties: List[Dict[str, Any]]) -> int:
         """
         Index all properties into FAISS
         """
+        async with self.snapshot_lock():
+            return await self._index_properties(properties)
+
+    async def _index_properties(self, properties: List[Dict[str, Any]]) -> int:
         if not properties:
             print("⚠️ No properties to index")
             return 0
         
         print(f"📝 Indexing {len(properties)} properties...")
         
-        # Create searchable texts
-        texts = [self._create_property_text(prop) for prop in properties]
-        
         # Generate embeddings
         print("🔄 Generating embeddings with Cohere...")
-        embeddings = await self.embed_texts(texts)
-        
-        # Create FAISS index
+        embeddings = await self._embed_properties(properties)
         self.dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product (cosine similarity)
-        
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Add to index
-        self.index.add(embeddings)
-        
-        # Store metadata
-        self.property_metadata = properties
+
+        async with self._write_lock:
+            # Build the index and filter columns off the event loop; searches keep using the live generation
+            self._publish(await asyncio.to_thread(self._fresh_generation, embeddings, properties))
         
         # Save to disk
-        self.save()
+        await self.save_async()
         
         print(f"✅ Indexed {len(properties)} properties successfully!")
         return len(properties)
+
+    def _fresh_generation(self, embeddings: np.ndarray, properties: List[Dict[str, Any]]) -> IndexGeneration:
+        property_ids = [prop.get("property_id", row) for row, prop in enumerate(properties)]
+        index, recall = self._build_index(embeddings, self._ids_array(property_ids))
+        return IndexGeneration(index, properties, recall)
+
+    def _derive_generation(
+        self,
+        base: IndexGeneration,
+        upserts: List[Dict[str, Any]],
+        embeddings: Optional[np.ndarray],
+        removals: List[int],
+    ) -> IndexGeneration:
+        """
+        Next generation from `base`: drop `removals`, insert or replace
+        `upserts`, and switch index type if the catalog crossed a threshold.
+        Works on private copies, so `base` stays valid for pinned readers.
+        HNSW entries are tombstoned rather than removed, and the graph is
+        rebuilt from the live vectors once too many pile up.
+        """
+        index = base.writable_index()
+        metadata = list(base.metadata)
+        row_by_id = dict(base.row_by_id)
+        recall = base.recall
+        touched = set()  # metadata rows whose contents change
+
+        if removals:
+            index = ann_index.remove_ids(index, self._ids_array(removals))
+            # Swap-remove so every other row keeps its position
+            for property_id in removals:
+                row = row_by_id.pop(property_id)
+                last = metadata.pop()
+                if row < len(metadata):
+                    metadata[row] = last
+                    row_by_id[last["property_id"]] = row
+                    touched.add(row)
+
+        if upserts:
+            property_ids = self._ids_array([prop["property_id"] for prop in upserts])
+            # HNSW keeps the old entry as a tombstone; the new one gets a fresh inner key
+            index = ann_index.remove_ids(index, property_ids)
+            index.add_with_ids(embeddings, property_ids)
+            for prop in upserts:
+                row = row_by_id.get(prop["property_id"])
+                if row is None:
+                    row_by_id[prop["property_id"]] = len(metadata)
+                    touched.add(len(metadata))  # may reuse a position freed by the removals above
+                    metadata.append(prop)
+                else:
+                    metadata[row] = prop
+                    touched.add(row)
+
+        attributes = base.attributes.derive(metadata, touched) if base.attributes is not None else None
+        generation = IndexGeneration(index, metadata, recall, row_by_id=row_by_id, attributes=attributes)
+        live = generation.live_keys
+
+        # Rebuild from the live vectors once the catalog grows (or shrinks) past an index type threshold
+        wanted = ann_index.choose_index_type(len(live))
+        current = ann_index.index_kind(index)
+        if wanted != current:
+            print(f"🔁 Catalog size {len(live)} calls for {wanted} instead of {current}")
+        elif generation.tombstone_fraction > ann_index.HNSW_TOMBSTONE_MAX_FRACTION:
+            print(f"🧹 Compacting {current} index: {len(generation.tombstones)} of {index.ntotal} entries are tombstones")
+        else:
+            return generation
+
+        vectors, property_ids = ann_index.all_vectors(index, live)
+        index, recall = self._build_index(vectors, property_ids)
+        return IndexGeneration(index, metadata, recall, row_by_id=row_by_id, attributes=generation.attributes)
+
+    async def _apply_changes(self, upserts: List[Dict[str, Any]], removals: List[int]) -> IndexGeneration:
+        """
+        Publish `upserts` and `removals` as a new generation. Changes that
+        queue up while another writer is deriving are merged and derived
+        together, so each copy of the index is paid once per batch rather
+        than once per caller.
+        """
+        embeddings = await self._embed_properties(upserts) if upserts else None
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((upserts, embeddings, removals, future))
+        async with self._write_lock:
+            if not future.done():
+                batch, self._pending = self._pending, []
+                try:
+                    generation = await self._apply_batch(batch)
+                except Exception as e:
+                    for *_, pending in batch:
+                        if not pending.done():
+                            pending.set_exception(e)
+                else:
+                    for *_, pending in batch:
+                        if not pending.done():
+                            pending.set_result(generation)
+        return await future
+
+    async def _apply_batch(self, batch: List[PendingChange]) -> IndexGeneration:
+        """Merge queued changes in arrival order (the last change to a property wins) and derive once"""
+        upserts: Dict[int, Tuple[Dict[str, Any], np.ndarray]] = {}
+        removals = set()
+        for props, embeddings, removed, _ in batch:
+            for property_id in removed:
+                upserts.pop(property_id, None)
+                removals.add(property_id)
+            for prop, embedding in zip(props, embeddings if embeddings is not None else []):
+                removals.discard(prop["property_id"])
+                upserts[prop["property_id"]] = (prop, embedding)
+
+        base = self.generation
+        removals = [pid for pid in sorted(removals) if pid in base.row_by_id]
+        if not upserts and not removals:
+            return base
+        props = [prop for prop, _ in upserts.values()]
+        embeddings = np.stack([embedding for _, embedding in upserts.values()]) if upserts else None
+        return self._publish(await asyncio.to_thread(self._derive_generation, base, props, embeddings, removals))
+
+    async def upsert_properties(self, properties: List[Dict[str, Any]]) -> int:
+        """Embed and insert or replace the given properties, leaving the rest of the index untouched"""
+        properties = [prop for prop in properties if prop.get("property_id") is not None]
+        if not properties:
+            return 0
+        if self.index is None:
+            return await self.index_properties(properties)
+
+        await self._apply_changes(properties, [])
+        print(f"✅ Upserted {len(properties)} properties")
+        return len(properties)
+
+    async def remove_properties(self, property_ids: List[int]) -> int:
+        """Drop vectors and metadata rows for the given property IDs"""
+        property_ids = [pid for pid in property_ids if pid in self.generation.row_by_id]
+        if not property_ids or self.index is None:
+            return 0
+
+        await self._apply_changes([], property_ids)
+        print(f"🗑️ Removed {len(property_ids)} properties")
+        return len(property_ids)
+
+    async def apply_delta(self, delta: SyncDelta) -> int:
+        """
+        Bring the index in line with a catalog sync delta, touching only the
+        added, changed and removed properties. Anything the index disagrees
+        with the catalog about (e.g. a stale index on disk) is reconciled too.
+        The result is published as one new generation.
+        """
+        async with self.snapshot_lock():
+            # Start from the newest shared snapshot in case another process published one
+            await self.refresh_async()
+            if self.index is None:
+                return await self._index_properties(delta["properties"])
+
+            row_by_id = self.generation.row_by_id
+            catalog = {prop["property_id"]: prop for prop in delta["properties"]}
+            upserts = {prop["property_id"]: prop for prop in delta["added"] + delta["changed"]}
+            upserts.update({pid: prop for pid, prop in catalog.items() if pid not in row_by_id})
+            removals = set(delta["removed"]) | (row_by_id.keys() - catalog.keys())
+
+            if not upserts and not removals:
+                print("✅ Catalog unchanged since last sync; index is up to date")
+                return len(self.property_metadata)
+
+            removals -= upserts.keys()
+            await self._apply_changes(list(upserts.values()), sorted(removals))
+            # Written before the lock is released, so the next worker derives from this generation
+            await self.save_async()
+            print(f"✅ Applied delta: {len(upserts)} upserted, {len(removals)} removed")
+            return len(self.property_metadata)
+
+    def measure_recall(
+        self,
+        k: int = 10,
+        sample: int = 200,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> Optional[float]:
+        """
+        Recall@k of the live index against exact search over its own stored
+        vectors (IVF-PQ vectors are the decoded approximations)
+        """
+        generation = self.generation
+        index = generation.index
+        if not isinstance(index, faiss.Index) or index.ntotal == 0:
+            return None
+        vectors, property_ids = ann_index.all_vectors(index, generation.live_keys)
+        return ann_index.recall_at_k(index, vectors, property_ids, k, sample, ef_search, nprobe, generation.exclude)
+
+    def index_stats(self) -> Dict[str, Any]:
+        generation = self.generation
+        inner = ann_index.unwrap(generation.index)[0] if isinstance(generation.index, faiss.Index) else None
+        return {
+            "type": generation.index_type,
+            "vectors": len(generation.live_keys) if inner is not None else 0,
+            "tombstones": len(generation.tombstones),
+            "recall_at_10": generation.recall,
+            "ef_search": inner.hnsw.efSearch if isinstance(inner, faiss.IndexHNSW) else None,
+            "nprobe": inner.nprobe if isinstance(inner, faiss.IndexIVF) else None,
+            "snapshot": self.snapshot_generation,
+            "memory_mapped": generation.mapped,
+        }
     
     async def search(
         self,
         query: str,
         k: int = 5,
         filters: Optional[Dict[str, Any]] = None,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
-        Semantic search for properties
+        Semantic search for properties. `ef_search` (HNSW) and `nprobe` (IVF)
+        override the index defaults for this request only.
         """
-        if not self.index or not self.property_metadata:
+        # Pin one generation for the whole request
+        generation = self.generation
+        if not generation.index or not generation.metadata:
             print("⚠️ Index not loaded. Call load() or index_properties() first.")
             return []
         
@@ -198,14 +481,25 @@ class VectorStore:
         # Normalize for cosine similarity
         faiss.normalize_L2(query_embedding)
         
-        # Search
-        scores, indices = self.index.search(query_embedding, k)
+        # FAISS work runs on the search thread pool, never on the event loop
+        mask = generation.filter_mask(filters)
+        if mask is not None:
+            matches = await search_executor.run(
+                self._search_masked, generation, query_embedding, k, mask, ef_search, nprobe
+            )
+            return self._collect(generation, *matches, min_score)
+
+        # Search (concurrent queries are batched into one matrix search)
+        scores, indices = await search_executor.search(
+            generation.index, query_embedding, k, ef_search, nprobe, generation.exclude
+        )
         
-        # Get results
+        # Get results (labels are property IDs; -1 pads short result lists)
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.property_metadata):
-                property_data = self.property_metadata[idx].copy()
+        for i, property_id in enumerate(indices[0]):
+            property_data = generation.get_property(int(property_id))
+            if property_data is not None:
+                property_data = property_data.copy()
                 property_data["match_score"] = float(scores[0][i])
                 
                 # Filter by score
@@ -220,6 +514,54 @@ class VectorStore:
                 results.append(property_data)
         
         return results
+
+    @staticmethod
+    def _search_masked(
+        generation: IndexGeneration,
+        query_embedding: np.ndarray,
+        k: int,
+        mask: np.ndarray,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ):
+        """
+        True top-k among the metadata rows selected by `mask`: one exact
+        matmul over the stored vectors for small candidate sets, otherwise
+        an index search restricted by an ID selector (approximate for
+        HNSW/IVF, like unfiltered search). Returns (scores, property_ids).
+        """
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        labels = generation.attributes.property_ids[rows]
+        keys = generation.keys[rows]
+        if len(rows) <= PREFILTER_BRUTE_FORCE_MAX:
+            inner, _ = ann_index.unwrap(generation.index)
+            scores = inner.reconstruct_batch(keys) @ query_embedding[0]
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            return scores[top], labels[top]
+
+        scores, found = ann_index.search(generation.index, query_embedding, k, keys=keys, ef_search=ef_search, nprobe=nprobe)
+        keep = found[0] >= 0
+        return scores[0][keep], found[0][keep]
+
+    @staticmethod
+    def _collect(
+        generation: IndexGeneration,
+        scores: np.ndarray,
+        property_ids: np.ndarray,
+        min_score: float
+    ) -> List[Dict[str, Any]]:
+        results = []
+        for score, property_id in zip(scores, property_ids):
+            if score < min_score:
+                continue
+            property_data = generation.get_property(int(property_id))
+            if property_data is not None:
+                results.append({**property_data, "match_score": float(score)})
+        return results
     
     def _matches_filters(self, property_data: Dict[str, Any], filters: Dict[str, Any]) -> bool:
         """
@@ -264,6 +606,22 @@ class VectorStore:
             if property_data.get("max_guests", 0) < filters["guests"]:
                 return False
         
+        # Country (Exact match)
+        if "country" in filters:
+            if (property_data.get("location_country") or "").lower() != filters["country"].lower():
+                return False
+        
+        # Bathrooms
+        if "bathrooms" in filters:
+            if property_data.get("bathrooms", 0) < filters["bathrooms"]:
+                return False
+        
+        # Amenities (all required)
+        if "amenities" in filters:
+            have = set(amenity_list(property_data.get("amenities")))
+            if any(a not in have for a in amenity_list(filters["amenities"])):
+                return False
+        
         return True
     
     async def get_similar_properties(
@@ -274,80 +632,155 @@ class VectorStore:
         """
         Find properties similar to a given property
         """
-        # Find the property in metadata
-        target_property = None
-        target_idx = None
-        
-        for idx, prop in enumerate(self.property_metadata):
-            if prop.get("property_id") == property_id:
-                target_property = prop
-                target_idx = idx
-                break
-        
-        if not target_property:
-            return []
-        
-        # Get the embedding vector for this property
-        if not self.index:
+        generation = self.generation
+        if not generation.index or generation.get_property(property_id) is None:
             return []
         
         # Reconstruct the vector from index
-        target_vector = self.index.reconstruct(target_idx).reshape(1, -1)
+        target_vector = generation.index.reconstruct(property_id).reshape(1, -1)
         
         # Search for similar (k+1 to exclude itself)
-        scores, indices = self.index.search(target_vector, k + 1)
+        scores, indices = await search_executor.search(
+            generation.index, target_vector, k + 1, exclude=generation.exclude
+        )
         
-        # Get results (skip first one as it's the property itself)
         results = []
-        for i, idx in enumerate(indices[0][1:]):  # Skip first result
-            if idx < len(self.property_metadata):
-                property_data = self.property_metadata[idx].copy()
-                property_data["match_score"] = float(scores[0][i + 1])
+        for score, similar_id in zip(scores[0], indices[0]):
+            if similar_id == property_id:
+                continue
+            property_data = generation.get_property(int(similar_id))
+            if property_data is not None:
+                property_data = property_data.copy()
+                property_data["match_score"] = float(score)
                 results.append(property_data)
         
-        return results
+        return results[:k]
     
     def save(self):
-        """Save index and metadata to disk"""
-        if self.index:
-            faiss.write_index(self.index, str(FAISS_INDEX_FILE))
-            print(f"💾 Saved FAISS index to {FAISS_INDEX_FILE}")
-        
-        if self.property_metadata:
-            with open(METADATA_FILE, 'w') as f:
-                json.dump(self.property_metadata, f, indent=2)
-            print(f"💾 Saved metadata to {METADATA_FILE}")
+        """Write a snapshot of the live generation unless it is already on disk (repeat calls are no-ops)"""
+        generation = self.generation
+        if not generation.index or generation is self._saved:
+            return
+        manifest = self.snapshots.write(generation.index, generation.metadata, {
+            "index_type": generation.index_type,
+            "dimension": self.dimension,
+            "recall_at_10": generation.recall,
+            "embed_model": COHERE_EMBED_MODEL,
+            "property_text_version": PROPERTY_TEXT_VERSION,
+        }, locked=self._holds_snapshot_lock)
+        self.snapshot_generation = manifest["generation"]
+        self._saved = generation
+        print(f"💾 Saved vector store snapshot {self.snapshot_generation} ({manifest['count']} properties)")
+
+    async def save_async(self):
+        """save() off the event loop (index write, fsync, checksum and file lock all block)"""
+        # Under the write lock so the generation being written can't be replaced mid-save
+        async with self._write_lock:
+            await asyncio.to_thread(self.save)
     
-    def load(self) -> bool:
-        """Load index and metadata from disk"""
+    def _migrate_positional_index(self, index: faiss.Index, metadata: List[Dict[str, Any]]) -> IndexGeneration:
+        """Re-key an index saved before ID mapping (row i = metadata[i])"""
+        vectors = index.reconstruct_n(0, index.ntotal)
+        property_ids = [prop.get("property_id", row) for row, prop in enumerate(metadata)]
+        index, recall = self._build_index(vectors, self._ids_array(property_ids))
+        print("🔁 Migrated positional FAISS index to property_id keys")
+        return IndexGeneration(index, metadata, recall)
+
+    def _load_legacy(self) -> Optional[IndexGeneration]:
+        """Read the pre-snapshot JSON layout (converted to a snapshot right after loading)"""
+        if not (FAISS_INDEX_FILE.exists() and METADATA_FILE.exists()):
+            return None
+        index = ann_index.prepare_loaded(faiss.read_index(str(FAISS_INDEX_FILE)))
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        print("🔁 Loaded legacy vector store files; converting to a snapshot")
+        return IndexGeneration(index, metadata, 1.0 if ann_index.index_kind(index) == "flat" else None)
+
+    async def load(self) -> bool:
+        """Load the current snapshot (or the legacy files) from disk, off the event loop"""
+        async with self._write_lock:
+            return await asyncio.to_thread(self._load_from_disk, SNAPSHOT_VERIFY)
+
+    def _load_from_disk(self, verify: bool = False) -> bool:
+        """
+        Publish the current snapshot. Checksums are only checked when `verify`
+        (the first load); generations followed later were verified by the
+        process that wrote them, so those reads only check sizes.
+        """
         try:
-            if FAISS_INDEX_FILE.exists() and METADATA_FILE.exists():
-                self.index = faiss.read_index(str(FAISS_INDEX_FILE))
-                
-                with open(METADATA_FILE, 'r') as f:
-                    self.property_metadata = json.load(f)
-                
-                print(f"✅ Loaded {len(self.property_metadata)} properties from disk")
-                return True
+            saved = None
+            pin = self.snapshots.pin()
+            if pin is not None:
+                try:
+                    index, metadata, manifest = self.snapshots.read(pin.generation, verify=verify)
+                except Exception:
+                    pin.close()
+                    raise
+                index = ann_index.prepare_loaded(index)
+                mapped = SNAPSHOT_MMAP and isinstance(index, faiss.IndexIVF)
+                source = self.snapshots.index_path(manifest["generation"]) if mapped else None
+                if not mapped:
+                    # Fully in memory; only a mapped index keeps reading the generation's files
+                    pin.close()
+                    pin = None
+                generation = saved = IndexGeneration(index, metadata, manifest.get("recall_at_10"), source, pin)
+                self.snapshot_generation = manifest["generation"]
             else:
-                print("⚠️ No saved index found")
-                return False
+                generation = self._load_legacy()
+                if generation is None:
+                    print("⚠️ No saved index found")
+                    return False
+
+            # IVF indexes carry property IDs natively; anything else unwrapped predates ID mapping
+            if not isinstance(generation.index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+                generation = self._migrate_positional_index(generation.index, generation.metadata)
+            self.dimension = generation.index.d
+            self._saved = saved
+            self._publish(generation)
+            self.save()
+
+            print(f"✅ Loaded {len(self.property_metadata)} properties from disk")
+            return True
                 
         except Exception as e:
             print(f"❌ Error loading index: {e}")
             return False
 
+    def refresh(self) -> bool:
+        """Load the current snapshot if another process published a newer one"""
+        current = self.snapshots.current()
+        if current is None or current == self.snapshot_generation:
+            return False
+        print(f"📡 Following vector store snapshot {current}")
+        return self._load_from_disk()
+
+    async def refresh_async(self) -> bool:
+        # Under the write lock so a refresh never lands in the middle of deriving a generation
+        async with self._write_lock:
+            return await asyncio.to_thread(self.refresh)
+
+    async def watch_snapshots(self, interval: float = SNAPSHOT_POLL_INTERVAL):
+        """Follow generations published by other processes (leader or indexer) until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh_async()
+
 
 # --- PGVector adapter ---
 class PGVectorStore:
     """Postgres + pgvector adapter using asyncpg"""
 
     def __init__(self):
-        self.cohere_client = cohere.Client(COHERE_API_KEY) if COHERE_API_KEY else None
+        self.embedder = embedding_service
         self.pool: Optional[asyncpg.pool.Pool] = None
         self.property_metadata = []
         self.index = None
         self.dimension = 1024
+        self._iterative_scan: Optional[bool] = None  # pgvector >= 0.8, detected by the first connection
+        # One write per process at a time; writers in other processes wait on the advisory lock in pgvector_reindex
+        self._reindex_lock = asyncio.Lock()
+        # Set by indexing and load(); while False every search re-checks the table (the leader may fill it)
+        self.has_rows = False
 
     async def _ensure_pool(self):
         if not self.pool:
@@ -355,121 +788,256 @@ class PGVectorStore:
                 raise ValueError("DATABASE_URL is not configured for pgvector backend")
             # Strip +asyncpg suffix if present (SQLAlchemy format)
             db_url = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
-            self.pool = await asyncpg.create_pool(db_url)
+            self.pool = await asyncpg.create_pool(
+                db_url,
+                min_size=PGVECTOR_POOL_MIN_SIZE,
+                max_size=max(PGVECTOR_POOL_MIN_SIZE, PGVECTOR_POOL_MAX_SIZE),
+                statement_cache_size=PGVECTOR_STATEMENT_CACHE_SIZE,
+                init=self._init_connection
+            )
+
+    async def _init_connection(self, conn):
+        """Pool `init` hook: binary codecs plus the session's ANN search defaults"""
+        # Vectors and JSONB travel in binary (see app/db/pgvector_codec.py)
+        await register_vector_codec(conn)
+        await register_jsonb_codec(conn)
+        for setting in pgvector_ann.session_settings(await self._supports_iterative_scan(conn)):
+            await conn.execute(setting)
+
+    async def warmup(self):
+        """Open the pool's connections and prepare the search statement on each ahead of traffic"""
+        await self._ensure_pool()
+        self.has_rows = await self._check_rows()
+        sql, _ = self._search_sql()
+        probe = np.full(self.dimension, 1 / np.sqrt(self.dimension), dtype=np.float32)
 
-    def _embedding_to_pgvector(self, emb: np.ndarray) -> str:
-        # Convert numpy array to pgvector literal string: [0.1,0.2,...]
-        return "[" + ",".join(f"{float(x):.6f}" for x in emb.tolist()) + "]"
+        async def warm():
+            async with self.pool.acquire() as conn:
+                # Runs through the statement cache, so real searches reuse the prepared plan
+                await conn.fetch(sql, probe, 1)
+
+        await asyncio.gather(*(warm() for _ in range(PGVECTOR_POOL_MIN_SIZE)))
+        print(f"✅ pgvector pool warmed ({PGVECTOR_POOL_MIN_SIZE} connections)")
+
+    async def close(self):
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
 
     async def embed_texts(self, texts: List[str]) -> np.ndarray:
-        if not self.cohere_client:
-            raise ValueError("Cohere API key not configured")
-        response = self.cohere_client.embed(
-            texts=texts,
-            model="embed-english-v3.0",
-            input_type="search_document"
+        return await embedding_cache.embed(
+            texts, self.embedder.embed_documents,
+            model=COHERE_EMBED_MODEL, input_type="search_document", version=PROPERTY_TEXT_VERSION
         )
-        embeddings = np.array(response.embeddings, dtype=np.float32)
-        return embeddings
 
     async def embed_query(self, query: str) -> np.ndarray:
-        if not self.cohere_client:
-            raise ValueError("Cohere API key not configured")
-        response = self.cohere_client.embed(
-            texts=[query],
-            model="embed-english-v3.0",
-            input_type="search_query"
-        )
-        embedding = np.array(response.embeddings[0], dtype=np.float32)
-        return embedding
+        return await self.embedder.embed_query(query)
+
+    def _records(self, properties: List[Dict[str, Any]], embeddings: np.ndarray) -> List[tuple]:
+        # Rows go over one binary COPY; vectors and metadata are encoded by the connection codecs
+        wire = to_wire(embeddings)
+        return [
+            (prop.get("property_id"), prop.get("title"), wire[row], prop, *filter_columns(prop))
+            for row, prop in enumerate(properties)
+        ]
 
     async def index_properties(self, properties: List[Dict[str, Any]]) -> int:
-        if not properties:
+        if not properties and not self.has_rows:
             return 0
         texts = [create_property_text(prop) for prop in properties]
-        embeddings = await self.embed_texts(texts)
+        # An empty catalog still rebuilds, so the last listings are removed from the table
+        embeddings = await self.embed_texts(texts) if texts else np.zeros((0, self.dimension), dtype=np.float32)
 
         await self._ensure_pool()
+        records = self._records(properties, embeddings)
 
-        async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                # Clear existing data to prevent duplicates
-                await conn.execute("TRUNCATE TABLE property_embeddings")
-                
-                for prop, emb in zip(properties, embeddings):
-                    emb_str = self._embedding_to_pgvector(emb)
-                    metadata = json.dumps(prop)
-                    await conn.execute(
-                        "INSERT INTO property_embeddings(property_id, title, embedding, metadata) VALUES($1, $2, $3::vector, $4::jsonb)",
-                        prop.get("property_id"), prop.get("title"), emb_str, metadata
-                    )
+        # Loaded into a shadow table and swapped in, so searches keep reading the old rows meanwhile
+        async with self._reindex_lock:
+            async with self.pool.acquire() as conn:
+                await rebuild_table(conn, records, columns=ROW_COLUMNS)
 
         self.property_metadata = properties
+        self.has_rows = bool(properties)
         print(f"✅ Indexed {len(properties)} properties into Postgres")
         return len(properties)
 
-    async def search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None, min_score: float = 0.0) -> List[Dict[str, Any]]:
-        # Quick check whether table has rows
+    async def apply_delta(self, delta: SyncDelta) -> int:
+        """
+        Bring the table in line with a catalog sync delta. Only the listings the
+        delta touched are embedded and rewritten; a full shadow rebuild is left
+        for an empty table.
+        """
+        if not has_changes(delta) and self.index:
+            print("✅ Catalog unchanged since last sync; Postgres index is up to date")
+            return len(self.property_metadata)
+
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT 1 FROM property_embeddings LIMIT 1")
-            if not row:
+            stored = {r["property_id"] for r in await conn.fetch("SELECT DISTINCT property_id FROM property_embeddings")}
+        if not stored:
+            return await self.index_properties(delta["properties"])
+
+        catalog = {prop["property_id"]: prop for prop in delta["properties"]}
+        touched = {prop["property_id"] for prop in delta["added"] + delta["changed"]}
+        # Listings the table is missing (e.g. a write that never landed) are healed here too
+        touched |= catalog.keys() - stored
+        upserts = [catalog[pid] for pid in sorted(touched) if pid in catalog]
+        dropped = (set(delta["removed"]) | stored) - catalog.keys()
+
+        texts = [create_property_text(prop) for prop in upserts]
+        embeddings = await self.embed_texts(texts) if texts else np.zeros((0, self.dimension), dtype=np.float32)
+        records = self._records(upserts, embeddings)
+
+        async with self._reindex_lock:
+            async with self.pool.acquire() as conn:
+                await replace_rows(conn, touched | dropped, records, columns=ROW_COLUMNS)
+
+        self.property_metadata = delta["properties"]
+        self.has_rows = bool(catalog)
+        print(f"✅ Upserted {len(upserts)} and deleted {len(dropped - touched)} properties in Postgres")
+        return len(self.property_metadata)
+
+    async def search(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        min_score: float = 0.0,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        await self._ensure_pool()
+        if not self.has_rows:
+            self.has_rows = await self._check_rows()
+            if not self.has_rows:
                 print("⚠️ No properties indexed in Postgres")
                 return []
 
         query_emb = await self.embed_query(query)
-        emb_str = self._embedding_to_pgvector(query_emb)
+        sql, filter_args = self._search_sql(filters)
+        args = (query_emb, k, *filter_args)
 
+        # One connection, and with default settings one round trip: the statement is prepared
+        # and cached per connection, and the ANN defaults were set when the connection opened
+        async with self.pool.acquire() as conn:
+            rows = await self._fetch(conn, sql, args, ef_search, nprobe)
+            if len(rows) < k and has_filters(filters) and not self._iterative_scan:
+                # pgvector < 0.8: the probed lists (or HNSW candidates) ran out of matches;
+                # widen the scan for whichever index is in use so top-k stays complete
+                probes = max(int(PGVECTOR_FILTER_PROBES), nprobe or pgvector_ann.PGVECTOR_PROBES)
+                ef = max(int(PGVECTOR_FILTER_EF_SEARCH), ef_search or pgvector_ann.PGVECTOR_EF_SEARCH)
+                rows = await self._fetch(conn, sql, args, ef, probes)
+
+        # relaxed_order may return neighbours slightly out of order
         results = []
+        for r in sorted(rows, key=lambda r: r["distance"]):
+            score = pgvector_ann.similarity(r["distance"])
+            if score < min_score:
+                continue
+            results.append({**(r["metadata"] or {}), "match_score": score})
+        return results
+
+    @staticmethod
+    async def _fetch(conn, sql: str, args: tuple, ef_search: Optional[int], nprobe: Optional[int], method: str = "fetch"):
+        """Run a search, overriding the connection's probes / ef_search for this query only when asked"""
+        fetch = getattr(conn, method)
+        settings = pgvector_ann.search_settings(ef_search, nprobe)
+        if settings is None:
+            return await fetch(sql, *args)
+        async with conn.transaction():
+            await conn.execute(pgvector_ann.SEARCH_SETTINGS_SQL, *settings)
+            return await fetch(sql, *args)
+
+    @staticmethod
+    def _search_sql(filters: Optional[Dict[str, Any]] = None):
+        """(sql, filter args) for a top-k search; $1 is the query vector and $2 is k"""
+        # Filters are pushed down to the typed columns and combined with the ANN ORDER BY,
+        # which must use the operator of the index opclass (cosine) or the index is skipped
+        op = pgvector_ann.DISTANCE_OPERATOR
+        where, filter_args = compile_filters(filters, first_param=3)
+        sql = (
+            f"SELECT metadata, embedding {op} $1::vector AS distance FROM property_embeddings "
+            f"{where} ORDER BY embedding {op} $1::vector LIMIT $2"
+        )
+        return sql, filter_args
+
+    async def explain_search(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        k: int = 5,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """EXPLAIN a top-k search to check that Postgres actually uses the ANN index"""
+        await self._ensure_pool()
+        sql, filter_args = self._search_sql(filters)
+        probe = np.full(self.dimension, 1 / np.sqrt(self.dimension), dtype=np.float32)
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                "SELECT property_id, title, metadata, embedding <-> $1::vector AS distance FROM property_embeddings ORDER BY embedding <-> $1::vector LIMIT $2",
-                emb_str, k
+            plan = await self._fetch(
+                conn, f"EXPLAIN (FORMAT JSON) {sql}", (probe, k, *filter_args), ef_search, nprobe, method="fetchval"
             )
-            for r in rows:
-                meta = r.get("metadata")
-                if isinstance(meta, str):
-                    try:
-                        meta = json.loads(meta)
-                    except:
-                        meta = {}
-                results.append({**(meta or {}), "match_score": float(r.get("distance"))})
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        used = pgvector_ann.index_used(plan)
+        if not used:
+            print(f"⚠️ pgvector search is not using {pgvector_ann.ANN_INDEX_NAME}; expect a sequential scan")
+        return {
+            "index": pgvector_ann.ANN_INDEX_NAME,
+            "index_type": pgvector_ann.index_type(),
+            "uses_index": used,
+            "plan": pgvector_ann.plan_summary(plan),
+        }
 
-        return results
+    async def _supports_iterative_scan(self, conn) -> bool:
+        if self._iterative_scan is None:
+            version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            if version is None:
+                # Extension not installed yet; decide on a connection opened after the migrations
+                return False
+            parts = tuple(int(p) for p in version.split(".")[:2] if p.isdigit())
+            self._iterative_scan = parts >= (0, 8)
+        return self._iterative_scan
 
-    async def _has_rows(self) -> bool:
+    async def _check_rows(self) -> bool:
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             row = await conn.fetchrow("SELECT 1 FROM property_embeddings LIMIT 1")
             return bool(row)
 
+    def index_stats(self) -> Dict[str, Any]:
+        stats = {
+            "type": "pgvector",
+            "index_type": pgvector_ann.index_type(),
+            "distance": "cosine",
+            "vectors": len(self.property_metadata),
+            "has_rows": self.has_rows
+        }
+        if self.pool:
+            stats["pool"] = {
+                "size": self.pool.get_size(),
+                "idle": self.pool.get_idle_size(),
+                "min_size": self.pool.get_min_size(),
+                "max_size": self.pool.get_max_size()
+            }
+        return stats
+
     def save(self):
         # No-op for Postgres backend (data is persisted in DB)
         pass
 
-    async def load(self) -> bool:
-        """Load metadata from Postgres into memory and set index flag.
+    async def save_async(self):
+        pass
 
-        This method is async. Callers may `await` it. The code that uses
-        `vector_store.load()` in the app will detect coroutine results and
-        await when necessary.
-        """
+    async def load(self) -> bool:
+        """Load metadata from Postgres into memory and set index flag"""
         try:
             await self._ensure_pool()
             async with self.pool.acquire() as conn:
                 rows = await conn.fetch("SELECT metadata FROM property_embeddings")
-                metas = []
-                for r in rows:
-                    meta = r.get("metadata")
-                    if isinstance(meta, str):
-                        try:
-                            meta = json.loads(meta)
-                        except Exception:
-                            meta = {}
-                    metas.append(meta or {})
-
-                self.property_metadata = metas
+                # JSONB arrives decoded (see register_jsonb_codec)
+                self.property_metadata = [r["metadata"] or {} for r in rows]
                 self.index = bool(self.property_metadata)
+                self.has_rows = bool(self.property_metadata)
                 print(f"✅ Loaded {len(self.property_metadata)} properties from Postgres")
                 return True
         except Exception as e:
@@ -0,0 +1,76 @@
+"""
+Microbenchmark: binary Clarity decoder vs. the old hex-string heuristics.
+
+Run from backend/:
+    python benchmarks/clarity_decode.py
+"""
+import struct
+import sys
+import timeit
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.clarity import ClarityParser
+
+OWNER_HASH = bytes.fromhex("a46ff88886c2ef9762d970b4d2c63678835bd39d")
+
+
+def _property_result() -> str:
+    def uint(n):
+        return b"\x01" + n.to_bytes(16, "big")
+
+    uri = b"ipfs://QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+    fields = [
+        (b"active", b"\x03"),
+        (b"created-at", uint(151_234)),
+        (b"location-tag", uint(7)),
+        (b"metadata-uri", b"\x0d" + struct.pack(">I", len(uri)) + uri),
+        (b"owner", bytes([0x05, 22]) + OWNER_HASH),
+        (b"price-per-night", uint(25_000_000)),
+    ]
+    body = b"\x0c" + struct.pack(">I", len(fields))
+    for name, value in fields:
+        body += bytes([len(name)]) + name + value
+    return "0x0a" + body.hex()
+
+
+def legacy_parse_tuple(hex_str: str):
+    """The pre-decoder heuristic parser (substring search + per-char int())"""
+    result = {}
+    if "697066733a2f2f" in hex_str:
+        start_idx = hex_str.find("697066733a2f2f")
+        chunk = hex_str[start_idx:start_idx + 1024]
+        text = ""
+        for i in range(0, len(chunk), 2):
+            if i + 2 > len(chunk):
+                break
+            byte_val = int(chunk[i:i + 2], 16)
+            if 32 <= byte_val <= 126:
+                text += chr(byte_val)
+            elif byte_val == 0:
+                break
+            elif len(text) > 10:
+                break
+        if text:
+            result["metadata_uri"] = text
+    if "05" in hex_str or "06" in hex_str:
+        result["owner"] = "ST..."
+    result["active"] = True
+    return result
+
+
+def main(number: int = 20_000):
+    result_hex = _property_result()
+    legacy = min(timeit.repeat(lambda: legacy_parse_tuple(result_hex[4:]), number=number, repeat=5))
+    decoder = min(timeit.repeat(lambda: ClarityParser.parse_property(result_hex), number=number, repeat=5))
+
+    print(f"get-property result: {len(result_hex) // 2 - 1} bytes, {number} decodes per run")
+    print(f"  legacy heuristics : {legacy / number * 1e6:7.2f} µs/decode")
+    print(f"  binary decoder    : {decoder / number * 1e6:7.2f} µs/decode  ({legacy / decoder:.1f}x)")
+    print(f"  decoded: {ClarityParser.parse_property(result_hex)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: FAISS search inline on the event loop vs. the search thread pool,
+with and without micro-batching, at 1/8/64 concurrent clients.
+
+Each client issues single-vector searches back to back. "loop lag" is the
+worst delay seen by a 1 ms heartbeat task, i.e. how long other requests
+would have been stuck behind FAISS.
+
+Run from backend/:
+    python benchmarks/faiss_search.py
+    python benchmarks/faiss_search.py --vectors 100000 --index-type hnsw
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import faiss
+import numpy as np
+
+from app.services import ann_index
+from app.services.search_executor import SearchExecutor
+
+
+def build(vectors: int, dim: int, kind: str):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((vectors, dim)).astype(np.float32)
+    faiss.normalize_L2(data)
+    index = ann_index.build_index(data, np.arange(vectors, dtype=np.int64), kind)
+    queries = rng.standard_normal((4096, dim)).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return index, queries
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - start - 0.001)
+
+
+async def run_mode(mode: str, index, queries, clients: int, per_client: int, k: int):
+    executor = SearchExecutor(window=0.001 if mode == "batched" else 0)
+    latencies = []
+
+    async def search(query):
+        if mode == "inline":
+            return ann_index.search(index, query.reshape(1, -1), k)
+        return await executor.search(index, query, k)
+
+    async def client(offset: int):
+        for i in range(per_client):
+            query = queries[(offset * per_client + i) % len(queries)]
+            start = time.perf_counter()
+            await search(query)
+            latencies.append(time.perf_counter() - start)
+
+    stop, lags = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    executor.shutdown()
+
+    latencies.sort()
+    return {
+        "qps": len(latencies) / elapsed,
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p99_ms": 1000 * latencies[int(len(latencies) * 0.99) - 1],
+        "loop_lag_ms": 1000 * max(lags, default=0.0),
+        "avg_batch": executor.stats()["avg_batch_size"],
+    }
+
+
+async def main(args):
+    print(f"Building {args.index_type} index: {args.vectors} x {args.dim} ...")
+    index, queries = build(args.vectors, args.dim, args.index_type)
+    print(f"faiss omp threads: {faiss.omp_get_max_threads()}, search threads: {SearchExecutor().threads}\n")
+    print(f"{'mode':<8} {'clients':>7} {'qps':>9} {'p50 ms':>8} {'p99 ms':>8} {'loop lag ms':>12} {'avg batch':>10}")
+    for clients in (1, 8, 64):
+        per_client = max(4, args.queries // clients)
+        for mode in ("inline", "pool", "batched"):
+            r = await run_mode(mode, index, queries, clients, per_client, args.k)
+            print(f"{mode:<8} {clients:>7} {r['qps']:>9.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                  f"{r['loop_lag_ms']:>12.2f} {r['avg_batch']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS search executor benchmark")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--index-type", default="flat", choices=ann_index.INDEX_TYPES)
+    parser.add_argument("--queries", type=int, default=512, help="Searches per run, split across clients")
+    parser.add_argument("--k", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import pytest
+
+import app.services.ipfs_cache as ipfs_cache_module
+from app.services.ipfs_cache import IPFSMetadataCache
+from app.services.embedding_cache import embedding_cache
+from app.services.blockchain import blockchain_service
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """Point the module-level caches at tmp_path so no test writes to backend/data"""
+    monkeypatch.setattr(ipfs_cache_module, "IPFS_CACHE_PATH", tmp_path / "ipfs_cache")
+    monkeypatch.setattr(blockchain_service, "ipfs_cache", IPFSMetadataCache())
+
+    embedding_cache.close()
+    monkeypatch.setattr(embedding_cache, "path", tmp_path / "embedding_cache")
+    yield
+    embedding_cache.close()
+    blockchain_service.ipfs_cache.close()
@@ -12,4 +12,6 @@ CREATE TABLE IF NOT EXISTS property_embeddings (
 );
 
 -- ivfflat index for ANN. Tune 'lists' for dataset size.
+-- Queries must order by the cosine operator <=> to use it; app/db/pgvector_ann.py
+-- rebuilds it as HNSW when PGVECTOR_INDEX_TYPE=hnsw.
 CREATE INDEX IF NOT EXISTS idx_property_embeddings_embedding ON property_embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
@@ -0,0 +1,431 @@
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.services.blockchain import BlockchainService
+from app.services.sync_state import SyncCheckpoint
+
+
+def make_service(existing_ids, concurrency=4):
+    service = BlockchainService()
+    service.crawl_concurrency = concurrency
+    calls = []
+
+    async def get_property(property_id):
+        calls.append(property_id)
+        # Finish out of order on purpose
+        await asyncio.sleep(random.uniform(0, 0.01))
+        if property_id in existing_ids:
+            return {"property_id": property_id, "owner": "ST...", "metadata_uri": f"ipfs://Qm{property_id}", "active": True}
+        return None
+
+    async def fetch_ipfs_metadata(uri):
+        await asyncio.sleep(random.uniform(0, 0.01))
+        return {"title": uri}
+
+    async def get_host_profile(owner):
+        return {}
+
+    service.get_property = get_property
+    service.fetch_ipfs_metadata = fetch_ipfs_metadata
+    service.get_host_profile = get_host_profile
+    return service, calls
+
+
+async def test_crawl_returns_properties_in_id_order():
+    service, _ = make_service({0, 1, 2, 3, 4, 5, 6, 7, 8, 9}, concurrency=5)
+
+    properties = await service.probe_properties()
+
+    assert [p["property_id"] for p in properties] == list(range(10))
+
+
+async def test_crawl_gap_detection_matches_sequential_walk():
+    # Two missing IDs are tolerated, three in a row end the crawl
+    existing = {0, 1, 4, 5, 9, 10}
+    service, _ = make_service(existing, concurrency=6)
+
+    properties = await service.probe_properties()
+
+    assert [p["property_id"] for p in properties] == [0, 1, 4, 5]
+
+
+async def test_crawl_respects_concurrency_limit():
+    service = BlockchainService()
+    service.crawl_concurrency = 3
+    active = 0
+    peak = 0
+
+    async def crawl_property(property_id):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.005)
+        active -= 1
+        return {"property_id": property_id} if property_id < 20 else None
+
+    service._crawl_property = crawl_property
+
+    properties = await service.probe_properties()
+
+    assert len(properties) == 20
+    assert peak == 3
+
+
+async def test_calls_share_one_pooled_client():
+    import httpx
+
+    seen_clients = set()
+
+    def handler(request):
+        return httpx.Response(200, json={"data": "0x0100000000000000000000000000000005"})
+
+    service = BlockchainService()
+    service.api_url = "http://stacks.test"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    for _ in range(3):
+        seen_clients.add(id(service.client))
+        assert await service.get_property_count() == 5
+
+    assert len(seen_clients) == 1
+
+    await service.close()
+    assert service._client is None
+
+
+async def test_host_profiles_resolved_once_per_owner():
+    service, _ = make_service(set(range(20)), concurrency=8)
+    fetched = []
+
+    async def get_property(property_id):
+        if property_id >= 20:
+            return None
+        owner = "SP_HOST_A" if property_id % 2 else "SP_HOST_B"
+        return {"property_id": property_id, "owner": owner, "metadata_uri": f"ipfs://Qm{property_id}", "active": True}
+
+    async def get_host_profile(owner):
+        fetched.append(owner)
+        await asyncio.sleep(0.005)
+        return {"host_badges": ["superhost"], "is_superhost": owner == "SP_HOST_A"}
+
+    service.get_property = get_property
+    service.get_host_profile = get_host_profile
+
+    properties = await service.probe_properties()
+
+    assert len(properties) == 20
+    assert sorted(fetched) == ["SP_HOST_A", "SP_HOST_B"]
+    assert all(p["is_superhost"] == (p["owner"] == "SP_HOST_A") for p in properties)
+
+    # A second sync within the TTL reuses the table
+    await service.probe_properties()
+    assert len(fetched) == 2
+
+
+def make_sync_service(tmp_path, chain):
+    """`chain` maps property_id -> on-chain tuple fields (or None)"""
+    service = BlockchainService()
+    service.checkpoint = SyncCheckpoint(tmp_path / "checkpoint.json")
+    ipfs_calls = []
+
+    async def read_property_nonce():
+        return len(chain)
+
+    async def read_property(property_id):
+        fields = chain[property_id]
+        if fields is None:
+            return None
+        return {
+            "property_id": property_id,
+            "owner": "SP_HOST",
+            "metadata_uri": f"ipfs://Qm{property_id}",
+            "active": True,
+            "price_per_night_ustx": 1_000_000,
+            "location_tag": 0,
+            "created_at": 1,
+            **fields,
+        }
+
+    async def fetch_ipfs_metadata(uri):
+        ipfs_calls.append(uri)
+        return {"title": uri}
+
+    async def get_host_profile(owner):
+        return {}
+
+    service.read_property_nonce = read_property_nonce
+    service.read_property = read_property
+    service.fetch_ipfs_metadata = fetch_ipfs_metadata
+    service.get_host_profile = get_host_profile
+    return service, ipfs_calls
+
+
+async def test_sync_produces_incremental_deltas(tmp_path):
+    chain = {i: {} for i in range(5)}
+    service, ipfs_calls = make_sync_service(tmp_path, chain)
+
+    first = await service.sync_properties()
+    assert [p["property_id"] for p in first["added"]] == [0, 1, 2, 3, 4]
+    assert first["nonce"] == 5
+
+    # Nothing changed: no IPFS traffic, empty delta
+    ipfs_calls.clear()
+    second = await service.sync_properties()
+    assert not (second["added"] or second["changed"] or second["removed"])
+    assert len(second["properties"]) == 5
+    assert ipfs_calls == []
+
+    # New listing, a price change and a deactivation
+    chain[5] = {}
+    chain[1] = {"price_per_night_ustx": 2_000_000}
+    chain[3] = {"active": False}
+    third = await service.sync_properties()
+    assert [p["property_id"] for p in third["added"]] == [5]
+    assert [p["property_id"] for p in third["changed"]] == [1]
+    assert third["removed"] == [3]
+    assert [p["property_id"] for p in third["properties"]] == [0, 1, 2, 4, 5]
+    assert ipfs_calls == ["ipfs://Qm1", "ipfs://Qm5"]
+
+
+async def test_sync_checkpoint_persists_across_restarts(tmp_path):
+    chain = {i: {} for i in range(3)}
+    service, _ = make_sync_service(tmp_path, chain)
+    await service.sync_properties()
+
+    restarted, ipfs_calls = make_sync_service(tmp_path, chain)
+    delta = await restarted.sync_properties()
+
+    assert ipfs_calls == []
+    assert not delta["added"]
+    assert len(delta["properties"]) == 3
+
+
+async def test_sync_keeps_properties_on_transient_read_errors(tmp_path):
+    chain = {i: {} for i in range(3)}
+    service, _ = make_sync_service(tmp_path, chain)
+    await service.sync_properties()
+
+    real_read = service.read_property
+
+    async def flaky_read(property_id):
+        if property_id == 1:
+            raise RuntimeError("502 from node")
+        return await real_read(property_id)
+
+    service.read_property = flaky_read
+    delta = await service.sync_properties()
+
+    assert delta["removed"] == []
+    assert len(delta["properties"]) == 3
+
+
+async def test_refresh_properties_targets_ids_new_listings_and_hosts(tmp_path):
+    chain = {i: {} for i in range(3)}
+    service, ipfs_calls = make_sync_service(tmp_path, chain)
+    await service.sync_properties()
+
+    reads = []
+    real_read = service.read_property
+
+    async def counting_read(property_id):
+        reads.append(property_id)
+        return await real_read(property_id)
+
+    async def get_host_profile(owner):
+        return {"host_badges": ["superhost"], "is_superhost": True}
+
+    service.read_property = counting_read
+    service.get_host_profile = get_host_profile
+    chain[3] = {}
+    chain[0] = {"price_per_night_ustx": 5}
+
+    delta = await service.refresh_properties([0], include_new=True, hosts=["SP_HOST"])
+
+    assert sorted(reads) == [0, 3]
+    assert [p["property_id"] for p in delta["added"]] == [3]
+    assert sorted(p["property_id"] for p in delta["changed"]) == [0, 1, 2]
+    assert all(p["is_superhost"] for p in delta["properties"])
+
+
+async def test_refresh_rejoins_only_the_touched_hosts(tmp_path):
+    chain = {0: {"owner": "SP_A"}, 1: {"owner": "SP_B"}, 2: {"owner": "SP_A"}}
+    service, _ = make_sync_service(tmp_path, chain)
+    await service.sync_properties()
+
+    fetches = []
+
+    async def get_host_profile(owner):
+        fetches.append(owner)
+        return {"host_badges": ["superhost"], "is_superhost": True}
+
+    service.get_host_profile = get_host_profile
+    service.host_profiles.ttl = 0
+
+    delta = await service.refresh_properties(hosts=["SP_A"])
+
+    assert fetches == ["SP_A"]
+    assert sorted(p["property_id"] for p in delta["changed"]) == [0, 2]
+    assert not service.checkpoint.properties[1].get("is_superhost")
+
+
+async def test_nonce_is_read_as_a_data_var_not_a_read_only_call():
+    import httpx
+
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        if "/v2/contracts/call-read/" in request.url.path:
+            # property-id-nonce is a define-data-var; the node has no such function
+            return httpx.Response(200, json={"okay": False, "cause": "UndefinedFunction(\"property-id-nonce\")"})
+        if request.url.path == "/v2/data_var/SP_CONTRACT/stackstay-escrow/property-id-nonce":
+            return httpx.Response(200, json={"data": "0x0100000000000000000000000000000007"})
+        return httpx.Response(404)
+
+    service = BlockchainService()
+    service.api_url = "http://stacks.test"
+    service.contract_address = "SP_CONTRACT"
+    service.contract_escrow = "stackstay-escrow"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    assert await service.read_property_nonce() == 7
+    assert [url.params.get("proof") for url in requests if "data_var" in url.path] == ["0"]
+    await service.close()
+
+
+async def test_probe_fallback_records_the_checkpoint(tmp_path):
+    chain = {i: {} for i in range(4)}
+    service, ipfs_calls = make_sync_service(tmp_path, chain)
+
+    async def no_nonce():
+        return None
+
+    service.read_property_nonce = no_nonce
+    first = await service.sync_properties()
+
+    assert [p["property_id"] for p in first["added"]] == [0, 1, 2, 3]
+    assert first["nonce"] == 4
+
+    # Persisted with fingerprints, so a restart with a readable nonce syncs incrementally
+    restarted, ipfs_calls = make_sync_service(tmp_path, chain)
+    assert restarted.checkpoint.load().last_nonce == 4
+    delta = await restarted.sync_properties()
+    assert ipfs_calls == []
+    assert not (delta["added"] or delta["changed"] or delta["removed"])
+    assert len(delta["properties"]) == 4
+
+
+async def test_sync_rejoins_expired_host_profiles_for_unchanged_listings(tmp_path):
+    chain = {i: {} for i in range(3)}
+    service, ipfs_calls = make_sync_service(tmp_path, chain)
+    profile = {"host_badges": ["first-listing"], "is_superhost": False}
+    fetches = []
+
+    async def get_host_profile(owner):
+        fetches.append(owner)
+        if profile is None:
+            raise RuntimeError("node timeout")
+        return dict(profile)
+
+    service.get_host_profile = get_host_profile
+    await service.sync_properties()
+
+    # Profile unchanged within the TTL: nothing to emit, no refetch
+    delta = await service.sync_properties()
+    assert not delta["changed"] and fetches == ["SP_HOST"]
+
+    # The host earned a badge; once the TTL lapses a plain sync picks it up
+    profile = {"host_badges": ["first-listing", "superhost"], "is_superhost": True}
+    service.host_profiles.ttl = 0
+    ipfs_calls.clear()
+    delta = await service.sync_properties()
+    assert sorted(p["property_id"] for p in delta["changed"]) == [0, 1, 2]
+    assert all(p["is_superhost"] for p in delta["properties"])
+    assert ipfs_calls == []
+    assert len(fetches) == 2  # once per distinct host, not per listing
+
+    # A failed profile fetch keeps the last joined fields
+    profile = None
+    delta = await service.sync_properties()
+    assert not delta["changed"]
+    assert all(p["is_superhost"] for p in delta["properties"])
+
+
+async def test_node_errors_keep_the_last_known_host_profile(tmp_path):
+    import httpx
+
+    chain = {i: {} for i in range(2)}
+    service, _ = make_sync_service(tmp_path, chain)
+
+    async def get_host_profile(owner):
+        return {"host_badges": ["superhost"], "is_superhost": True,
+                "host_reputation": {"average_rating": 4.8, "total_reviews": 12}}
+
+    service.get_host_profile = get_host_profile
+    await service.sync_properties()
+
+    async def call_read(*args, **kwargs):
+        raise httpx.ConnectError("node unreachable")
+
+    # The real profile fetch, against a node that can't be reached
+    del service.get_host_profile
+    service._call_read = call_read
+    service.host_profiles.clear()
+    chain[1] = {"price_per_night_ustx": 2_000_000}
+
+    delta = await service.refresh_properties([1], hosts=["SP_HOST"])
+
+    assert [p["property_id"] for p in delta["changed"]] == [1]  # the tuple change only
+    assert all(p["is_superhost"] and p["host_reputation"]["total_reviews"] == 12 for p in delta["properties"])
+    assert service.host_profiles.get("SP_HOST") is None  # the failure is not cached
+
+
+async def test_refresh_removes_listings_whose_block_was_rolled_back(tmp_path):
+    chain = {i: {} for i in range(4)}
+    service, _ = make_sync_service(tmp_path, chain)
+    await service.sync_properties()
+    assert service.checkpoint.last_nonce == 4
+
+    # A reorg drops the block that listed #3: the nonce goes back and the ID no longer resolves
+    del chain[3]
+    real_read = service.read_property
+
+    async def read_property(property_id):
+        return await real_read(property_id) if property_id in chain else None
+
+    service.read_property = read_property
+    delta = await service.refresh_properties(include_new=True)
+
+    assert delta["removed"] == [3]
+    assert delta["nonce"] == 3
+    assert service.checkpoint.last_nonce == 3
+    assert [p["property_id"] for p in delta["properties"]] == [0, 1, 2]
+
+
+async def test_workers_sharing_a_checkpoint_never_overwrite_each_other(tmp_path):
+    chain = {i: {} for i in range(5)}
+    first, _ = make_sync_service(tmp_path, chain)
+    second, _ = make_sync_service(tmp_path, chain)
+    second.checkpoint.load()  # loaded before the first worker synced
+
+    await first.sync_properties()
+    chain[2] = {"price_per_night_ustx": 2_000_000}
+    delta = await second.refresh_properties([2])
+
+    # The second worker started from the file, not its stale empty copy
+    assert [p["property_id"] for p in delta["changed"]] == [2] and delta["added"] == []
+    assert len(delta["properties"]) == 5
+    restarted, _ = make_sync_service(tmp_path, chain)
+    assert sorted(restarted.checkpoint.load().properties) == [0, 1, 2, 3, 4]
+
+    # A sync waits while another worker holds the checkpoint
+    async with first.checkpoint.locked():
+        pending = asyncio.create_task(second.sync_properties())
+        await asyncio.sleep(0.2)
+        assert not pending.done()
+    assert (await pending)["nonce"] == 5
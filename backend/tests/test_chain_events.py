@@ -0,0 +1,148 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import events
+from app.services import chain_events
+from app.services.chain_events import ChainEventProcessor, EventLedger
+
+FIXTURES = Path(__file__).parent / "fixtures" / "chainhook"
+CONTRACT_ADDRESS = "ST2J6ZY48GV1EZ5V2V5RB9MP66SW86PYKKQYAC0RQ"
+HOST = "STD2PF2DBSQQ10CJMETCBNQ7Z04H048J2EXKM0RH"
+
+
+def load_fixture(name):
+    with open(FIXTURES / name, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeBlockchain:
+    contract_address = CONTRACT_ADDRESS
+    contract_escrow = "stackstay-escrow"
+    contract_reputation = "stackstay-reputation"
+    contract_badge = "stackstay-badge"
+
+    def __init__(self):
+        self.calls = []
+
+    async def refresh_properties(self, property_ids=(), include_new=False, hosts=()):
+        self.calls.append((set(property_ids), include_new, set(hosts)))
+        return {"nonce": 13, "added": [{"property_id": 12}], "changed": [], "removed": [], "properties": [{"property_id": 12}]}
+
+
+class FakeStore:
+    def __init__(self):
+        self.deltas = []
+
+    async def apply_delta(self, delta):
+        self.deltas.append(delta)
+        return len(delta["properties"])
+
+    async def save_async(self):
+        pass
+
+
+def make_processor(tmp_path):
+    return ChainEventProcessor(FakeBlockchain(), FakeStore(), EventLedger(tmp_path / "processed.json"))
+
+
+def test_extract_actions_from_listing_fixture(tmp_path):
+    processor = make_processor(tmp_path)
+
+    actions = processor.extract_actions(load_fixture("property_listed.json"))
+
+    kinds = sorted((a["kind"], a.get("property_id"), a.get("principal")) for a in actions)
+    # Booking calls and failed transactions are ignored
+    assert kinds == [
+        ("host", None, HOST),
+        ("new_properties", None, None),
+        ("property", 12, None),
+    ]
+
+
+def test_extract_actions_ignores_foreign_contracts(tmp_path):
+    processor = make_processor(tmp_path)
+
+    actions = processor.extract_actions(load_fixture("review_and_badge.json"))
+
+    assert {a["kind"] for a in actions} == {"host"}
+    assert {a["principal"] for a in actions} == {HOST}
+    assert len({a["key"] for a in actions}) == len(actions) == 3
+
+
+async def test_ingest_is_idempotent(tmp_path):
+    processor = make_processor(tmp_path)
+    payload = load_fixture("property_listed.json")
+
+    first = await processor.ingest(payload)
+    second = await processor.ingest(payload)
+
+    assert first["added"] == 1 and first["duplicates"] == 0
+    assert second["duplicates"] == second["events"] == 3
+    assert processor.blockchain.calls == [({12}, True, {HOST})]
+    assert len(processor.store.deltas) == 1
+
+    # Ledger survives a restart
+    restarted = ChainEventProcessor(FakeBlockchain(), FakeStore(), EventLedger(tmp_path / "processed.json"))
+    assert (await restarted.ingest(payload))["duplicates"] == 3
+
+
+async def test_rollback_and_reapply_in_a_new_block_are_processed(tmp_path):
+    processor = make_processor(tmp_path)
+    payload = load_fixture("property_listed.json")
+    block = payload["apply"][0]
+
+    await processor.ingest(payload)
+    rolled_back = await processor.ingest({"apply": [], "rollback": [block]})
+    assert rolled_back["duplicates"] == 0
+
+    # The same transactions re-mined in a different block
+    remined = json.loads(json.dumps(block))
+    remined["block_identifier"]["hash"] = "0x" + "0" * 59 + "24ec9"
+    reapplied = await processor.ingest({"apply": [remined], "rollback": []})
+    assert reapplied["duplicates"] == 0
+
+    # A rollback clears the apply of the same block, so its re-delivery is processed again
+    assert (await processor.ingest({"apply": [block], "rollback": []}))["duplicates"] == 0
+    assert (await processor.ingest({"apply": [block], "rollback": []}))["duplicates"] == 3
+    assert len(processor.blockchain.calls) == 4
+
+
+async def test_workers_sharing_a_ledger_never_drop_each_others_keys(tmp_path):
+    first, second = make_processor(tmp_path), make_processor(tmp_path)
+    listed, reviewed = load_fixture("property_listed.json"), load_fixture("review_and_badge.json")
+    assert not second.ledger.seen("anything")  # second worker has loaded the (empty) ledger already
+
+    await first.ingest(listed)
+    await second.ingest(reviewed)
+
+    # The second worker re-read the ledger before writing it, so the first worker's keys survive
+    assert (await second.ingest(listed))["duplicates"] == 3
+    restarted = make_processor(tmp_path)
+    assert (await restarted.ingest(listed))["duplicates"] == 3
+    assert (await restarted.ingest(reviewed))["duplicates"] == 3
+
+
+def test_chainhook_route_requires_token(tmp_path, monkeypatch):
+    processor = make_processor(tmp_path)
+    monkeypatch.setattr(events, "chain_event_processor", processor)
+    app = FastAPI()
+    app.include_router(events.router)
+    client = TestClient(app)
+    payload = load_fixture("review_and_badge.json")
+
+    monkeypatch.setattr(chain_events, "CHAINHOOK_AUTH_TOKEN", None)
+    assert client.post("/api/events/chainhook", json=payload).status_code == 503
+
+    monkeypatch.setattr(chain_events, "CHAINHOOK_AUTH_TOKEN", "s3cret")
+    assert client.post("/api/events/chainhook", json=payload, headers={"Authorization": "Bearer nope"}).status_code == 401
+
+    response = client.post("/api/events/chainhook", json=payload, headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.json()["events"] == 3
@@ -0,0 +1,112 @@
+import struct
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pytest
+
+from app.services.clarity import (
+    ClarityDecodeError,
+    ClarityParser,
+    c32_address,
+    c32_address_decode,
+    decode_hex,
+    serialize_principal,
+    serialize_uint,
+)
+
+OWNER = "SP2J6ZY48GV1EZ5V2V5RB9MP66SW86PYKKNRV9EJ7"
+OWNER_HASH = bytes.fromhex("a46ff88886c2ef9762d970b4d2c63678835bd39d")
+
+
+def uint(n):
+    return b"\x01" + n.to_bytes(16, "big")
+
+
+def ascii_str(s):
+    return b"\x0d" + struct.pack(">I", len(s)) + s.encode()
+
+
+def tuple_of(**fields):
+    out = b"\x0c" + struct.pack(">I", len(fields))
+    for name, value in fields.items():
+        key = name.replace("_", "-").encode()
+        out += bytes([len(key)]) + key + value
+    return out
+
+
+def property_tuple(uri="ipfs://QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"):
+    return tuple_of(
+        owner=bytes([0x05, 22]) + OWNER_HASH,
+        price_per_night=uint(25_000_000),
+        location_tag=uint(7),
+        metadata_uri=ascii_str(uri),
+        active=b"\x03",
+        created_at=uint(151_234),
+    )
+
+
+def test_c32_address_round_trip():
+    assert c32_address(22, OWNER_HASH) == OWNER
+    assert c32_address_decode(OWNER) == (22, OWNER_HASH)
+    assert c32_address(26, bytes(20)) == "ST000000000000000000002AMW42H"
+
+    with pytest.raises(ClarityDecodeError):
+        c32_address_decode(OWNER[:-1] + "8")
+
+
+def test_decode_scalars_and_containers():
+    assert decode_hex(serialize_uint(5)) == 5
+    assert decode_hex("0x00" + "ff" * 16) == -1
+    assert decode_hex("0x03") is True
+    assert decode_hex("0x04") is False
+    assert decode_hex("0x09") is None
+    assert decode_hex("0x0a" + uint(3).hex()) == 3
+    assert decode_hex("0x07" + uint(1).hex()) == {"ok": True, "value": 1}
+    assert decode_hex("0x08" + uint(2).hex()) == {"ok": False, "value": 2}
+    assert decode_hex("0x02000000020a0b") == b"\x0a\x0b"
+    assert decode_hex("0x0e00000002c3a9") == "é"
+    assert decode_hex("0x0b00000002" + uint(1).hex() + uint(2).hex()) == [1, 2]
+
+
+def test_principal_serialization_round_trip():
+    assert decode_hex(serialize_principal(OWNER)) == OWNER
+    contract = f"{OWNER}.stackstay-escrow"
+    assert decode_hex(serialize_principal(contract)) == contract
+
+
+def test_parse_property_returns_typed_record():
+    result = "0x0a" + property_tuple().hex()
+
+    record = ClarityParser.parse_property(result)
+
+    assert record == {
+        "owner": OWNER,
+        "price_per_night": 25_000_000,
+        "location_tag": 7,
+        "metadata_uri": "ipfs://QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG",
+        "active": True,
+        "created_at": 151_234,
+    }
+    assert ClarityParser.parse_property("0x09") is None
+
+
+def test_parse_property_normalizes_bare_cid():
+    result = "0x0a" + property_tuple(uri="QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG").hex()
+
+    record = ClarityParser.parse_property(result)
+
+    assert record["metadata_uri"] == "ipfs://QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+
+
+def test_malformed_input_raises():
+    with pytest.raises(ClarityDecodeError):
+        decode_hex("0x01" + "00" * 3)
+    with pytest.raises(ClarityDecodeError):
+        decode_hex("0x0d00000010414243")
+    with pytest.raises(ClarityDecodeError):
+        decode_hex("0x03ff")
+    with pytest.raises(ClarityDecodeError):
+        decode_hex("0x1f")
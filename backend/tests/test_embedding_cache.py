@@ -0,0 +1,133 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+
+MODEL = "embed-english-v3.0"
+
+
+def make_embedder(dim=8):
+    calls = []
+
+    async def embed(texts):
+        calls.append(list(texts))
+        return np.stack([np.full(dim, len(text), dtype=np.float32) for text in texts])
+
+    return embed, calls
+
+
+async def test_only_new_texts_are_embedded_and_order_is_kept(tmp_path):
+    cache = EmbeddingCache(path=tmp_path)
+    embed, calls = make_embedder()
+
+    first = await cache.embed(["a", "bb", "a"], embed, MODEL, "search_document", "1")
+    second = await cache.embed(["ccc", "bb", "a"], embed, MODEL, "search_document", "1")
+
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert first[:, 0].tolist() == [1, 2, 1]
+    assert second[:, 0].tolist() == [3, 2, 1]
+    assert cache.stats()["hits"] == 2
+
+
+async def test_entries_survive_restart_but_not_a_version_bump(tmp_path):
+    embed, calls = make_embedder()
+    cache = EmbeddingCache(path=tmp_path)
+    await cache.embed(["villa", "loft"], embed, MODEL, "search_document", "1")
+    cache.close()
+
+    reopened = EmbeddingCache(path=tmp_path)
+    vectors = await reopened.embed(["loft", "villa"], embed, MODEL, "search_document", "1")
+    assert len(calls) == 1
+    assert vectors[:, 0].tolist() == [4, 5]
+
+    await reopened.embed(["villa"], embed, MODEL, "search_document", "2")
+    await reopened.embed(["villa"], embed, MODEL, "search_query", "1")
+    assert calls[1:] == [["villa"], ["villa"]]
+
+
+async def test_evicts_least_recently_used_within_budget(tmp_path):
+    dim = 8
+    cache = EmbeddingCache(path=tmp_path, max_bytes=10 * dim * 4)
+    embed, calls = make_embedder(dim)
+
+    await cache.embed([f"text-{i}" for i in range(10)], embed, MODEL, "search_document", "1")
+    await cache.embed(["text-0"], embed, MODEL, "search_document", "1")  # touch
+    await cache.embed(["fresh-a", "fresh-b"], embed, MODEL, "search_document", "1")
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 10 * dim * 4
+    assert stats["evictions"] > 0
+    assert cache.get_many(MODEL, "search_document", "1", ["text-0"])[0] is not None
+    assert cache.get_many(MODEL, "search_document", "1", ["text-1"])[0] is None
+
+    # Freed slots are reused instead of growing the file
+    await cache.embed(["fresh-c"], embed, MODEL, "search_document", "1")
+    used = cache._db().execute("SELECT used FROM files WHERE dim = ?", (dim,)).fetchone()[0]
+    assert used == 12
+
+
+def numbered(texts, dim=8):
+    """Vectors that encode each text's number, so a misplaced slot is visible"""
+    return np.stack([np.full(dim, int(text.split("-")[1]), dtype=np.float32) for text in texts])
+
+
+def test_two_instances_share_a_growing_file(tmp_path):
+    first = EmbeddingCache(path=tmp_path)
+    second = EmbeddingCache(path=tmp_path)
+
+    early = [f"text-{i}" for i in range(10)]
+    first.put_many(MODEL, "search_document", "1", early, numbered(early))
+    assert second.get_many(MODEL, "search_document", "1", early)[0] is not None  # maps the first capacity
+
+    # The first instance grows the file well past the second one's mapping
+    late = [f"text-{i}" for i in range(10, 3000)]
+    first.put_many(MODEL, "search_document", "1", late, numbered(late))
+
+    # The second remaps instead of indexing past its stale mapping, and its own
+    # writes land after the first instance's rows without shrinking the file
+    mine = [f"text-{i}" for i in range(3000, 3010)]
+    second.put_many(MODEL, "search_document", "1", mine, numbered(mine))
+
+    texts = early + late + mine
+    for cache in (first, second):
+        vectors = cache.get_many(MODEL, "search_document", "1", texts)
+        assert [int(v[0]) for v in vectors] == list(range(3010))
+    size = (tmp_path / "vectors-8.f32").stat().st_size
+    capacity = first._db().execute("SELECT capacity FROM files WHERE dim = 8").fetchone()[0]
+    assert size >= capacity * 8 * 4 >= 3010 * 8 * 4
+
+
+def test_slots_read_are_not_reused_until_the_vectors_are_copied(tmp_path):
+    import threading
+
+    reader = EmbeddingCache(path=tmp_path)
+    writer = EmbeddingCache(path=tmp_path)
+    writer.put_many(MODEL, "search_document", "1", ["text-1"], numbered(["text-1"]))
+
+    def evict_and_reuse():
+        # Another worker frees every slot, then stores a new text in the freed one
+        writer.max_bytes = 0
+        writer._evict()
+        writer.max_bytes = 1 << 30
+        writer.put_many(MODEL, "search_document", "1", ["text-2"], numbered(["text-2"]))
+
+    other = threading.Thread(target=evict_and_reuse)
+    real_lookup = reader._lookup
+
+    def lookup(*args):
+        found = real_lookup(*args)
+        other.start()
+        other.join(timeout=0.5)  # blocked on the read's lock instead of reusing the slot
+        return found
+
+    reader._lookup = lookup
+    [vector] = reader.get_many(MODEL, "search_document", "1", ["text-1"])
+    other.join()
+
+    assert int(vector[0]) == 1
+    assert writer.get_many(MODEL, "search_document", "1", ["text-1"]) == [None]
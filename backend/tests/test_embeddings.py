@@ -0,0 +1,112 @@
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import cohere
+import pytest
+
+from app.services.embeddings import EmbeddingService
+
+
+class FakeAsyncClient:
+    """Embeds each text as [len(text)]; fails the first `failures` calls with a 429"""
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def embed(self, texts, model, input_type, batching):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures:
+                self.failures -= 1
+                raise self.error or cohere.TooManyRequestsError(body={"message": "slow down"})
+            self.batches.append(list(texts))
+            return SimpleNamespace(embeddings=[[float(len(text))] for text in texts])
+        finally:
+            self.in_flight -= 1
+
+
+def make_service(client, **kwargs):
+    service = EmbeddingService(api_key=None, retry_base_delay=0.001, **kwargs)
+    service.client = client
+    return service
+
+
+async def test_batches_run_concurrently_and_keep_input_order():
+    client = FakeAsyncClient()
+    service = make_service(client, batch_size=3, concurrency=2)
+    texts = ["x" * n for n in range(1, 11)]
+
+    vectors = await service.embed_documents(texts)
+
+    assert vectors[:, 0].tolist() == list(range(1, 11))
+    assert sorted(len(batch) for batch in client.batches) == [1, 3, 3, 3]
+    assert client.max_in_flight == 2
+
+
+async def test_transient_errors_are_retried():
+    client = FakeAsyncClient(failures=2)
+    service = make_service(client)
+
+    vector = await service.embed_query("Ghana")
+
+    assert vector.tolist() == [5.0]
+    assert service.retries == 2
+
+
+async def test_client_errors_are_not_retried():
+    client = FakeAsyncClient(failures=1, error=cohere.BadRequestError(body={"message": "bad"}))
+    service = make_service(client)
+
+    with pytest.raises(cohere.BadRequestError):
+        await service.embed_documents(["a"])
+    assert service.retries == 0
+
+
+async def test_concurrent_queries_share_one_request():
+    client = FakeAsyncClient()
+    service = make_service(client)
+    service.query_batcher.window = 0.005
+
+    queries = ["Ghana", "2 bedrooms", "Ghana", "beach house"]
+    vectors = await asyncio.gather(*(service.embed_query(q) for q in queries))
+
+    assert [v.tolist() for v in vectors] == [[5.0], [10.0], [5.0], [11.0]]
+    assert client.batches == [["ghana", "2 bedrooms", "beach house"]]
+    stats = service.stats()["query_batching"]
+    assert stats["batches"] == 1
+    assert stats["max_batch_size"] == 4
+
+
+async def test_full_queue_flushes_before_the_window():
+    client = FakeAsyncClient()
+    service = make_service(client)
+    service.query_batcher.window = 10
+    service.query_batcher.max_batch = 2
+
+    await asyncio.wait_for(asyncio.gather(service.embed_query("a"), service.embed_query("b")), timeout=1)
+
+    assert client.batches == [["a", "b"]]
+
+
+async def test_repeat_queries_skip_the_provider():
+    client = FakeAsyncClient()
+    service = make_service(client)
+
+    first = await service.embed_query("Show me cheaper options")
+    first[0] = -1.0  # callers get their own copy
+    again = await service.embed_query("  show me   CHEAPER options ")
+
+    assert again.tolist() == [23.0]
+    assert len(client.batches) == 1
+    assert service.stats()["query_cache"]["hits"] == 1
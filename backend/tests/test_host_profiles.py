@@ -0,0 +1,54 @@
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.services.host_profiles import HostProfileTable, profile_fields
+
+
+def test_profile_fields_shape():
+    fields = profile_fields(["superhost", "early-adopter"], {"average_rating": 450, "total_reviews": 12})
+
+    assert fields == {
+        "host_badges": ["superhost", "early-adopter"],
+        "is_superhost": True,
+        "host_reputation": {"average_rating": 4.5, "total_reviews": 12},
+    }
+    assert profile_fields([], None) == {}
+
+
+async def test_resolve_dedupes_and_coalesces():
+    table = HostProfileTable(ttl=60)
+    calls = []
+
+    async def fetch(principal):
+        calls.append(principal)
+        await asyncio.sleep(0.01)
+        return {"host_badges": [principal]}
+
+    first, second = await asyncio.gather(
+        table.resolve(["A", "B", "A", None], fetch),
+        table.resolve(["A"], fetch),
+    )
+
+    assert sorted(calls) == ["A", "B"]
+    assert first["A"] == second["A"] == {"host_badges": ["A"]}
+
+
+async def test_resolve_refetches_after_ttl_and_skips_failures():
+    table = HostProfileTable(ttl=0)
+    calls = []
+
+    async def fetch(principal):
+        calls.append(principal)
+        if principal == "bad":
+            raise RuntimeError("node down")
+        return {}
+
+    profiles = await table.resolve(["ok", "bad"], fetch)
+    await table.resolve(["ok"], fetch)
+
+    assert "bad" not in profiles
+    assert calls.count("ok") == 2
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from app.services.blockchain import BlockchainService
+from app.services.ipfs_cache import IPFSMetadataCache, cid_from_uri
+from app.services.ipfs_fetcher import GatewayState
+
+CID = "QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+
+
+def test_cid_from_uri_normalizes_forms():
+    assert cid_from_uri(f"ipfs://{CID}") == CID
+    assert cid_from_uri(f"/ipfs/{CID}/meta.json") == f"{CID}/meta.json"
+    assert cid_from_uri(f"{CID} \x00junk") == CID
+
+
+def test_cache_survives_restart_and_counts_hits(tmp_path):
+    cache = IPFSMetadataCache(path=tmp_path)
+    assert cache.get(CID) is None
+    cache.put(f"ipfs://{CID}", {"title": "Villa"})
+    assert cache.get(CID) == {"title": "Villa"}
+    cache.close()
+
+    reopened = IPFSMetadataCache(path=tmp_path)
+    assert reopened.get(f"ipfs://{CID}") == {"title": "Villa"}
+    assert reopened.get(CID) == {"title": "Villa"}
+
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 0
+
+
+def test_cache_evicts_by_size(tmp_path):
+    cache = IPFSMetadataCache(path=tmp_path, memory_bytes=200, disk_bytes=600)
+    for i in range(50):
+        cache.put(f"Qm{i}", {"title": "x" * 50, "n": i, "noise": str(i) * 40})
+
+    stats = cache.stats()
+    assert stats["memory_bytes"] <= 200
+    assert stats["disk_bytes"] <= 600
+    assert stats["evictions"] > 0
+    # Most recent entry is still around
+    assert cache.get("Qm49")["n"] == 49
+
+
+async def test_fetch_ipfs_metadata_hits_gateway_once(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        return httpx.Response(200, json={"title": "Villa"})
+
+    service = BlockchainService()
+    service.ipfs_fetcher.gateways = [GatewayState("http://gateway.test/ipfs")]
+    service.ipfs_cache = IPFSMetadataCache(path=tmp_path)
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    for _ in range(3):
+        assert await service.fetch_ipfs_metadata(f"ipfs://{CID}") == {"title": "Villa"}
+
+    assert len(requests) == 1
+    await service.close()
@@ -0,0 +1,93 @@
+import sys
+import asyncio
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from app.services import ipfs_fetcher
+from app.services.ipfs_fetcher import IPFSFetcher, InvalidMetadata, validate_metadata
+
+CID = "QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+
+
+def make_fetcher(handlers, **kwargs):
+    """One async handler per gateway host"""
+
+    async def dispatch(request):
+        return await handlers[request.url.host](request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(dispatch))
+    gateways = [f"http://{host}/ipfs" for host in handlers]
+    return IPFSFetcher(lambda: client, gateways=gateways, **kwargs), client
+
+
+def test_validate_metadata_rejects_error_bodies():
+    assert validate_metadata({"title": "Villa"}) == {"title": "Villa"}
+    for bad in ([], {}, {"error": "not found"}, {"title": 5}):
+        try:
+            validate_metadata(bad)
+        except InvalidMetadata:
+            continue
+        raise AssertionError(f"accepted {bad!r}")
+
+
+async def test_slow_gateway_is_hedged(monkeypatch):
+    monkeypatch.setattr(ipfs_fetcher, "IPFS_HEDGE_MAX_DELAY", 0.05)
+
+    async def slow(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json={"title": "slow"})
+
+    async def fast(request):
+        return httpx.Response(200, json={"title": "fast"})
+
+    fetcher, client = make_fetcher({"slow.test": slow, "fast.test": fast})
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await fetcher.fetch(CID) == {"title": "fast"}
+    assert loop.time() - started < 1
+    assert fetcher.hedges == 1
+    assert fetcher.hedge_wins == 1
+    # The cancelled loser is not blamed, and the winner now ranks first
+    assert fetcher.gateways[0].failures == 0
+    assert fetcher.ranked()[0].url == "http://fast.test/ipfs"
+    await client.aclose()
+
+
+async def test_failures_fail_over_and_open_the_breaker(monkeypatch):
+    monkeypatch.setattr(ipfs_fetcher, "IPFS_BREAKER_FAILURES", 2)
+    calls = {"bad.test": 0, "good.test": 0}
+
+    async def bad(request):
+        calls["bad.test"] += 1
+        return httpx.Response(200, text="<html>504 Gateway Time-out</html>")
+
+    async def good(request):
+        calls["good.test"] += 1
+        return httpx.Response(200, json={"title": "Villa"})
+
+    fetcher, client = make_fetcher({"bad.test": bad, "good.test": good})
+
+    for _ in range(4):
+        assert await fetcher.fetch(CID) == {"title": "Villa"}
+        # Keep the broken gateway at the front of the ranking until its breaker opens
+        fetcher.gateways[1].ewma = 1.0
+
+    assert calls["bad.test"] == 2
+    assert calls["good.test"] == 4
+    assert fetcher.stats()["gateways"][0]["state"] == "open"
+    await client.aclose()
+
+
+async def test_all_gateways_failing_returns_none():
+    async def down(request):
+        return httpx.Response(503)
+
+    fetcher, client = make_fetcher({"a.test": down, "b.test": down})
+    assert await fetcher.fetch(CID) is None
+    assert [g.failures for g in fetcher.gateways] == [1, 1]
+    await client.aclose()
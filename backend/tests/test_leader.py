@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pytest
+
+from app.services.leader import LeaderLock
+
+
+def test_only_one_process_leads(tmp_path):
+    path = tmp_path / "leader.lock"
+    first, second = LeaderLock(path), LeaderLock(path)
+
+    assert first.resolve_role("auto") == "leader"
+    assert second.resolve_role("auto") == "follower"
+    with pytest.raises(RuntimeError):
+        second.resolve_role("leader")
+
+    # Leadership passes on once the holder lets go (or exits)
+    first.release()
+    assert second.resolve_role("auto") == "leader"
+    second.release()
+
+
+def test_follower_role_never_takes_the_lock(tmp_path):
+    path = tmp_path / "leader.lock"
+    follower = LeaderLock(path)
+
+    assert follower.resolve_role("follower") == "follower"
+    assert not follower.held
+    assert LeaderLock(path).acquire()
@@ -0,0 +1,375 @@
+import sys
+import json
+import struct
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import asyncpg
+import numpy as np
+import pytest
+
+from app.db import pgvector_ann
+from app.db.pgvector_codec import decode_jsonb, decode_vector, encode_jsonb, encode_vector, to_wire
+from app.db.pgvector_filters import FILTER_COLUMNS, compile_filters, filter_columns
+from app.db.pgvector_reindex import shadow_index_sql
+from app.services.vector_store import PGVectorStore
+
+
+def test_vector_codec_matches_pgvector_binary_format():
+    vector = np.array([1.5, -2.0, 0.1], dtype=np.float32)
+
+    encoded = encode_vector(vector)
+
+    assert encoded == struct.pack(">HH3f", 3, 0, 1.5, -2.0, np.float32(0.1))
+    assert decode_vector(encoded).tolist() == vector.tolist()  # bit-exact, no text rounding
+    assert encode_vector(to_wire(vector.reshape(1, -1))[0]) == encoded
+
+
+class FakeConnection:
+    def __init__(self, rows=(), extversion="0.7.4", plan=None, catalog=None, busy_swaps=0):
+        self.executed = []
+        self.executed_args = []
+        self.codecs = []
+        self.fetchrow_calls = 0
+        self.copied = []
+        self.fetched = []
+        self.rows = list(rows)
+        self.extversion = extversion
+        self.plan = plan
+        self.catalog = catalog or {}  # catalog query keyword -> rows
+        self.busy_swaps = busy_swaps  # swaps that hit lock_timeout before one succeeds
+
+    async def execute(self, sql, *args):
+        self.executed.append(sql)
+        if args:
+            self.executed_args.append(args)
+        if sql == "ALTER TABLE property_embeddings RENAME TO property_embeddings_retired" and self.busy_swaps:
+            self.busy_swaps -= 1
+            raise asyncpg.exceptions.LockNotAvailableError("canceling statement due to lock timeout")
+
+    async def fetchrow(self, sql, *args):
+        self.fetchrow_calls += 1
+        return {"?column?": 1} if self.rows else None
+
+    async def fetchval(self, sql, *args):
+        if sql.startswith("EXPLAIN"):
+            return self.plan
+        if "pg_get_serial_sequence" in sql:
+            return "public.property_embeddings_id_seq"
+        return self.extversion
+
+    async def fetch(self, sql, *args):
+        for keyword, rows in self.catalog.items():
+            if keyword in sql:
+                return rows
+        self.fetched.append((sql, args))
+        return self.rows
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copied.append((table, list(records), columns))
+
+    async def set_type_codec(self, typename, **kwargs):
+        self.codecs.append(typename)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class FakePool:
+    def __init__(self, conn=None):
+        self.conn = conn or FakeConnection()
+        self.acquired = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.acquired += 1
+        yield self.conn
+
+
+def pg_store(embeddings, conn=None):
+    store = PGVectorStore()
+    store.pool = FakePool(conn)
+
+    async def embed_texts(texts):
+        return embeddings[:len(texts)]
+
+    async def embed_query(query):
+        return np.ones(embeddings.shape[1], dtype=np.float32)
+
+    store.embed_texts = embed_texts
+    store.embed_query = embed_query
+    return store
+
+
+async def test_index_properties_bulk_copies_binary_vectors():
+    embeddings = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+    store = pg_store(embeddings)
+    properties = [{"property_id": i, "title": f"Villa {i}"} for i in range(3)]
+
+    assert await store.index_properties(properties) == 3
+
+    conn = store.pool.conn
+    assert not any("TRUNCATE" in sql for sql in conn.executed)
+    [(table, records, columns)] = conn.copied
+    assert table == "property_embeddings_shadow"
+    assert columns == ["property_id", "title", "embedding", "metadata", *FILTER_COLUMNS]
+    assert [r[0] for r in records] == [0, 1, 2]
+    assert records[2][3] == properties[2]  # encoded by the JSONB codec
+    assert decode_vector(encode_vector(records[1][2])).tolist() == embeddings[1].tolist()
+
+
+def test_filter_columns_are_typed_and_normalized():
+    prop = {"price_per_night": "120.5", "bedrooms": 3.0, "max_guests": None, "location_city": "Accra",
+            "location_country": "Ghana", "amenities": "WiFi, Pool ,", "active": True}
+
+    assert filter_columns(prop) == (120.5, 3, None, None, "accra", "ghana", ["wifi", "pool"], True)
+
+
+def test_filters_compile_to_parameterized_where_clause():
+    where, args = compile_filters(
+        {"min_price": 50, "max_price": 200, "city": "Accra", "location": "50%_off", "amenities": ["WiFi"], "guests": 2},
+        first_param=3,
+    )
+
+    assert where == (
+        "WHERE active IS NOT FALSE"
+        " AND price_per_night >= $3::float8"
+        " AND (price_per_night IS NULL OR price_per_night <= $4::float8)"
+        " AND (city LIKE $5 OR country LIKE $5 OR lower(title) LIKE $5 OR lower(metadata->>'description') LIKE $5)"
+        " AND city = $6"
+        " AND max_guests >= $7::integer"
+        " AND amenities @> $8::text[]"
+    )
+    assert args == [50.0, 200.0, "%50\\%\\_off%", "accra", 2, ["wifi"]]
+    assert compile_filters(None, first_param=3) == ("WHERE active IS NOT FALSE", [])
+
+
+def test_range_filters_compare_bare_columns():
+    where, args = compile_filters({"min_price": 0, "bedrooms": 1.5, "bathrooms": -1}, first_param=1)
+
+    # Only thresholds a missing value (counted as 0) passes add the NULL branch
+    assert where == (
+        "WHERE active IS NOT FALSE"
+        " AND (price_per_night >= $1::float8 OR price_per_night IS NULL)"
+        " AND bedrooms >= $2::integer"
+        " AND (bathrooms >= $3::float8 OR bathrooms IS NULL)"
+    )
+    assert args == [0.0, 2, -1.0]
+    assert "COALESCE" not in where
+
+
+async def test_filtered_search_pushes_down_and_widens_short_results():
+    conn = FakeConnection(rows=[{"metadata": {"property_id": 1}, "distance": 0.4}])
+    store = pg_store(np.zeros((1, 4), dtype=np.float32), conn)
+    store._iterative_scan = False  # pgvector < 0.8
+
+    results = await store.search("beach", k=5, filters={"city": "Accra"})
+
+    assert [r["property_id"] for r in results] == [1]
+    (first_sql, first_args), (retry_sql, _) = conn.fetched
+    assert "WHERE active IS NOT FALSE AND city = $3" in first_sql
+    assert first_args[1:] == (5, "accra")
+    # Short filtered result: retried with more probes and a wider HNSW candidate list for that query only
+    assert retry_sql == first_sql
+    assert conn.executed == [pgvector_ann.SEARCH_SETTINGS_SQL]
+    assert conn.executed_args == [("100", "400")]
+
+
+async def test_filtered_search_uses_iterative_scan_when_available():
+    conn = FakeConnection(rows=[{"metadata": {"property_id": 1}, "distance": 0.4}], extversion="0.8.0")
+    store = pg_store(np.zeros((1, 4), dtype=np.float32), conn)
+
+    await store._init_connection(conn)
+    await store.search("beach", k=5, filters={"bedrooms": 2})
+
+    assert conn.codecs == ["vector", "jsonb"]
+    assert "SET ivfflat.iterative_scan = relaxed_order" in conn.executed
+    assert len(conn.fetched) == 1
+
+
+async def test_default_search_is_one_query_on_one_connection():
+    conn = FakeConnection(rows=[{"metadata": {"property_id": 1}, "distance": 0.1}])
+    store = pg_store(np.zeros((1, 4), dtype=np.float32), conn)
+    store.has_rows = True
+
+    await store.search("beach", k=1)
+    await store.search("villa", k=1)
+
+    # No emptiness probe, no transaction, no per-query settings
+    assert conn.fetchrow_calls == 0
+    assert conn.executed == []
+    assert store.pool.acquired == 2
+    assert len(conn.fetched) == 2
+
+
+async def test_empty_table_is_rechecked_until_rows_appear():
+    conn = FakeConnection()
+    store = pg_store(np.ones((1, 4), dtype=np.float32), conn)
+
+    assert await store.search("beach") == []
+    assert await store.search("beach") == []
+    assert conn.fetchrow_calls == 2 and not conn.fetched
+
+    await store.index_properties([{"property_id": 1}])
+    conn.rows = [{"metadata": {"property_id": 1}, "distance": 0.0}]
+    assert [r["property_id"] for r in await store.search("beach")] == [1]
+    assert conn.fetchrow_calls == 2
+
+
+def test_jsonb_codec_round_trips_metadata():
+    metadata = {"property_id": 7, "title": "Villa", "amenities": ["wifi"], "price_per_night": 120.5}
+
+    encoded = encode_jsonb(metadata)
+
+    assert encoded[:1] == b"\x01"
+    assert json.loads(encoded[1:]) == metadata
+    assert decode_jsonb(encoded) == metadata
+
+
+async def test_search_orders_by_cosine_operator_and_returns_similarity():
+    conn = FakeConnection(rows=[{"metadata": {"property_id": 1}, "distance": 0.25},
+                                {"metadata": {"property_id": 2}, "distance": 0.9}])
+    store = pg_store(np.zeros((1, 4), dtype=np.float32), conn)
+
+    results = await store.search("beach", k=2, min_score=0.5, ef_search=120, nprobe=7)
+
+    (sql, _), = conn.fetched
+    assert "ORDER BY embedding <=> $1::vector" in sql and "<->" not in sql
+    # Cosine distance -> similarity, below-threshold matches dropped
+    assert results == [{"property_id": 1, "match_score": 0.75}]
+    assert conn.executed == [pgvector_ann.SEARCH_SETTINGS_SQL]
+    assert conn.executed_args == [("7", "120")]
+
+
+def test_create_index_sql_matches_cosine_opclass():
+    assert "USING hnsw (embedding vector_cosine_ops) WITH (m = " in pgvector_ann.create_index_sql("hnsw")
+    assert "USING ivfflat (embedding vector_cosine_ops) WITH (lists = " in pgvector_ann.create_index_sql("ivfflat")
+    with pytest.raises(ValueError):
+        pgvector_ann.create_index_sql("flat")
+
+
+async def test_explain_reports_whether_the_ann_index_is_used():
+    index_scan = [{"Plan": {"Node Type": "Limit", "Plans": [
+        {"Node Type": "Index Scan", "Index Name": pgvector_ann.ANN_INDEX_NAME}]}}]
+    seq_scan = [{"Plan": {"Node Type": "Limit", "Plans": [{"Node Type": "Sort", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "property_embeddings"}]}]}}]
+
+    store = pg_store(np.zeros((1, 4), dtype=np.float32), FakeConnection(plan=json.dumps(index_scan)))
+    report = await store.explain_search(filters={"city": "Accra"})
+    assert report["uses_index"] is True
+    assert report["plan"] == ["Limit", "Index Scan"]
+
+    store = pg_store(np.zeros((1, 4), dtype=np.float32), FakeConnection(plan=seq_scan))
+    report = await store.explain_search()
+    assert report["uses_index"] is False
+    assert report["plan"] == ["Limit", "Sort", "Seq Scan"]
+
+
+def test_shadow_index_sql_targets_the_shadow_table():
+    assert shadow_index_sql(
+        "CREATE INDEX idx_property_embeddings_amenities ON public.property_embeddings USING gin (amenities)"
+    ) == "CREATE INDEX idx_property_embeddings_amenities_shadow ON property_embeddings_shadow USING gin (amenities)"
+
+
+async def test_reindex_builds_shadow_table_and_swaps_it_in():
+    conn = FakeConnection(
+        catalog={
+            "pg_constraint WHERE": [{"conname": "property_embeddings_pkey", "definition": "PRIMARY KEY (id)"}],
+            "pg_indexes": [{"indexname": "idx_property_embeddings_city",
+                            "indexdef": "CREATE INDEX idx_property_embeddings_city ON public.property_embeddings USING btree (city)"}],
+        },
+        busy_swaps=1,
+    )
+    store = pg_store(np.ones((2, 4), dtype=np.float32), conn)
+
+    assert await store.index_properties([{"property_id": 1}, {"property_id": 2}]) == 2
+
+    # The whole rebuild runs under the advisory lock every writer of the table takes
+    assert conn.executed[0] == "SELECT pg_advisory_lock(hashtext($1))"
+    assert conn.executed[-1] == "SELECT pg_advisory_unlock(hashtext($1))"
+    executed = conn.executed[1:-1]
+    # Everything before the swap only touches the shadow table
+    first_swap = executed.index("ALTER TABLE property_embeddings RENAME TO property_embeddings_retired")
+    assert executed[first_swap - 1].startswith("SET LOCAL lock_timeout")
+    assert all("property_embeddings_shadow" in sql for sql in executed[:first_swap - 1])
+    assert executed[first_swap - 2] == "ANALYZE property_embeddings_shadow"
+    assert any(sql.startswith("CREATE INDEX IF NOT EXISTS idx_property_embeddings_embedding_shadow") for sql in executed)
+
+    # The first swap hit the lock timeout and rolled back; the retry completes it
+    swap = executed[executed.index("ALTER TABLE property_embeddings RENAME TO property_embeddings_retired", first_swap + 1) - 1:]
+    assert swap == [
+        "SET LOCAL lock_timeout = '2000ms'",
+        "ALTER TABLE property_embeddings RENAME TO property_embeddings_retired",
+        "ALTER TABLE property_embeddings_shadow RENAME TO property_embeddings",
+        "ALTER SEQUENCE public.property_embeddings_id_seq OWNED BY property_embeddings.id",
+        "DROP TABLE property_embeddings_retired",
+        "ALTER TABLE property_embeddings RENAME CONSTRAINT property_embeddings_pkey_shadow TO property_embeddings_pkey",
+        "ALTER INDEX idx_property_embeddings_city_shadow RENAME TO idx_property_embeddings_city",
+        "ALTER INDEX idx_property_embeddings_embedding_shadow RENAME TO idx_property_embeddings_embedding",
+    ]
+
+
+async def test_empty_catalog_rebuilds_an_empty_table():
+    store = pg_store(np.ones((1, 4), dtype=np.float32))
+    store.dimension = 4
+    assert await store.index_properties([]) == 0
+    assert store.pool.conn.copied == []  # nothing indexed yet, nothing to clear
+
+    store.has_rows = True
+    assert await store.index_properties([]) == 0
+
+    [(table, records, _)] = store.pool.conn.copied
+    assert table == "property_embeddings_shadow" and records == []
+    assert store.has_rows is False
+
+
+async def test_apply_delta_rewrites_only_touched_rows():
+    conn = FakeConnection(catalog={"DISTINCT property_id": [{"property_id": i} for i in (1, 2, 3)]})
+    embedded = []
+    store = pg_store(np.ones((4, 4), dtype=np.float32), conn)
+    real_embed = store.embed_texts
+
+    async def embed_texts(texts):
+        embedded.extend(texts)
+        return await real_embed(texts)
+
+    store.embed_texts = embed_texts
+    catalog = [{"property_id": 1, "title": "A"}, {"property_id": 2, "title": "B2"}, {"property_id": 4, "title": "D"}]
+    delta = {"nonce": 5, "added": [catalog[2]], "changed": [catalog[1]], "removed": [3], "properties": catalog}
+
+    assert await store.apply_delta(delta) == 3
+
+    assert len(embedded) == 2
+    assert conn.executed == [
+        "SELECT pg_advisory_xact_lock(hashtext($1))",
+        "DELETE FROM property_embeddings WHERE property_id = ANY($1::integer[])",
+    ]
+    assert conn.executed_args == [("property_embeddings",), ([2, 3, 4],)]
+    [(table, records, _)] = conn.copied
+    assert table == "property_embeddings" and [r[0] for r in records] == [2, 4]
+    assert store.property_metadata == catalog and store.has_rows
+
+
+async def test_apply_delta_on_an_empty_table_rebuilds():
+    conn = FakeConnection(catalog={"DISTINCT property_id": []})
+    store = pg_store(np.ones((2, 4), dtype=np.float32), conn)
+    catalog = [{"property_id": 1}, {"property_id": 2}]
+
+    assert await store.apply_delta({"nonce": 2, "added": catalog, "changed": [], "removed": [], "properties": catalog}) == 2
+
+    [(table, records, _)] = conn.copied
+    assert table == "property_embeddings_shadow" and len(records) == 2
+
+
+async def test_rebuild_releases_the_advisory_lock_on_failure():
+    conn = FakeConnection(busy_swaps=99)
+    store = pg_store(np.ones((1, 4), dtype=np.float32), conn)
+
+    with pytest.raises(asyncpg.exceptions.LockNotAvailableError):
+        await store.index_properties([{"property_id": 1}])
+
+    assert conn.executed[-1] == "SELECT pg_advisory_unlock(hashtext($1))"
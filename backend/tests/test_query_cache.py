@@ -0,0 +1,42 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from app.services.query_cache import QueryVectorCache, normalize_query
+
+MODEL = "embed-english-v3.0"
+
+
+def test_normalize_query():
+    assert normalize_query("  2 Bedrooms\tin\nACCRA ") == "2 bedrooms in accra"
+    assert normalize_query("ＧＨＡＮＡ") == "ghana"
+    assert normalize_query("Straße") == normalize_query("STRASSE")
+
+
+def test_lru_is_bounded_in_bytes():
+    vector = np.ones(16, dtype=np.float32)
+    cache = QueryVectorCache(max_bytes=3 * vector.nbytes)
+
+    for query in ("a", "b", "c"):
+        cache.put(MODEL, query, vector)
+    cache.get(MODEL, "a")
+    cache.put(MODEL, "d", vector)
+
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "A") is not None
+    assert cache.stats()["bytes"] == 3 * vector.nbytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = QueryVectorCache(ttl=0.01)
+    cache.put(MODEL, "ghana", np.ones(4))
+    assert cache.get(MODEL, "Ghana") is not None
+    time.sleep(0.02)
+    assert cache.get(MODEL, "ghana") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,72 @@
+import sys
+import asyncio
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from app.services.blockchain import BlockchainService
+
+NONCE_RESULT = "0x0100000000000000000000000000000005"
+
+
+def make_service(chain):
+    """`chain` holds the mutable tip height; counts upstream requests by path"""
+    calls = {"info": 0, "reads": 0}
+
+    async def handler(request):
+        if request.url.path == "/v2/info":
+            calls["info"] += 1
+            return httpx.Response(200, json={"stacks_tip_height": chain["height"]})
+        calls["reads"] += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"data": NONCE_RESULT})
+
+    service = BlockchainService()
+    service.api_url = "http://stacks.test"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service.read_cache.tip_interval = 0
+    return service, calls
+
+
+async def test_repeated_reads_within_a_block_hit_the_cache():
+    chain = {"height": 100}
+    service, calls = make_service(chain)
+
+    for _ in range(3):
+        assert await service.read_property_nonce() == 5
+    assert calls["reads"] == 1
+
+    chain["height"] = 101
+    assert await service.read_property_nonce() == 5
+    assert calls["reads"] == 2
+
+    stats = service.read_cache.stats()
+    assert stats["hits"] == 2
+    assert stats["invalidations"] == 1
+    assert stats["tip_height"] == 101
+    await service.close()
+
+
+async def test_concurrent_identical_reads_are_coalesced():
+    service, calls = make_service({"height": 7})
+    service.read_cache.tip_interval = 60
+
+    results = await asyncio.gather(*(service.read_property_nonce() for _ in range(10)))
+
+    assert results == [5] * 10
+    assert calls["reads"] == 1
+    assert calls["info"] == 1
+    await service.close()
+
+
+async def test_unknown_tip_disables_caching():
+    service, calls = make_service({"height": None})
+
+    await service.read_property_nonce()
+    await service.read_property_nonce()
+
+    assert calls["reads"] == 2
+    await service.close()
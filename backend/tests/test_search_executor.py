@@ -0,0 +1,89 @@
+import sys
+import asyncio
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import faiss
+import numpy as np
+import pytest
+
+from app.services import ann_index
+from app.services.search_executor import SearchExecutor
+
+DIM = 16
+
+
+@pytest.fixture
+def index():
+    vectors = np.random.default_rng(3).standard_normal((500, DIM)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return ann_index.build_index(vectors, np.arange(500, dtype=np.int64) * 10, "flat")
+
+
+def queries(n):
+    q = np.random.default_rng(4).standard_normal((n, DIM)).astype(np.float32)
+    faiss.normalize_L2(q)
+    return q
+
+
+async def test_concurrent_searches_share_one_matrix_call(index):
+    executor = SearchExecutor(threads=1, window=0.05, max_batch=64)
+    q = queries(8)
+    ks = [1, 3, 5, 5, 2, 8, 4, 6]
+
+    results = await asyncio.gather(*(executor.search(index, q[i], ks[i]) for i in range(8)))
+
+    # The first query finds the pool idle and goes at once; the rest share one matrix call
+    assert executor.batches == 2 and executor.max_batch_size == 7
+    for i, (scores, found) in enumerate(results):
+        expected_scores, expected = index.search(q[i:i + 1], ks[i])
+        assert found.shape == (1, ks[i])
+        assert found.tolist() == expected.tolist()
+        assert np.allclose(scores, expected_scores)
+    executor.shutdown()
+
+
+async def test_batches_split_by_parameters_and_size(index):
+    executor = SearchExecutor(threads=2, window=0.05, max_batch=4)
+    hnsw = ann_index.build_index(ann_index.all_vectors(index)[0], np.arange(500, dtype=np.int64), "hnsw")
+    q = queries(10)
+
+    await asyncio.gather(
+        *(executor.search(index, q[i], 3) for i in range(6)),
+        *(executor.search(hnsw, q[i], 3, ef_search=16) for i in range(2)),
+        *(executor.search(hnsw, q[i], 3, ef_search=128) for i in range(2)),
+    )
+
+    # flat: the first two alone (a thread each), then a full batch of 4;
+    # hnsw: one batch per ef_search
+    assert executor.batches == 5
+    assert executor.queries == 10
+    executor.shutdown()
+
+
+async def test_queries_with_a_free_thread_skip_the_batch_window(index):
+    executor = SearchExecutor(threads=4, window=1.0)
+    q = queries(3)
+
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(executor.search(index, q[i], 3) for i in range(3)))
+
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert executor.batches == 3 and executor.max_batch_size == 1
+    executor.shutdown()
+
+
+async def test_errors_reach_every_caller_in_the_batch(index):
+    executor = SearchExecutor(threads=1, window=0.05)
+    wrong_dimension = np.ones(DIM + 1, dtype=np.float32)
+
+    results = await asyncio.gather(
+        executor.search(index, wrong_dimension, 3),
+        executor.search(index, wrong_dimension, 3),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, Exception) for r in results)
+    executor.shutdown()
@@ -2,12 +2,16 @@
 import asyncio
 import sys
 from pathlib import Path
-from unittest.mock import MagicMock, AsyncMock
+from unittest.mock import AsyncMock
+
+import faiss
+import numpy as np
 
 # Add backend to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.routers.chat import extract_filters_node, AgentState
+from app.services.index_generation import IndexGeneration
 from app.services.vector_store import VectorStore
 
 async def test_filter_extraction():
@@ -44,25 +48,21 @@ async def test_vector_store_filtering():
     print("\n🧪 Testing Vector Store Filtering...")
     
     store = VectorStore()
-    store.property_metadata = [
-        {"title": "Ghana Villa", "location_city": "Accra", "location_country": "Ghana", "bedrooms": 3, "price_per_night": 100},
-        {"title": "Tokyo Apt", "location_city": "Tokyo", "location_country": "Japan", "bedrooms": 1, "price_per_night": 200},
-        {"title": "Miami Condo", "location_city": "Miami", "location_country": "USA", "bedrooms": 2, "price_per_night": 300},
+    metadata = [
+        {"property_id": 0, "title": "Ghana Villa", "location_city": "Accra", "location_country": "Ghana", "bedrooms": 3, "price_per_night": 100},
+        {"property_id": 1, "title": "Tokyo Apt", "location_city": "Tokyo", "location_country": "Japan", "bedrooms": 1, "price_per_night": 200},
+        {"property_id": 2, "title": "Miami Condo", "location_city": "Miami", "location_country": "USA", "bedrooms": 2, "price_per_night": 300},
     ]
     
+    # Small real index keyed by property ID, published as one generation like index_properties does
+    vectors = np.eye(3, dtype=np.float32)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(3))
+    index.add_with_ids(vectors, np.arange(3, dtype=np.int64))
+    store._publish(IndexGeneration(index, metadata, 1.0))
+    
     # Mock embedding to return dummy vector
-    import numpy as np
     store.embed_query = AsyncMock(return_value=np.array([0.1, 0.2, 0.3], dtype=np.float32))
     
-    # Mock index search to return all indices
-    store.index = MagicMock()
-    # Return distances (scores) and indices
-    # Scores: high to low (simulated)
-    store.index.search.return_value = (
-        [[0.9, 0.8, 0.7]], # scores
-        [[0, 1, 2]]        # indices
-    )
-    
     # Test 1: Filter by Location "Ghana"
     print("Test 1: Filter by Location 'Ghana'")
     results = await store.search("query", k=3, filters={"location": "Ghana"})
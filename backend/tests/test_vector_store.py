@@ -0,0 +1,523 @@
+import sys
+import json
+import asyncio
+import hashlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import faiss
+import numpy as np
+import pytest
+
+from app.services import ann_index
+from app.services import vector_store as vector_store_module
+from app.services import snapshot as snapshot_module
+from app.services.snapshot import SnapshotError
+from app.services.attribute_index import AttributeIndex
+from app.services.index_generation import IndexGeneration
+from app.services.sync_state import SyncDelta, apply_sync_delta
+from app.services.vector_store import VectorStore
+
+DIM = 16
+
+
+def fake_embedding(text):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store_module, "FAISS_INDEX_FILE", tmp_path / "faiss_index.bin")
+    monkeypatch.setattr(vector_store_module, "METADATA_FILE", tmp_path / "property_metadata.json")
+    monkeypatch.setattr(vector_store_module, "SNAPSHOT_DIR", tmp_path / "snapshots")
+
+    store = VectorStore()
+    store.embedded = []
+
+    async def embed_texts(texts):
+        store.embedded.extend(texts)
+        return np.stack([fake_embedding(text) for text in texts])
+
+    store.embed_texts = embed_texts
+    return store
+
+
+def prop(property_id, title):
+    return {"property_id": property_id, "title": title}
+
+
+def delta(properties, added=(), changed=(), removed=()):
+    return SyncDelta(nonce=len(properties), added=list(added), changed=list(changed),
+                     removed=list(removed), properties=list(properties))
+
+
+async def test_apply_delta_only_embeds_touched_properties(store):
+    catalog = [prop(i, f"Villa {i}") for i in range(5)]
+    await store.apply_delta(delta(catalog, added=catalog))
+    assert len(store.embedded) == 5
+
+    store.embedded.clear()
+    renamed = prop(2, "Treehouse")
+    catalog = [catalog[0], catalog[1], renamed, catalog[4], prop(7, "Loft")]
+    await store.apply_delta(delta(catalog, added=[catalog[4]], changed=[renamed], removed=[3]))
+
+    assert len(store.embedded) == 2
+    assert store.index.ntotal == 5
+    assert store.get_property(3) is None
+    assert store.get_property(2)["title"] == "Treehouse"
+    assert sorted(p["property_id"] for p in store.property_metadata) == [0, 1, 2, 4, 7]
+
+    # The stored vector for 2 is the re-embedded one
+    expected = fake_embedding(store._create_property_text(renamed)).reshape(1, -1)
+    faiss.normalize_L2(expected)
+    assert np.allclose(store.index.reconstruct(2), expected[0], atol=1e-5)
+
+
+async def test_similar_properties_excludes_self(store):
+    catalog = [prop(i, f"Villa {i}") for i in (10, 20, 30)]
+    await store.index_properties(catalog)
+
+    similar = await store.get_similar_properties(20, k=4)
+
+    assert sorted(p["property_id"] for p in similar) == [10, 30]
+    assert await store.get_similar_properties(99) == []
+
+
+async def test_empty_catalog_clears_the_index(store):
+    catalog = [prop(i, f"Villa {i}") for i in range(3)]
+    await store.index_properties(catalog)
+
+    await store.apply_delta(delta([], removed=[0, 1, 2]))
+
+    assert store.index.ntotal == 0
+    assert store.property_metadata == []
+
+
+async def test_sync_that_empties_the_catalog_still_applies_removals(store):
+    catalog = [prop(i, f"Villa {i}") for i in range(2)]
+    await apply_sync_delta(store, delta(catalog, added=catalog))
+
+    # The last listings were deactivated: no properties left, only removals
+    assert await apply_sync_delta(store, delta([], removed=[0, 1])) == 0
+
+    assert store.index.ntotal == 0
+    assert await store.search("Villa") == []
+
+
+async def test_positional_index_is_migrated_on_load(store):
+    catalog = [prop(i, f"Villa {i}") for i in (4, 8)]
+    vectors = np.stack([fake_embedding(p["title"]) for p in catalog])
+    legacy = faiss.IndexFlatIP(DIM)
+    legacy.add(vectors)
+    store._publish(IndexGeneration(legacy, catalog))
+    store.save()
+
+    reloaded = VectorStore()
+    assert await reloaded.load()
+    assert isinstance(reloaded.index, faiss.IndexIDMap2)
+    assert np.allclose(reloaded.index.reconstruct(8), vectors[1])
+
+
+async def test_snapshot_is_written_once_and_round_trips(store, tmp_path):
+    catalog = [prop(i, f"Villa {i}") for i in range(4)]
+    await store.index_properties(catalog)
+    generation = store.snapshot_generation
+    store.save()  # nothing changed since index_properties saved
+    assert store.snapshot_generation == generation
+    assert store.snapshots.current() == generation
+
+    reloaded = VectorStore()
+    assert await reloaded.load()
+    assert reloaded.property_metadata == catalog
+    assert reloaded.index_type == store.index_type
+    assert np.allclose(reloaded.index.reconstruct(3), store.index.reconstruct(3))
+
+    # A damaged metadata file fails its checksum instead of loading garbage
+    metadata_file = tmp_path / "snapshots" / generation / "metadata.msgpack"
+    metadata_file.write_bytes(b"\x00" * metadata_file.stat().st_size)
+    with pytest.raises(SnapshotError):
+        store.snapshots.read()
+
+
+async def test_snapshot_writes_run_off_the_event_loop(store):
+    import threading
+
+    writers = []
+    real_write = store.snapshots.write
+
+    def write(*args, **kwargs):
+        writers.append(threading.get_ident())
+        return real_write(*args, **kwargs)
+
+    store.snapshots.write = write
+    catalog = [prop(i, f"Villa {i}") for i in range(3)]
+    await apply_sync_delta(store, delta(catalog, added=catalog))
+    await apply_sync_delta(store, delta(catalog[:2], removed=[2]))
+
+    assert len(writers) == 2
+    assert threading.get_ident() not in writers
+
+
+async def test_legacy_json_files_are_converted_to_a_snapshot(store):
+    catalog = [prop(i, f"Villa {i}") for i in (1, 2)]
+    vectors = np.stack([fake_embedding(p["title"]) for p in catalog])
+    legacy = faiss.IndexIDMap2(faiss.IndexFlatIP(DIM))
+    legacy.add_with_ids(vectors, np.array([1, 2], dtype=np.int64))
+    faiss.write_index(legacy, str(vector_store_module.FAISS_INDEX_FILE))
+    vector_store_module.METADATA_FILE.write_text(json.dumps(catalog, indent=2))
+
+    assert await store.load()
+    assert store.snapshots.current() == store.snapshot_generation
+    assert await VectorStore().load()
+    assert np.allclose(store.index.reconstruct(2), vectors[1])
+
+
+def listing(property_id, city, bedrooms, price, amenities=()):
+    return {
+        "property_id": property_id,
+        "title": f"Listing {property_id}",
+        "location_city": city,
+        "location_country": "Ghana" if city in ("Accra", "Kumasi") else "Japan",
+        "bedrooms": bedrooms,
+        "price_per_night": price,
+        "amenities": list(amenities),
+    }
+
+
+def make_catalog(n=300):
+    rng = np.random.default_rng(7)
+    cities = ["Accra", "Kumasi", "Tokyo", "Osaka"]
+    return [
+        listing(i, cities[i % 4], int(rng.integers(1, 5)), int(rng.integers(50, 500)),
+                ["wifi", "pool", "kitchen"][: i % 4])
+        for i in range(n)
+    ]
+
+
+async def expected_top_k(store, catalog, query, k, filters, generation=None):
+    index = (generation or store.generation).index
+    q = fake_embedding(query).reshape(1, -1)
+    faiss.normalize_L2(q)
+    matching = [p for p in catalog if store._matches_filters(p, filters)]
+    vectors = np.stack([index.reconstruct(p["property_id"]) for p in matching])
+    order = np.argsort(-(vectors @ q[0]))[:k]
+    return [matching[i]["property_id"] for i in order]
+
+
+@pytest.mark.parametrize("brute_force_max", [2048, 0])
+async def test_filtered_search_returns_true_top_k(store, monkeypatch, brute_force_max):
+    monkeypatch.setattr(vector_store_module, "PREFILTER_BRUTE_FORCE_MAX", brute_force_max)
+    catalog = make_catalog()
+    await store.index_properties(catalog)
+    store.embed_query = lambda query: _async(fake_embedding(query))
+
+    filters = {"city": "Tokyo", "bedrooms": 3, "amenities": ["wifi", "pool"]}
+    results = await store.search("quiet place", k=5, filters=filters, min_score=-1.0)
+
+    assert len(results) == 5
+    assert [r["property_id"] for r in results] == await expected_top_k(store, catalog, "quiet place", 5, filters)
+    assert all(r["location_city"] == "Tokyo" and r["bedrooms"] >= 3 for r in results)
+
+
+async def test_attribute_mask_matches_python_filters(store):
+    catalog = make_catalog(120)
+    del catalog[3]["price_per_night"]
+    del catalog[5]["bedrooms"]
+    await store.index_properties(catalog)
+
+    attributes = store.generation.attributes
+    rows = [store.get_property(int(label)) for label in attributes.property_ids]
+    for filters in (
+        {"location": "gha"}, {"location": "listing 1"}, {"min_price": 200, "max_price": 300},
+        {"country": "japan", "guests": 0}, {"amenities": "kitchen"}, {"bathrooms": 1}, {"city": "Lagos"},
+    ):
+        expected = [store._matches_filters(prop, filters) for prop in rows]
+        assert attributes.compile(filters).tolist() == expected, filters
+
+
+async def test_deltas_derive_attribute_columns_incrementally(store):
+    catalog = make_catalog(60)
+    await store.index_properties(catalog)
+    current = {p["property_id"]: p for p in catalog}
+
+    rng = np.random.default_rng(3)
+    for step in range(6):
+        removed = [int(pid) for pid in rng.choice(sorted(current), size=3, replace=False)]
+        for pid in removed:
+            del current[pid]
+        changed = [dict(current[int(pid)], price_per_night=int(rng.integers(50, 500)), amenities=["sauna"])
+                   for pid in rng.choice(sorted(current), size=3, replace=False)]
+        added = [listing(1000 + step * 2 + i, "Lagos", 4, 90, ["wifi", f"amenity-{step}"]) for i in range(2)]
+        current.update({p["property_id"]: p for p in changed + added})
+        await store.apply_delta(delta(list(current.values()), added=added, changed=changed, removed=removed))
+
+        generation = store.generation
+        rebuilt = AttributeIndex(generation.metadata)
+        assert generation.attributes.property_ids.tolist() == rebuilt.property_ids.tolist()
+        for filters in ({"city": "lagos"}, {"min_price": 200}, {"amenities": ["sauna"]},
+                        {"amenities": ["wifi", f"amenity-{step}"]}, {"location": "listing 1"}, {"bedrooms": 3}):
+            assert generation.attributes.compile(filters).tolist() == rebuilt.compile(filters).tolist(), filters
+
+
+def test_location_words_follow_derived_rows():
+    titles = ["Sea View Loft", "Old Town Flat", "Seaside Villa", "Town House", "Garden Room"]
+    properties = [{"property_id": i, "title": title, "description": f"Near the {title.split()[0]} market"}
+                  for i, title in enumerate(titles)]
+    attributes = AttributeIndex(properties)
+
+    # Retitle row 1, swap-remove row 2 (the last row moves into it) and append into the freed position
+    properties[1] = dict(properties[1], title="New Town Loft")
+    properties[2] = properties.pop()
+    properties.append({"property_id": 9, "title": "Seaview Cabin", "description": ""})
+    derived = attributes.derive(properties, [1, 2, 4])
+
+    rebuilt = AttributeIndex(properties)
+    assert derived.words.postings == rebuilt.words.postings
+    for term in ("sea", "town loft", "w town", "old", "near the", "market", "view cab", "-", "villa"):
+        expected = [term in f"{p['title']}\x00{p['description']}".lower() for p in properties]
+        assert derived.compile({"location": term}).tolist() == expected, term
+
+
+async def test_concurrent_changes_are_derived_as_one_batch(store, monkeypatch):
+    await store.index_properties(make_catalog(40))
+    derived = []
+    derive = store._derive_generation
+    monkeypatch.setattr(store, "_derive_generation", lambda base, *args: derived.append(args) or derive(base, *args))
+
+    await asyncio.gather(
+        store.upsert_properties([listing(100, "Accra", 2, 80)]),
+        store.upsert_properties([listing(101, "Accra", 2, 80)]),
+        store.remove_properties([3]),
+        store.upsert_properties([listing(3, "Osaka", 1, 60)]),  # re-added after the removal above
+    )
+
+    # The first writer derives alone; everything queued behind it is merged into one derivation
+    assert len(derived) == 2
+    assert store.get_property(100) is not None and store.get_property(101) is not None
+    assert store.get_property(3)["location_city"] == "Osaka"
+    assert store.index_stats()["vectors"] == 42
+
+
+async def _async(value):
+    return value
+
+
+def test_index_type_follows_catalog_size(monkeypatch):
+    monkeypatch.setattr(ann_index, "AUTO_FLAT_MAX", 100)
+    monkeypatch.setattr(ann_index, "AUTO_HNSW_MAX", 1000)
+
+    assert ann_index.choose_index_type(100, "auto") == "flat"
+    assert ann_index.choose_index_type(101, "auto") == "hnsw"
+    assert ann_index.choose_index_type(20000, "auto") == "ivf_pq"
+    # Too few vectors to train the requested quantizer
+    assert ann_index.choose_index_type(500, "ivf_pq") == "ivf_flat"
+    assert ann_index.choose_index_type(50, "ivf_flat") == "flat"
+    with pytest.raises(ValueError):
+        ann_index.choose_index_type(10, "lsh")
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf_flat"])
+async def test_every_index_type_searches_updates_and_reloads(store, monkeypatch, kind):
+    monkeypatch.setattr(ann_index, "VECTOR_INDEX_TYPE", kind)
+    catalog = make_catalog()
+    await store.index_properties(catalog)
+    store.embed_query = lambda query: _async(fake_embedding(query))
+
+    assert store.index_type == kind
+    assert 0.0 < store.index_recall <= 1.0
+    assert store.index_stats()["recall_at_10"] == store.index_recall
+
+    # Exhaustive parameters make every type exact on this catalog
+    results = await store.search("quiet place", k=5, min_score=-1.0, ef_search=512, nprobe=1024)
+    assert [r["property_id"] for r in results] == await expected_top_k(store, catalog, "quiet place", 5, {})
+
+    filters = {"city": "Tokyo", "bedrooms": 3}
+    filtered = await store.search("quiet place", k=5, filters=filters, min_score=-1.0)
+    assert [r["property_id"] for r in filtered] == await expected_top_k(store, catalog, "quiet place", 5, filters)
+
+    await store.apply_delta(delta(catalog[1:], removed=[0]))
+    store.save()
+    assert store.index_type == kind
+    assert store.index_stats()["vectors"] == len(catalog) - 1
+    assert 0 not in [r["property_id"] for r in await store.search("quiet place", k=20, min_score=-1.0, ef_search=512, nprobe=1024)]
+
+    reloaded = VectorStore()
+    assert await reloaded.load()
+    assert reloaded.index_type == kind
+    assert np.allclose(reloaded.index.reconstruct(5), store.index.reconstruct(5))
+    # Mutating a memory-mapped snapshot copies it first and leaves the files untouched
+    await reloaded.remove_properties([7])
+    assert reloaded.index_stats()["vectors"] == len(catalog) - 2
+    follower = VectorStore()
+    assert await follower.load() and follower.index_stats()["vectors"] == len(catalog) - 1
+
+
+async def test_hnsw_updates_tombstone_old_entries_until_compaction(store, monkeypatch):
+    monkeypatch.setattr(ann_index, "VECTOR_INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(ann_index, "HNSW_TOMBSTONE_MAX_FRACTION", 0.1)
+    catalog = make_catalog(100)
+    await store.index_properties(catalog)
+    store.embed_query = lambda query: _async(fake_embedding(query))
+
+    renamed = [dict(p, title=f"Renamed {p['property_id']}") for p in catalog[:5]]
+    current = renamed + catalog[5:]
+    await store.apply_delta(delta(current, changed=renamed))
+
+    # The graph was extended, not rebuilt: old entries stay behind as tombstones
+    generation = store.generation
+    assert store.index.ntotal == 105
+    assert store.index_stats()["vectors"] == 100 and store.index_stats()["tombstones"] == 5
+    fresh = await store._embed_properties(renamed[:1])
+    assert np.allclose(store.index.reconstruct(0), fresh[0])
+    found = [r["property_id"] for r in await store.search("quiet place", k=100, min_score=-1.0, ef_search=512)]
+    assert sorted(found) == list(range(100))
+    assert [r["property_id"] for r in await store.search("quiet place", k=5, min_score=-1.0, ef_search=512)] \
+        == await expected_top_k(store, current, "quiet place", 5, {})
+
+    # Tombstones are derived from the snapshot, so a reload skips them too
+    store.save()
+    follower = VectorStore()
+    assert await follower.load()
+    assert follower.index_stats()["tombstones"] == 5
+
+    # Past the threshold the index is rebuilt from the live vectors only
+    await store.apply_delta(delta(current[:-10], removed=range(90, 100)))
+    assert store.index_type == "hnsw"
+    assert store.index.ntotal == 90 and store.index_stats()["tombstones"] == 0
+    assert generation.index.ntotal == 105  # the pinned generation is untouched
+
+
+async def test_index_switches_type_when_catalog_grows(store, monkeypatch):
+    monkeypatch.setattr(ann_index, "AUTO_FLAT_MAX", 50)
+    catalog = make_catalog(40)
+    await store.index_properties(catalog)
+    assert store.index_type == "flat"
+    assert store.index_recall == 1.0
+
+    grown = make_catalog(120)
+    await store.apply_delta(delta(grown, added=grown[40:]))
+
+    assert store.index_type == "hnsw"
+    assert store.index.ntotal == 120
+    assert store.measure_recall(k=5, ef_search=256) == 1.0
+
+
+async def test_reindex_never_disturbs_a_pinned_search(store):
+    catalog = make_catalog(200)
+    await store.index_properties(catalog)
+    before = store.generation
+
+    release = asyncio.Event()
+
+    async def slow_embed_query(query):
+        await release.wait()
+        return fake_embedding(query)
+
+    store.embed_query = slow_embed_query
+    search = asyncio.create_task(store.search("quiet place", k=5, filters={"city": "Tokyo"}, min_score=-1.0))
+    await asyncio.sleep(0)
+
+    # Drop every Tokyo listing while the search is waiting on its embedding
+    remaining = [p for p in catalog if p["location_city"] != "Tokyo"]
+    await store.apply_delta(delta(remaining, removed=[p["property_id"] for p in catalog if p not in remaining]))
+    assert store.generation is not before
+    assert before.index.ntotal == len(catalog)  # the old generation was not modified
+
+    release.set()
+    results = await search
+    assert [r["property_id"] for r in results] == await expected_top_k(store, catalog, "quiet place", 5, {"city": "Tokyo"}, before)
+    assert await store.search("quiet place", k=5, filters={"city": "Tokyo"}, min_score=-1.0) == []
+
+
+async def test_follower_picks_up_snapshots_published_elsewhere(store):
+    catalog = [prop(i, f"Villa {i}") for i in range(3)]
+    await store.index_properties(catalog)
+
+    follower = VectorStore()
+    assert await follower.load()
+    assert not follower.refresh()  # nothing new yet
+
+    catalog = catalog + [prop(9, "Loft")]
+    await store.apply_delta(delta(catalog, added=catalog[-1:]))
+    store.save()
+
+    assert await follower.refresh_async()
+    assert follower.snapshot_generation == store.snapshot_generation
+    assert follower.get_property(9)["title"] == "Loft"
+    assert follower.index.ntotal == 4
+
+
+async def test_workers_applying_deltas_never_drop_each_others_changes(store):
+    catalog = [prop(i, f"Villa {i}") for i in range(3)]
+    await store.index_properties(catalog)
+
+    other = VectorStore()
+    assert await other.load()
+
+    async def slow_embed(texts):
+        await asyncio.sleep(0.05)  # both workers would derive from the same base meanwhile
+        return np.stack([fake_embedding(text) for text in texts])
+
+    store.embed_texts = other.embed_texts = slow_embed
+    first = [catalog[0], prop(1, "Treehouse"), catalog[2]]
+    second = [catalog[0], prop(1, "Treehouse"), prop(2, "Loft")]
+    await asyncio.gather(
+        store.apply_delta(delta(first, changed=first[1:2])),
+        other.apply_delta(delta(second, changed=second[2:])),
+    )
+
+    reloaded = VectorStore()
+    assert await reloaded.load()
+    assert [reloaded.get_property(i)["title"] for i in (1, 2)] == ["Treehouse", "Loft"]
+
+
+async def test_prune_keeps_a_generation_a_follower_has_mapped(store, monkeypatch, tmp_path):
+    monkeypatch.setattr(ann_index, "VECTOR_INDEX_TYPE", "ivf_flat")
+    monkeypatch.setattr(vector_store_module, "SNAPSHOT_MMAP", True)
+    catalog = make_catalog(200)
+    await store.index_properties(catalog)
+
+    follower = VectorStore()
+    assert await follower.load()
+    assert follower.generation.mapped
+    pinned = tmp_path / "snapshots" / follower.snapshot_generation
+
+    for i in range(3):
+        catalog = catalog + [listing(1000 + i, "Accra", 2, 120)]
+        await store.apply_delta(delta(catalog, added=catalog[-1:]))
+        store.save()
+
+    # SNAPSHOT_KEEP=2 would have dropped it, but the follower still reads its index file
+    assert pinned.exists()
+    await follower.remove_properties([5])
+    assert follower.index_stats()["vectors"] == 199
+
+    # Once the follower moves on, the next write prunes it
+    assert await follower.refresh_async()
+    catalog = catalog + [listing(2000, "Accra", 2, 120)]
+    await store.apply_delta(delta(catalog, added=catalog[-1:]))
+    store.save()
+    assert not pinned.exists()
+    assert (tmp_path / "snapshots" / follower.snapshot_generation).exists()
+
+
+async def test_only_the_first_load_verifies_checksums(store, monkeypatch):
+    hashed = []
+    sha256 = snapshot_module._sha256
+    monkeypatch.setattr(snapshot_module, "_sha256", lambda path: hashed.append(path.name) or sha256(path))
+    catalog = [prop(i, f"Villa {i}") for i in range(3)]
+    await store.index_properties(catalog)
+
+    follower = VectorStore()
+    hashed.clear()
+    assert await follower.load()
+    assert sorted(hashed) == ["index.faiss", "metadata.msgpack"]
+
+    await store.apply_delta(delta(catalog + [prop(9, "Loft")], added=[prop(9, "Loft")]))
+    store.save()
+    hashed.clear()
+    assert await follower.refresh_async()
+    assert hashed == [] and follower.get_property(9)["title"] == "Loft"